@@ -0,0 +1,273 @@
+import hmac
+import json
+from decimal import Decimal
+from functools import wraps
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import F, Sum
+from django.http import JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST
+from product.models import Product
+from purchase.models import PurchaseItem
+from purchaseorder.models import PurchaseOrder
+from sale.batch import BatchError, apply_sale_batch
+from sale.models import Sale, SaleItem
+from stock.models import ClosedPeriod, StockCarryForward
+from .db_routers import use_replica
+from .pagination import decode_cursor, encode_cursor
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 500
+
+# Public field name -> ORM lookup (None means a plain model field of the same name)
+PRODUCT_FIELDS = {
+    'id': None,
+    'barcode': None,
+    'name': None,
+    'model': None,
+    'serial_number': None,
+    'category_id': None,
+    'category_name': 'category__name',
+    'supplier_id': None,
+    'supplier_name': 'supplier__supplier_name',
+    'unit_name': 'unit__name',
+    'sale_price': None,
+    'cost_price': None,
+    'vat_percentage': None,
+}
+STOCK_FIELDS = {
+    'id': None,
+    'barcode': None,
+    'name': None,
+    'model': None,
+}
+STOCK_COMPUTED_FIELDS = ('in_qty', 'out_qty', 'on_hand')
+SALE_FIELDS = {
+    'id': None,
+    'date': None,
+    'customer_id': None,
+    'customer_name': 'customer__customer_name',
+    'sale_discount': None,
+    'shipping_cost': None,
+    'total_discount': None,
+    'total_vat': None,
+    'grand_total': None,
+    'net_total': None,
+    'paid_amount': None,
+}
+PURCHASE_ORDER_FIELDS = {
+    'id': None,
+    'po_number': None,
+    'status': None,
+    'purchase_date': None,
+    'created_at': None,
+    'supplier_id': None,
+    'supplier_name': 'supplier__supplier_name',
+    'total_discount': None,
+    'total_vat': None,
+    'grand_total': None,
+    'paid_amount': None,
+    'due_amount': None,
+}
+
+
+def _error(message, status=400):
+    return JsonResponse({'error': message}, status=status)
+
+
+def _terminal(request):
+    """
+    Name of the terminal whose token the request carries ("Authorization: Bearer
+    <token>"), or None. Tokens are configured as settings.TERMINAL_API_TOKENS,
+    {terminal name: token}; with none configured every request is refused.
+    """
+    scheme, _, token = request.headers.get('Authorization', '').partition(' ')
+    if scheme.lower() != 'bearer' or not token.strip():
+        return None
+    token = token.strip().encode()
+    for name, expected in getattr(settings, 'TERMINAL_API_TOKENS', {}).items():
+        if expected and hmac.compare_digest(token, str(expected).encode()):
+            return name
+    return None
+
+
+def _unauthorized():
+    response = _error("A valid terminal token is required.", status=401)
+    response['WWW-Authenticate'] = 'Bearer'
+    return response
+
+
+def token_required(view_func):
+    """
+    Answer 401 unless the request carries a terminal token (see _terminal); the
+    view finds the terminal's name in request.terminal.
+    """
+    if iscoroutinefunction(view_func):
+        async def wrapper(request, *args, **kwargs):
+            request.terminal = _terminal(request)
+            if request.terminal is None:
+                return _unauthorized()
+            return await view_func(request, *args, **kwargs)
+    else:
+        def wrapper(request, *args, **kwargs):
+            request.terminal = _terminal(request)
+            if request.terminal is None:
+                return _unauthorized()
+            return view_func(request, *args, **kwargs)
+    return wraps(view_func)(wrapper)
+
+
+def _parse_fields(request, available, extra=()):
+    requested = request.GET.get('fields', '').strip()
+    if not requested:
+        return list(available) + list(extra)
+    fields = [name.strip() for name in requested.split(',') if name.strip()]
+    unknown = [name for name in fields if name not in available and name not in extra]
+    if unknown:
+        raise ValueError(f"Unknown field(s): {', '.join(unknown)}.")
+    return fields
+
+
+def _parse_limit(request):
+    try:
+        limit = int(request.GET.get('limit', DEFAULT_LIMIT))
+    except ValueError:
+        raise ValueError("limit must be a number.")
+    if limit < 1:
+        raise ValueError("limit must be positive.")
+    return min(limit, MAX_LIMIT)
+
+
+async def _page(request, queryset, available, descending=False, extra=()):
+    """
+    Fetch one keyset page ordered by id, returning (rows, next_cursor, fields).
+
+    The id is always read so the next cursor can be built, but it is only included
+    in the output rows when it was asked for.
+    """
+    fields = _parse_fields(request, available, extra)
+    limit = _parse_limit(request)
+    cursor = request.GET.get('cursor')
+    if cursor:
+        values = decode_cursor(cursor)
+        if len(values) != 1 or not isinstance(values[0], int):
+            raise ValueError("Invalid cursor.")
+        queryset = queryset.filter(**{'id__lt' if descending else 'id__gt': values[0]})
+
+    model_fields = [name for name in fields if name in available and available[name] is None]
+    related = {name: F(available[name]) for name in fields if name in available and available[name] is not None}
+    if 'id' not in model_fields:
+        model_fields.append('id')
+
+    queryset = queryset.order_by('-id' if descending else 'id').values(*model_fields, **related)
+    rows = [row async for row in queryset[:limit + 1]]
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor([rows[-1]['id']])
+    return rows, next_cursor, fields
+
+
+def _respond(rows, next_cursor, fields):
+    results = [{name: row[name] for name in fields} for row in rows]
+    return JsonResponse({'results': results, 'next_cursor': next_cursor}, encoder=DjangoJSONEncoder)
+
+
+@use_replica
+@require_GET
+@token_required
+async def products(request):
+    try:
+        rows, next_cursor, fields = await _page(request, Product.objects.all(), PRODUCT_FIELDS)
+    except ValueError as e:
+        return _error(str(e))
+    return _respond(rows, next_cursor, fields)
+
+
+@use_replica
+@require_GET
+@token_required
+async def stock_levels(request):
+    try:
+        rows, next_cursor, fields = await _page(
+            request, Product.objects.all(), STOCK_FIELDS, extra=STOCK_COMPUTED_FIELDS
+        )
+    except ValueError as e:
+        return _error(str(e))
+
+    if any(name in STOCK_COMPUTED_FIELDS for name in fields):
+        ids = [row['id'] for row in rows]
+        # Closed periods contribute their carry-forward; their lines are archived
+        carried = {}
+        period = await ClosedPeriod.objects.order_by('-end_date').afirst()
+        if period is not None:
+            carried = {
+                row['product_id']: (row['in_qty'], row['out_qty']) async for row in
+                StockCarryForward.objects.filter(period=period, product_id__in=ids)
+                .values('product_id').annotate(in_qty=Sum('in_qty'), out_qty=Sum('out_qty'))
+            }
+        purchased = {
+            row['product_id']: row['qty'] async for row in
+            PurchaseItem.objects.filter(product_id__in=ids).values('product_id').annotate(qty=Sum('quantity'))
+        }
+        sold = {
+            row['product_id']: row['qty'] async for row in
+            SaleItem.objects.filter(product_id__in=ids).values('product_id').annotate(qty=Sum('quantity'))
+        }
+        for row in rows:
+            carried_in, carried_out = carried.get(row['id'], (0, 0))
+            in_qty = Decimal(carried_in) + Decimal(purchased.get(row['id']) or 0)
+            out_qty = Decimal(carried_out) + Decimal(sold.get(row['id']) or 0)
+            row.update(in_qty=in_qty, out_qty=out_qty, on_hand=in_qty - out_qty)
+    return _respond(rows, next_cursor, fields)
+
+
+@use_replica
+@require_GET
+@token_required
+async def sales(request):
+    try:
+        rows, next_cursor, fields = await _page(request, Sale.objects.all(), SALE_FIELDS, descending=True)
+    except ValueError as e:
+        return _error(str(e))
+    return _respond(rows, next_cursor, fields)
+
+
+@use_replica
+@require_GET
+@token_required
+async def purchase_orders(request):
+    queryset = PurchaseOrder.objects.all()
+    status = request.GET.get('status')
+    if status:
+        queryset = queryset.filter(status=status.upper())
+    try:
+        rows, next_cursor, fields = await _page(request, queryset, PURCHASE_ORDER_FIELDS, descending=True)
+    except ValueError as e:
+        return _error(str(e))
+    return _respond(rows, next_cursor, fields)
+
+
+@csrf_exempt
+@require_POST
+@token_required
+def sale_batch(request):
+    """
+    Accept a JSON batch of offline sales from a store terminal (see sale.batch).
+
+    Replaying a batch is safe: sales whose key was already applied come back as
+    'duplicate' with their existing sale id. Terminals authenticate with a bearer
+    token rather than a session, which is why CSRF checks do not apply.
+    """
+    try:
+        payload = json.loads(request.body)
+    except (UnicodeDecodeError, json.JSONDecodeError):
+        return _error("Request body must be JSON.")
+    try:
+        results = apply_sale_batch(payload, terminal=request.terminal)
+    except BatchError as e:
+        return _error(str(e))
+    counts = {status: sum(1 for result in results if result['status'] == status) for status in ('created', 'duplicate', 'rejected')}
+    return JsonResponse({'results': results, **counts}, encoder=DjangoJSONEncoder)
@@ -0,0 +1,219 @@
+"""
+Append-only audit trail of field-level changes.
+
+Saves and deletes of the models in AUDITED_MODELS are diffed field by field
+(see core.signals) and recorded as AuditEntry rows holding {field: [old, new]}.
+Entries are never written one at a time: inside a transaction they wait for the
+commit, batched per savepoint (see core.oncommit) so a savepoint that rolls back
+takes its entries with it, and during a request they are
+then held until the response is ready, so a request that touches any number of
+rows costs a single bulk_create. Outside a request each commit flushes its own
+entries.
+
+Enable request buffering and user attribution in settings, after the
+authentication middleware:
+
+    MIDDLEWARE += ['core.audit.AuditMiddleware']
+
+bulk_create() and QuerySet.update() send no signals and are not audited; soft
+deletes are recorded through core.softdelete.soft_deleted.
+"""
+import itertools
+import logging
+from contextvars import ContextVar
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.db import models
+from django.utils import timezone
+from . import oncommit
+from .models import AuditEntry
+
+logger = logging.getLogger(__name__)
+
+AUDITED_MODELS = {
+    'product.product',
+    'purchase.purchase',
+    'purchase.purchaseitem',
+    'purchaseorder.purchaseorder',
+    'purchaseorder.purchaseorderitem',
+    'sale.sale',
+    'sale.saleitem',
+}
+# Bookkeeping columns that change on every save and say nothing about the document
+IGNORED_FIELDS = {'version'}
+
+_request_buffer = ContextVar('audit_request_buffer', default=None)
+_fields_cache = {}
+_sequence = itertools.count()  # Orders entries collected in different savepoints
+
+
+class _RequestBuffer:
+    def __init__(self, request):
+        self.request = request
+        self.entries = []
+
+    def username(self):
+        user = getattr(self.request, 'user', None)
+        return user.get_username() if user is not None and user.is_authenticated else ''
+
+
+def audited(model):
+    return model._meta.label_lower in AUDITED_MODELS
+
+
+def _fields(model):
+    fields = _fields_cache.get(model)
+    if fields is None:
+        fields = _fields_cache[model] = [
+            field for field in model._meta.concrete_fields
+            if not field.primary_key and not field.generated and field.name not in IGNORED_FIELDS
+        ]
+    return fields
+
+
+def _values(model, row):
+    """Normalise {attname: value} so values read from the database and set in Python compare equal."""
+    values = {}
+    for field in _fields(model):
+        value = row.get(field.attname)
+        if hasattr(value, 'resolve_expression'):
+            continue  # An F() update; its result is not known here
+        if isinstance(field, models.FileField):
+            # A FieldFile is not JSON-serialisable, and an unset one holds None where the row holds ''
+            values[field.attname] = getattr(value, 'name', value) or ''
+            continue
+        try:
+            values[field.attname] = field.to_python(value)
+        except Exception:
+            values[field.attname] = value
+    return values
+
+
+def _instance_values(instance):
+    return _values(type(instance), {field.attname: getattr(instance, field.attname) for field in _fields(type(instance))})
+
+
+def remember(instance):
+    """Load the stored row before a save so record_save() can diff against it."""
+    instance._audit_before = None
+    if instance.pk is not None:
+        model = type(instance)
+        row = model._base_manager.filter(pk=instance.pk).values(*(f.attname for f in _fields(model))).first()
+        if row is not None:
+            instance._audit_before = _values(model, row)
+
+
+def record_save(instance, created):
+    after = _instance_values(instance)
+    before = getattr(instance, '_audit_before', None)
+    if created or before is None:
+        changes = {name: [None, value] for name, value in after.items() if value not in (None, '')}
+        _add(instance, 'CREATE', changes)
+        return
+    changes = {name: [before.get(name), value] for name, value in after.items() if before.get(name) != value}
+    if changes:
+        _add(instance, 'UPDATE', changes)
+
+
+def record_delete(instance):
+    changes = {name: [value, None] for name, value in _instance_values(instance).items() if value not in (None, '')}
+    _add(instance, 'DELETE', changes)
+
+
+def record_soft_delete(model, pks):
+    now = timezone.now()
+    for pk in pks:
+        _add(model(pk=pk), 'DELETE', {'deleted_at': [None, now]})
+
+
+def _add(instance, action, changes):
+    entry = AuditEntry(
+        model=instance._meta.label_lower, object_id=str(instance.pk), action=action, changes=changes,
+    )
+    buffer = _request_buffer.get()
+    if buffer is not None:
+        entry.username = buffer.username()
+        entry.path = buffer.request.path[:255]
+
+    entry._order = next(_sequence)
+    pending = oncommit.collect('audit', _deliver)
+    if pending is None:
+        _deliver([entry])
+    else:
+        # Rolling back the current savepoint drops the entry with it
+        pending.append(entry)
+
+
+def _coalesce(entries):
+    """
+    Fold repeated saves of one object into its first entry: views often save a
+    header, then save it again with recomputed totals.
+    """
+    merged, by_object = [], {}
+    for entry in sorted(entries, key=lambda entry: entry._order):
+        key = (entry.model, entry.object_id)
+        first = by_object.get(key)
+        if first is None or entry.action == 'DELETE' or first.action == 'DELETE':
+            by_object[key] = entry
+            merged.append(entry)
+            continue
+        for name, (old, new) in entry.changes.items():
+            first.changes[name] = [first.changes[name][0] if name in first.changes else old, new]
+        first.changes = {name: change for name, change in first.changes.items() if change[0] != change[1]}
+    return [entry for entry in merged if entry.changes or entry.action != 'UPDATE']
+
+
+def _write(entries):
+    entries = _coalesce(entries)
+    if entries:
+        AuditEntry.objects.bulk_create(entries)
+
+
+def _deliver(entries):
+    """Hand committed entries to the current request, or write them now outside one."""
+    buffer = _request_buffer.get()
+    if buffer is not None:
+        buffer.entries.extend(entries)
+    else:
+        _write(entries)
+
+
+def flush(buffer):
+    entries, buffer.entries = buffer.entries, []
+    _write(entries)
+
+
+class AuditMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        buffer = _RequestBuffer(request)
+        token = _request_buffer.set(buffer)
+        try:
+            return self.get_response(request)
+        finally:
+            _request_buffer.reset(token)
+            self._flush(buffer)
+
+    async def __acall__(self, request):
+        buffer = _RequestBuffer(request)
+        token = _request_buffer.set(buffer)
+        try:
+            return await self.get_response(request)
+        finally:
+            _request_buffer.reset(token)
+            await sync_to_async(self._flush)(buffer)
+
+    def _flush(self, buffer):
+        # Auditing must never turn a successful request into an error
+        try:
+            flush(buffer)
+        except Exception:
+            logger.exception(f"Could not write {len(buffer.entries)} audit entries for {buffer.request.path}")
@@ -0,0 +1,109 @@
+"""
+Route reads from opted-in report and list views to a read replica.
+
+Enable it in settings:
+
+    DATABASES['replica'] = {...}            # any alias; see REPLICA_DATABASE
+    DATABASE_ROUTERS = ['core.db_routers.ReplicaRouter']
+    MIDDLEWARE += ['core.db_routers.ReplicaMiddleware']
+
+Views opt in with @use_replica (or method_decorator(use_replica, name='dispatch')
+on class-based views). Only GET/HEAD requests to opted-in views read from the
+replica; everything else, and every write, stays on the default database, as do
+sessions and auth models, which a request may have just written. After
+a write request the client is pinned to the primary for REPLICA_PIN_SECONDS
+(default 10) so it reads its own writes. Locally the replica can simply be a
+second SQLite file kept in sync with `migrate --database replica` plus a copy.
+"""
+from contextvars import ContextVar
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+PIN_COOKIE = 'db_primary_pin'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+# Read on the primary even in replica views: a lagging copy would log users out or miss permission changes
+PRIMARY_APPS = {'auth', 'sessions'}
+
+_reading_from_replica = ContextVar('reading_from_replica', default=False)
+
+
+def replica_alias():
+    alias = getattr(settings, 'REPLICA_DATABASE', 'replica')
+    return alias if alias in settings.DATABASES else None
+
+
+def use_replica(view_func):
+    """Mark a view whose read queries may be served by the replica."""
+    view_func.use_replica = True
+    return view_func
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if _reading_from_replica.get() and model._meta.app_label not in PRIMARY_APPS:
+            return replica_alias()
+        return None
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replica holds the same data as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return None
+
+
+class ReplicaMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            self._reset(request)
+        return self._pin(request, response)
+
+    async def __acall__(self, request):
+        try:
+            response = await self.get_response(request)
+        finally:
+            self._reset(request)
+        return self._pin(request, response)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if (
+            getattr(view_func, 'use_replica', False)
+            and request.method in ('GET', 'HEAD')
+            and PIN_COOKIE not in request.COOKIES
+            and replica_alias()
+        ):
+            request._replica_token = _reading_from_replica.set(True)
+        return None
+
+    def _reset(self, request):
+        token = getattr(request, '_replica_token', None)
+        if token is not None:
+            try:
+                _reading_from_replica.reset(token)
+            except ValueError:
+                # Token was created in another context (sync view under ASGI)
+                _reading_from_replica.set(False)
+
+    def _pin(self, request, response):
+        if request.method not in SAFE_METHODS:
+            response.set_cookie(
+                PIN_COOKIE, '1',
+                max_age=getattr(settings, 'REPLICA_PIN_SECONDS', 10),
+                httponly=True, samesite='Lax',
+            )
+        return response
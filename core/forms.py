@@ -0,0 +1,23 @@
+from django import forms
+
+LINE_AMOUNT_FIELDS = ('discount_value', 'vat_value', 'total')
+
+
+class LineAmountsFormMixin:
+    """
+    Show a line's discount, VAT and total as read-only inputs.
+
+    Those columns are generated by the database (core.pricing.line_amount_fields),
+    so they cannot be model form fields. These plain fields keep the inputs the
+    templates' live-total scripts fill in; whatever is posted back is ignored.
+    """
+    line_amount_attrs = {'readonly': 'readonly'}
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        for name in LINE_AMOUNT_FIELDS:
+            self.fields[name] = forms.DecimalField(
+                required=False, max_digits=10, decimal_places=2,
+                initial=getattr(self.instance, name, None) if self.instance.pk else None,
+                widget=forms.NumberInput(attrs=dict(self.line_amount_attrs)),
+            )
@@ -0,0 +1,87 @@
+import logging
+import traceback
+from datetime import timedelta
+from django.db.models import F
+from django.utils import timezone
+from django.utils.module_loading import autodiscover_modules
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+_registry = {}
+
+
+def task(name):
+    """Register fn(job, **payload) as the handler for jobs called name."""
+    def decorator(fn):
+        _registry[name] = fn
+        return fn
+    return decorator
+
+
+def autodiscover():
+    # Each app declares its job handlers in a tasks module
+    autodiscover_modules('tasks')
+
+
+def enqueue(name, payload=None, max_attempts=3, run_after=None):
+    return Job.objects.create(
+        name=name,
+        payload=payload or {},
+        max_attempts=max_attempts,
+        run_after=run_after or timezone.now(),
+    )
+
+
+def claim_jobs(limit):
+    """Atomically move up to limit due jobs from QUEUED to RUNNING and return their ids."""
+    now = timezone.now()
+    candidates = Job.objects.filter(status='QUEUED', run_after__lte=now).order_by('id').values_list('id', flat=True)[:limit]
+    claimed = []
+    for job_id in candidates:
+        # The conditional update makes claiming safe across competing workers
+        updated = Job.objects.filter(pk=job_id, status='QUEUED').update(
+            status='RUNNING', started_at=now, attempts=F('attempts') + 1
+        )
+        if updated:
+            claimed.append(job_id)
+    return claimed
+
+
+def requeue_stale(older_than):
+    """Return jobs left RUNNING by a worker that died to the queue."""
+    cutoff = timezone.now() - older_than
+    return Job.objects.filter(status='RUNNING', started_at__lt=cutoff).update(status='QUEUED')
+
+
+def release_jobs(job_ids, error):
+    """
+    Return claimed jobs whose worker process died to the queue. A job that has used
+    up its attempts is failed instead, so one that keeps killing workers stops.
+    """
+    running = Job.objects.filter(pk__in=job_ids, status='RUNNING')
+    running.filter(attempts__gte=F('max_attempts')).update(status='FAILED', error=error, finished_at=timezone.now())
+    return running.update(status='QUEUED', error=error)
+
+
+def run_job(job_id):
+    """Run one claimed job. Safe to call in a worker process."""
+    job = Job.objects.get(pk=job_id)
+    handler = _registry.get(job.name)
+    try:
+        if handler is None:
+            raise LookupError(f"No task registered for '{job.name}'.")
+        result = handler(job, **job.payload)
+    except Exception:
+        error = traceback.format_exc()
+        logger.error(f"Job {job.id} ({job.name}) failed on attempt {job.attempts}: {error}")
+        if job.attempts < job.max_attempts:
+            backoff = timedelta(seconds=30 * 2 ** (job.attempts - 1))
+            Job.objects.filter(pk=job.pk).update(status='QUEUED', error=error, run_after=timezone.now() + backoff)
+        else:
+            Job.objects.filter(pk=job.pk).update(status='FAILED', error=error, finished_at=timezone.now())
+        return False
+    Job.objects.filter(pk=job.pk).update(
+        status='DONE', progress=100, result=result, error='', finished_at=timezone.now()
+    )
+    return True
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from core import search
+
+
+class Command(BaseCommand):
+    help = "Rebuild the full-text search index for products, customers and suppliers."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        if not search.supported():
+            self.stdout.write(self.style.WARNING("This database has no search index; searches use icontains."))
+            return
+        count = search.rebuild(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Indexed {count} documents."))
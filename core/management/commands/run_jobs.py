@@ -0,0 +1,94 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.db import connections
+from core import jobs
+
+
+def _init_worker():
+    import django
+    from django.apps import apps
+    if not apps.ready:
+        django.setup()
+    # Never share the parent's database connections with a forked child
+    connections.close_all()
+    jobs.autodiscover()
+
+
+def _run(job_id):
+    try:
+        return jobs.run_job(job_id)
+    finally:
+        connections.close_all()
+
+
+class Command(BaseCommand):
+    help = "Run queued background jobs in a process pool."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 2, help="Worker processes.")
+        parser.add_argument('--poll', type=float, default=2.0, help="Seconds between queue polls when idle.")
+        parser.add_argument('--once', action='store_true', help="Exit once the queue is empty.")
+        parser.add_argument(
+            '--stale-after', type=int, default=60,
+            help="Requeue jobs left RUNNING for this many minutes by a dead worker.",
+        )
+
+    def handle(self, *args, **options):
+        jobs.autodiscover()
+        requeued = jobs.requeue_stale(timedelta(minutes=options['stale_after']))
+        if requeued:
+            self.stdout.write(f"Requeued {requeued} stale job(s).")
+
+        workers = max(1, options['workers'])
+        running = {}
+        pool = self.start_pool(workers)
+        try:
+            while True:
+                free = workers - len(running)
+                if free:
+                    for job_id in jobs.claim_jobs(free):
+                        running[pool.submit(_run, job_id)] = job_id
+                        self.stdout.write(f"Started job {job_id}")
+                if not running:
+                    if options['once']:
+                        break
+                    time.sleep(options['poll'])
+                    continue
+                done, _ = wait(running, timeout=options['poll'], return_when=FIRST_COMPLETED)
+                lost = []
+                for future in done:
+                    job_id = running.pop(future)
+                    try:
+                        ok = future.result()
+                    except BrokenProcessPool:
+                        lost.append(job_id)
+                        continue
+                    except Exception as e:
+                        self.stderr.write(f"Job {job_id} could not run: {e}")
+                        jobs.release_jobs([job_id], str(e))
+                        continue
+                    self.stdout.write(f"Job {job_id} {'finished' if ok else 'failed'}")
+                if lost:
+                    # A worker process died, which takes the pool down with every job on it;
+                    # each counts as an attempt, so a job that keeps killing workers runs out
+                    lost += running.values()
+                    running.clear()
+                    requeued = jobs.release_jobs(lost, "Worker process died while the job was running.")
+                    self.stderr.write(
+                        f"Worker pool broke running job(s) {', '.join(map(str, sorted(lost)))}; "
+                        f"requeued {requeued}, restarting the pool."
+                    )
+                    pool.shutdown(wait=True, cancel_futures=True)
+                    pool = self.start_pool(workers)
+        finally:
+            pool.shutdown(wait=True, cancel_futures=True)
+        self.stdout.write(self.style.SUCCESS("Job queue empty."))
+
+    def start_pool(self, workers):
+        # Never fork while holding database connections
+        connections.close_all()
+        return ProcessPoolExecutor(max_workers=workers, initializer=_init_worker)
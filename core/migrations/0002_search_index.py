@@ -0,0 +1,64 @@
+from django.db import migrations
+
+# Documents per kind: (kind code, kind, table, title column, body columns)
+SOURCES = [
+    (1, 'product', 'product_product', 'name', ['barcode', 'model', 'serial_number', 'details']),
+    (2, 'customer', 'customer_customer', 'customer_name', ['phone', 'mobile', 'vat_no', 'email']),
+    (3, 'supplier', 'supplier_supplier', 'supplier_name', ['phone', 'mobile', 'vat', 'email']),
+]
+
+
+def _body(columns):
+    return " || ' ' || ".join(f"COALESCE({column}, '')" for column in columns)
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute(
+            "CREATE VIRTUAL TABLE core_search_index USING fts5("
+            "kind UNINDEXED, object_id UNINDEXED, title, body, "
+            "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+        )
+        for code, kind, table, title, body in SOURCES:
+            schema_editor.execute(
+                f"INSERT INTO core_search_index (rowid, kind, object_id, title, body) "
+                f"SELECT id * 4 + {code}, '{kind}', id, {title}, {_body(body)} FROM {table}"
+            )
+    elif vendor == 'postgresql':
+        schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        schema_editor.execute(
+            "CREATE TABLE core_search_index ("
+            "kind varchar(20) NOT NULL, object_id bigint NOT NULL, "
+            "title text NOT NULL, body text NOT NULL, "
+            "document tsvector GENERATED ALWAYS AS ("
+            "setweight(to_tsvector('simple', title), 'A') || setweight(to_tsvector('simple', body), 'B')"
+            ") STORED, "
+            "PRIMARY KEY (kind, object_id))"
+        )
+        schema_editor.execute("CREATE INDEX core_search_index_document ON core_search_index USING gin (document)")
+        schema_editor.execute("CREATE INDEX core_search_index_title_trgm ON core_search_index USING gin (title gin_trgm_ops)")
+        for code, kind, table, title, body in SOURCES:
+            schema_editor.execute(
+                f"INSERT INTO core_search_index (kind, object_id, title, body) "
+                f"SELECT '{kind}', id, {title}, {_body(body)} FROM {table}"
+            )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor in ('sqlite', 'postgresql'):
+        schema_editor.execute("DROP TABLE IF EXISTS core_search_index")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+        ('customer', '0001_initial'),
+        ('product', '0008_alter_product_supplier_delete_supplier'),
+        ('supplier', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
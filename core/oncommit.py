@@ -0,0 +1,89 @@
+"""
+Work collected per savepoint and applied once after commit.
+
+Audit entries, data-version bumps and stale cube days are collected while a
+transaction runs and written when it commits. collect() hands out one list per
+(purpose, savepoint) and registers it with transaction.on_commit() when it is
+created. Django discards the callbacks of a savepoint that rolls back, so only
+the items recorded inside that savepoint are lost. After the commit, the items
+of every surviving savepoint are applied together with a single call, in the
+order the savepoints were first used.
+
+Lists are held weakly: a callback Django has dropped frees its list, and the
+next collect() call in that savepoint, or the next transaction, starts afresh.
+"""
+import weakref
+from django.db import transaction
+
+
+class _Group:
+    """The lists of one purpose in one transaction."""
+
+    def __init__(self, apply):
+        self.apply = apply
+        self.batches = weakref.WeakValueDictionary()  # Savepoint ids -> _Batch
+        self.waiting = 0  # Registered batches that have neither run nor been dropped
+        self.items = []  # From batches that have run
+        self.applied = False
+
+    def settle(self):
+        # The last surviving batch of the transaction has run: apply everything at once
+        if self.waiting == 0 and not self.applied:
+            self.applied = True
+            items, self.items = self.items, []
+            self.apply(items)
+
+
+class _State:
+    def __init__(self):
+        self.ran = False
+
+
+class _Batch:
+    def __init__(self, group):
+        self.group = group
+        self.items = []
+        self.state = _State()
+        group.waiting += 1
+        weakref.finalize(self, _dropped, group, self.state)
+
+    def __call__(self):
+        if self.state.ran:
+            return
+        self.state.ran = True
+        self.group.waiting -= 1
+        self.group.items.extend(self.items)
+        self.group.settle()
+
+
+def _dropped(group, state):
+    # Freed without running: its savepoint or transaction rolled back
+    if not state.ran:
+        group.waiting -= 1
+        if group.items:
+            group.settle()
+
+
+def collect(name, apply, using=None):
+    """
+    Return the list collecting name's items in the current savepoint, or None
+    outside a transaction (the caller then applies its items right away). After
+    the outermost commit, apply(items) is called once with the items of every
+    savepoint that was not rolled back.
+    """
+    connection = transaction.get_connection(using)
+    if not connection.in_atomic_block:
+        return None
+    groups = getattr(connection, '_on_commit_groups', None)
+    if groups is None:
+        groups = connection._on_commit_groups = {}
+    group = groups.get(name)
+    if group is None or group.applied or not group.batches:
+        group = groups[name] = _Group(apply)
+    # Savepoint ids are unique within a transaction, so sibling savepoints never share a list
+    key = tuple(connection.savepoint_ids)
+    batch = group.batches.get(key)
+    if batch is None or batch.state.ran:
+        batch = group.batches[key] = _Batch(group)
+        transaction.on_commit(batch, using=using)
+    return batch.items
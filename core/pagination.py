@@ -0,0 +1,116 @@
+import base64
+import json
+from django.db.models import Q
+
+
+def encode_cursor(values):
+    """Encode a list of sort-key values as an opaque, URL-safe cursor."""
+    raw = json.dumps(values, separators=(',', ':'), default=str).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Decode a cursor made by encode_cursor, raising ValueError if it is malformed."""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor.")
+    if not isinstance(values, list):
+        raise ValueError("Invalid cursor.")
+    return values
+
+
+class KeysetPage:
+    def __init__(self, object_list, next_cursor, previous_cursor, start_index):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+        self.start_index = start_index
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+class KeysetPaginator:
+    """
+    Paginate a queryset by seeking past the last row seen instead of counting and offsetting.
+
+    ordering lists non-null field names (prefix '-' for descending); the primary key is
+    appended as a tie-breaker so the sort is total. Each page runs a single indexed
+    query for per_page + 1 rows, so deep pages cost the same as the first one. Cursors
+    are opaque strings carrying the direction, the row position (for numbering only)
+    and the sort key of the boundary row.
+    """
+
+    def __init__(self, queryset, ordering=(), per_page=25):
+        self.queryset = queryset
+        self.ordering = [field for field in ordering if field.lstrip('-') not in ('id', 'pk')] + ['pk']
+        self.per_page = per_page
+
+    def get_page(self, cursor=None):
+        """Return the page for a cursor; a missing or invalid cursor gives the first page."""
+        direction, start, key = 'n', 0, None
+        if cursor:
+            try:
+                values = decode_cursor(cursor)
+                direction, start, key = values[0], int(values[1]), values[2:]
+                if direction not in ('n', 'p') or len(key) != len(self.ordering):
+                    raise ValueError("Invalid cursor.")
+            except (ValueError, TypeError, IndexError):
+                direction, start, key = 'n', 0, None
+
+        backwards = direction == 'p'
+        ordering = [self._flip(field) for field in self.ordering] if backwards else self.ordering
+        queryset = self.queryset.order_by(*ordering)
+        if key is not None:
+            queryset = queryset.filter(self._seek(ordering, key))
+
+        rows = list(queryset[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if backwards:
+            rows.reverse()
+            start = max(start - len(rows), 0) if has_more else 0
+
+        # Going forwards there are earlier rows whenever a cursor was followed; going
+        # backwards there are always later rows, the ones the cursor came from
+        more_after = has_more if not backwards else True
+        more_before = has_more if backwards else key is not None
+        next_cursor = previous_cursor = None
+        if rows:
+            if more_after:
+                next_cursor = encode_cursor(['n', start + len(rows)] + self._key(rows[-1]))
+            if more_before:
+                previous_cursor = encode_cursor(['p', start] + self._key(rows[0]))
+        return KeysetPage(rows, next_cursor, previous_cursor, start)
+
+    @staticmethod
+    def _flip(field):
+        return field[1:] if field.startswith('-') else f'-{field}'
+
+    def _key(self, obj):
+        return [getattr(obj, field.lstrip('-')) for field in self.ordering]
+
+    @staticmethod
+    def _seek(ordering, key):
+        # (a, b, pk) > (x, y, z) expanded into OR-ed prefixes, honouring each field's direction
+        condition = Q()
+        for i, field in enumerate(ordering):
+            name = field.lstrip('-')
+            step = Q(**{f'{name}__lt' if field.startswith('-') else f'{name}__gt': key[i]})
+            for prev_field, value in zip(ordering[:i], key[:i]):
+                step &= Q(**{prev_field.lstrip('-'): value})
+            condition |= step
+        return condition
@@ -0,0 +1,86 @@
+"""
+Minimal PDF writer built on Pillow, for printable documents such as invoices.
+
+Pages are drawn as A4 bitmaps at 150 dpi and saved with Pillow's PDF encoder, so
+no extra PDF library is needed. Text flows top to bottom; add_row() lays out
+fixed-width columns and starts a new page when the current one is full.
+"""
+import io
+from PIL import Image, ImageDraw, ImageFont
+
+DPI = 150
+PAGE_SIZE = (1240, 1754)  # A4 at 150 dpi
+MARGIN = 90
+
+_fonts = {}
+
+
+def get_font(size, bold=False):
+    key = (size, bold)
+    if key not in _fonts:
+        try:
+            _fonts[key] = ImageFont.truetype('DejaVuSans-Bold.ttf' if bold else 'DejaVuSans.ttf', size)
+        except OSError:
+            _fonts[key] = ImageFont.load_default(size)
+    return _fonts[key]
+
+
+class PdfDocument:
+    def __init__(self):
+        self.pages = []
+        self.new_page()
+
+    @property
+    def width(self):
+        return PAGE_SIZE[0] - 2 * MARGIN
+
+    def new_page(self):
+        page = Image.new('RGB', PAGE_SIZE, 'white')
+        self.pages.append(page)
+        self.draw = ImageDraw.Draw(page)
+        self.y = MARGIN
+
+    def _ensure_space(self, height):
+        if self.y + height > PAGE_SIZE[1] - MARGIN:
+            self.new_page()
+
+    def add_text(self, text, size=22, bold=False, align='left', spacing=8):
+        font = get_font(size, bold)
+        self._ensure_space(size + spacing)
+        x = MARGIN
+        if align != 'left':
+            text_width = self.draw.textlength(text, font=font)
+            x = MARGIN + (self.width - text_width if align == 'right' else (self.width - text_width) / 2)
+        self.draw.text((x, self.y), text, fill='black', font=font)
+        self.y += size + spacing
+
+    def add_row(self, values, widths, size=20, bold=False, aligns=None, spacing=10):
+        """Draw one table row; widths are fractions of the printable width."""
+        font = get_font(size, bold)
+        self._ensure_space(size + spacing)
+        x = MARGIN
+        aligns = aligns or ['left'] * len(values)
+        for value, width, align in zip(values, widths, aligns):
+            column = self.width * width
+            text = str(value)
+            # Trim text that would run into the next column
+            while text and self.draw.textlength(text, font=font) > column - 10:
+                text = text[:-1]
+            offset = column - 10 - self.draw.textlength(text, font=font) if align == 'right' else 0
+            self.draw.text((x + offset, self.y), text, fill='black', font=font)
+            x += column
+        self.y += size + spacing
+
+    def add_rule(self, spacing=12):
+        self._ensure_space(spacing * 2)
+        self.y += spacing // 2
+        self.draw.line((MARGIN, self.y, PAGE_SIZE[0] - MARGIN, self.y), fill='#999999', width=2)
+        self.y += spacing
+
+    def add_space(self, height=20):
+        self.y += height
+
+    def to_bytes(self):
+        buffer = io.BytesIO()
+        self.pages[0].save(buffer, 'PDF', resolution=DPI, save_all=True, append_images=self.pages[1:])
+        return buffer.getvalue()
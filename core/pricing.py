@@ -0,0 +1,139 @@
+"""
+Line and header pricing shared by purchases, purchase orders and sales.
+
+    discount_value = quantity * rate * discount_percent / 100
+    vat_value      = (quantity * rate - discount_value) * vat_percent / 100
+    total          = quantity * rate - discount_value + vat_value
+
+Each amount is rounded to cents with ROUND_HALF_UP before it is used in the next
+step. The stored line columns are database-generated from the same formulas
+(line_amount_fields), so a line priced here always matches its stored columns.
+Header totals are summed from the rounded lines.
+"""
+from collections import namedtuple
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+from django.db.models import BigIntegerField, Case, DecimalField, F, GeneratedField, Sum, Value, When
+from django.db.models.functions import Cast, Round
+from django.db.models.lookups import GreaterThanOrEqual
+
+CENTS = Decimal('0.01')
+HUNDRED = Decimal('100')
+
+LineAmounts = namedtuple('LineAmounts', ['discount_value', 'vat_value', 'total'])
+HeaderTotals = namedtuple(
+    'HeaderTotals', ['items_total', 'total_discount', 'total_vat', 'net_total', 'due_amount']
+)
+
+
+def to_decimal(value):
+    """Convert a number or numeric string to Decimal; None and '' count as zero."""
+    if isinstance(value, Decimal):
+        return value
+    if value is None or value == '':
+        return Decimal('0')
+    try:
+        # str() keeps floats like 0.1 from turning into 0.1000000000000000055...
+        return Decimal(str(value))
+    except InvalidOperation:
+        raise ValueError(f"'{value}' is not a number.")
+
+
+def money(value):
+    return to_decimal(value).quantize(CENTS, rounding=ROUND_HALF_UP)
+
+
+def price_lines(lines):
+    """
+    Price a batch of (quantity, rate, discount_percent, vat_percent) tuples.
+
+    Returns a list of LineAmounts in the same order. Raises ValueError if any value
+    is not a number.
+    """
+    priced = []
+    for quantity, rate, discount_percent, vat_percent in lines:
+        gross = to_decimal(quantity) * to_decimal(rate)
+        discount_value = money(gross * to_decimal(discount_percent) / HUNDRED)
+        vat_value = money((gross - discount_value) * to_decimal(vat_percent) / HUNDRED)
+        priced.append(LineAmounts(discount_value, vat_value, money(gross - discount_value + vat_value)))
+    return priced
+
+
+def price_line(quantity, rate, discount_percent=0, vat_percent=0):
+    return price_lines([(quantity, rate, discount_percent, vat_percent)])[0]
+
+
+def _round_half_up(units, divisor):
+    """Integer expression: units / divisor rounded half away from zero, as ROUND_HALF_UP does."""
+    half = Value(divisor // 2)
+    return Case(
+        When(GreaterThanOrEqual(units, 0), then=(units + half) / Value(divisor)),
+        default=-((half - units) / Value(divisor)),
+        output_field=BigIntegerField(),
+    )
+
+
+def _hundredths(field):
+    # Rounding first keeps SQLite's float storage (34.999...) from truncating
+    return Cast(Round(F(field) * 100), BigIntegerField())
+
+
+def line_amount_fields(quantity='quantity', rate='rate'):
+    """
+    Return stored GeneratedFields (discount_value, vat_value, total) for a line model.
+
+    The database computes them with the same formulas and rounding as price_lines(),
+    so bulk_create() and QuerySet.update() can never leave a stale amount behind.
+    SQLite has no exact decimal type and ROUND() is floating point, so every value
+    is taken as an integer count of hundredths and rounded half-up with integer
+    division; both SQLite and PostgreSQL divide integers by truncating. The
+    intermediate products stay within 64 bits for any line whose total fits its
+    column. Each
+    expression is spelled out in full because a generated column cannot refer to
+    another generated column.
+    """
+    gross = _hundredths(quantity) * _hundredths(rate)  # In 1/10000ths
+    discount = _round_half_up(gross * _hundredths('discount_percent'), 10 ** 6)  # In cents
+    net = gross - discount * Value(100)
+    vat = _round_half_up(net * _hundredths('vat_percent'), 10 ** 6)
+    total = _round_half_up(net + vat * Value(100), 100)
+    return tuple(
+        GeneratedField(
+            expression=cents * Value(CENTS),
+            output_field=DecimalField(max_digits=10, decimal_places=2),
+            db_persist=True,
+        )
+        for cents in (discount, vat, total)
+    )
+
+
+def line_sums(queryset):
+    """Sum the stored line amounts of a queryset in one query, returned as a single LineAmounts."""
+    sums = queryset.aggregate(
+        discount_value=Sum('discount_value'), vat_value=Sum('vat_value'), total=Sum('total'),
+    )
+    return LineAmounts(*(to_decimal(sums[name]) for name in LineAmounts._fields))
+
+
+def header_totals(lines, discount=0, shipping_cost=0, paid_amount=0):
+    """
+    Sum priced lines (LineAmounts or line model instances) into header totals.
+
+    items_total is the sum of line totals, VAT included. net_total subtracts the
+    header discount and adds shipping. total_discount covers line and header
+    discounts. Purchases and purchase orders store net_total as their grand_total;
+    sales store items_total as grand_total and net_total separately.
+    """
+    items_total = total_discount = total_vat = Decimal('0')
+    for line in lines:
+        items_total += to_decimal(line.total)
+        total_discount += to_decimal(line.discount_value)
+        total_vat += to_decimal(line.vat_value)
+    discount = to_decimal(discount)
+    net_total = items_total - discount + to_decimal(shipping_cost)
+    return HeaderTotals(
+        items_total=money(items_total),
+        total_discount=money(total_discount + discount),
+        total_vat=money(total_vat),
+        net_total=money(net_total),
+        due_amount=money(net_total - to_decimal(paid_amount)),
+    )
@@ -0,0 +1,245 @@
+"""
+On-demand request profiling.
+
+ProfilingMiddleware runs cProfile around a request when a staff user adds
+?_profile=1 to the URL, or for a random settings.PROFILE_SAMPLE_RATE fraction of
+requests (default 0, i.e. never). Every SQL statement the request runs is timed
+as well. Each profile is saved to settings.PROFILE_DIR (default 'profiles' under
+BASE_DIR, or the temp directory) as two files sharing a name: <name>.prof, a
+pstats dump that snakeviz or `python -m pstats` can open, and <name>.json with
+the request, its timings and its SQL. Only the newest settings.PROFILE_KEEP
+profiles (default 200) are kept. Staff can browse them at profile_list.
+
+Enable it in settings:
+
+    MIDDLEWARE += ['core.profiling.ProfilingMiddleware']
+
+For async views cProfile only sees the event loop thread; the SQL timings still
+cover queries run through sync_to_async.
+"""
+import cProfile
+import io
+import json
+import logging
+import os
+import pstats
+import random
+import re
+import tempfile
+import time
+from contextlib import ExitStack
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+TRIGGER_PARAM = '_profile'
+MAX_QUERIES = 500  # Statements kept per profile; the totals still count every one
+NAME_PATTERN = re.compile(r'^[\w-]+$')
+
+
+def profile_dir():
+    default = os.path.join(getattr(settings, 'BASE_DIR', None) or tempfile.gettempdir(), 'profiles')
+    return str(getattr(settings, 'PROFILE_DIR', default))
+
+
+def _sample_rate():
+    return float(getattr(settings, 'PROFILE_SAMPLE_RATE', 0))
+
+
+def _keep():
+    return getattr(settings, 'PROFILE_KEEP', 200)
+
+
+def _sampled():
+    rate = _sample_rate()
+    return rate > 0 and random.random() < rate
+
+
+def should_profile(request):
+    # The user is only loaded when the trigger parameter is present
+    if TRIGGER_PARAM in request.GET:
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_staff:
+            return True
+    return _sampled()
+
+
+async def ashould_profile(request):
+    if TRIGGER_PARAM in request.GET and hasattr(request, 'auser'):
+        user = await request.auser()
+        if user.is_staff:
+            return True
+    return _sampled()
+
+
+class _QueryTimer:
+    """Database execute wrapper that records each statement's duration."""
+
+    def __init__(self):
+        self.queries = []
+        self.count = 0
+        self.total = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - start
+            self.count += 1
+            self.total += duration
+            if len(self.queries) < MAX_QUERIES:
+                self.queries.append({
+                    'alias': context['connection'].alias,
+                    'sql': sql,
+                    'many': many,
+                    'ms': round(duration * 1000, 3),
+                })
+
+
+class _Session:
+    def __init__(self, request):
+        self.request = request
+        self.profiler = cProfile.Profile()
+        self.timer = _QueryTimer()
+        self.stack = ExitStack()
+
+    def __enter__(self):
+        for connection in connections.all():
+            self.stack.enter_context(connection.execute_wrapper(self.timer))
+        self.started = time.perf_counter()
+        try:
+            self.profiler.enable()
+        except ValueError:
+            # Another profile is already running in this thread (concurrent async requests)
+            self.profiler = None
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.profiler is not None:
+            self.profiler.disable()
+        self.elapsed = time.perf_counter() - self.started
+        self.stack.close()
+        return False
+
+    def save(self, response):
+        if self.profiler is None:
+            return
+        # Profiling must never turn a successful request into an error
+        try:
+            save_profile(self.request, response, self.profiler, self.timer, self.elapsed)
+        except Exception:
+            logger.exception(f"Could not save profile for {self.request.path}")
+
+
+def save_profile(request, response, profiler, timer, elapsed):
+    directory = profile_dir()
+    os.makedirs(directory, exist_ok=True)
+    now = timezone.now()
+    slug = re.sub(r'[^\w]+', '-', request.path).strip('-')[:60] or 'root'
+    name = f"{now:%Y%m%d-%H%M%S-%f}-{slug}"
+    profiler.dump_stats(os.path.join(directory, f"{name}.prof"))
+
+    user = getattr(request, 'user', None)
+    meta = {
+        'name': name,
+        'created_at': now,
+        'method': request.method,
+        'path': request.get_full_path(),
+        'user': user.get_username() if user is not None and user.is_authenticated else '',
+        'status': getattr(response, 'status_code', None),
+        'total_ms': round(elapsed * 1000, 3),
+        'sql_count': timer.count,
+        'sql_ms': round(timer.total * 1000, 3),
+        'queries': timer.queries,
+    }
+    with open(os.path.join(directory, f"{name}.json"), 'w') as fh:
+        json.dump(meta, fh, cls=DjangoJSONEncoder)
+    _prune(directory)
+    logger.info(f"Profiled {request.method} {request.path}: {meta['total_ms']} ms, {timer.count} queries -> {name}")
+
+
+def _prune(directory):
+    names = sorted(f[:-5] for f in os.listdir(directory) if f.endswith('.json'))
+    for name in names[:max(len(names) - _keep(), 0)]:
+        for suffix in ('.json', '.prof'):
+            try:
+                os.remove(os.path.join(directory, name + suffix))
+            except FileNotFoundError:
+                pass
+
+
+def recent_profiles(limit=100):
+    """Metadata of the newest saved profiles, newest first, without their query lists."""
+    directory = profile_dir()
+    if not os.path.isdir(directory):
+        return []
+    profiles = []
+    for filename in sorted((f for f in os.listdir(directory) if f.endswith('.json')), reverse=True)[:limit]:
+        try:
+            with open(os.path.join(directory, filename)) as fh:
+                meta = json.load(fh)
+        except (OSError, ValueError):
+            continue
+        meta.pop('queries', None)
+        profiles.append(meta)
+    return profiles
+
+
+def profile_path(name, suffix):
+    """Path of a saved profile file, or None if the name is not a valid profile name."""
+    if not NAME_PATTERN.match(name):
+        return None
+    path = os.path.join(profile_dir(), name + suffix)
+    return path if os.path.exists(path) else None
+
+
+def load_profile(name, sort='cumulative', limit=40):
+    """Return (metadata, pstats text, SQL grouped by statement) for a saved profile, or None."""
+    meta_path, prof_path = profile_path(name, '.json'), profile_path(name, '.prof')
+    if meta_path is None or prof_path is None:
+        return None
+    with open(meta_path) as fh:
+        meta = json.load(fh)
+    out = io.StringIO()
+    pstats.Stats(prof_path, stream=out).strip_dirs().sort_stats(sort).print_stats(limit)
+
+    grouped = {}
+    for query in meta.get('queries', []):
+        group = grouped.setdefault(query['sql'], {'sql': query['sql'], 'count': 0, 'ms': 0.0})
+        group['count'] += 1
+        group['ms'] += query['ms']
+    statements = sorted(grouped.values(), key=lambda group: group['ms'], reverse=True)
+    return meta, out.getvalue(), statements
+
+
+class ProfilingMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not should_profile(request):
+            return self.get_response(request)
+        with _Session(request) as session:
+            response = self.get_response(request)
+        session.save(response)
+        return response
+
+    async def __acall__(self, request):
+        if not await ashould_profile(request):
+            return await self.get_response(request)
+        with _Session(request) as session:
+            response = await self.get_response(request)
+        session.save(response)
+        return response
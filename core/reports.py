@@ -0,0 +1,226 @@
+"""
+Period reports computed in the database from stored line amounts.
+
+vat_return() sums the stored vat_value of sale and purchase lines per VAT rate
+with one grouped query per side (plus one over the archive when the period
+reaches into a closed period), so a return over any number of lines reads only
+a handful of rows into Python.
+
+margin_report() does the same for gross margin: revenue net of VAT against the
+unit cost each sale line captured when it was posted, grouped by sale, product,
+category, customer or month.
+"""
+import csv
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from django.db.models import Count, DateField, DecimalField, ExpressionWrapper, F, Q, Sum, Value
+from django.db.models.functions import Coalesce, TruncMonth
+from django.utils import timezone
+from purchase.models import ArchivedPurchaseItem, PurchaseItem
+from purchaseorder.models import PurchaseOrderItem
+from sale.cube import dimension_labels
+from sale.models import ArchivedSaleItem, SaleItem
+from stock.archive import closed_through
+from .pricing import money, to_decimal
+
+
+VAT_COLUMNS = ('sales_net', 'output_vat', 'purchases_net', 'input_vat', 'net_payable', 'on_order_vat')
+MARGIN_BY = ('product', 'category', 'customer', 'sale', 'month')
+MARGIN_COLUMNS = ('quantity', 'revenue', 'cost', 'margin', 'margin_percent')
+SALE_ROWS = 1000  # Sales listed by margin_report(by='sale'), largest revenue first
+
+
+def parse_period(data, today):
+    """Read start and end dates from a QueryDict, defaulting to the previous calendar month; raises ValueError."""
+    last_month_end = today.replace(day=1) - timedelta(days=1)
+    start = date.fromisoformat(data['start']) if data.get('start') else last_month_end.replace(day=1)
+    end = date.fromisoformat(data['end']) if data.get('end') else last_month_end
+    if start > end:
+        raise ValueError("The start date is after the end date.")
+    return start, end
+
+
+def _by_rate(lines):
+    """{vat_percent: (net, vat, count)} for a line queryset, in one grouped query."""
+    rows = (
+        lines.values('vat_percent')
+        .annotate(net=Sum(F('total') - F('vat_value')), vat=Sum('vat_value'), count=Count('pk'))
+        .order_by()
+    )
+    return {to_decimal(row['vat_percent']): (to_decimal(row['net']), to_decimal(row['vat']), row['count']) for row in rows}
+
+
+def _sources(live, archived, start, end, closed_end):
+    """The live and/or archived line querysets that can hold lines dated in [start, end]."""
+    sources = []
+    if closed_end is None or end > closed_end:
+        sources.append(live)
+    if closed_end is not None and start <= closed_end:
+        sources.append(archived)
+    return sources
+
+
+def vat_return(start, end):
+    """
+    VAT return for documents dated in [start, end]: output VAT on sales, input VAT
+    on purchases and the net payable, per VAT rate. VAT on purchase orders still
+    marked ORDERED is shown for reference only; it becomes input VAT when the
+    goods are posted as a purchase.
+
+    Returns {'start', 'end', 'rates': [one dict per rate, lowest first], 'totals'}.
+    """
+    rates = {}
+    closed_end = closed_through()
+
+    def add(lines, net_name, vat_name):
+        for percent, (net, vat, count) in _by_rate(lines).items():
+            rate = rates.setdefault(percent, dict({name: Decimal('0') for name in VAT_COLUMNS}, rate=percent, lines=0))
+            if net_name:
+                rate[net_name] += net
+            rate[vat_name] += vat
+            rate['lines'] += count
+
+    for lines in _sources(
+        SaleItem.objects.filter(sale__date__date__gte=start, sale__date__date__lte=end),
+        ArchivedSaleItem.objects.filter(sale_date__gte=start, sale_date__lte=end),
+        start, end, closed_end,
+    ):
+        add(lines, 'sales_net', 'output_vat')
+    for lines in _sources(
+        PurchaseItem.objects.filter(purchase__purchase_date__gte=start, purchase__purchase_date__lte=end),
+        ArchivedPurchaseItem.objects.filter(purchase_date__gte=start, purchase_date__lte=end),
+        start, end, closed_end,
+    ):
+        add(lines, 'purchases_net', 'input_vat')
+    add(
+        PurchaseOrderItem.objects.filter(
+            purchase_order__status='ORDERED',
+            purchase_order__purchase_date__gte=start, purchase_order__purchase_date__lte=end,
+        ),
+        None, 'on_order_vat',
+    )
+
+    rows = [rates[percent] for percent in sorted(rates)]
+    for row in rows:
+        row['net_payable'] = row['output_vat'] - row['input_vat']
+    totals = {name: sum((row[name] for row in rows), Decimal('0')) for name in VAT_COLUMNS}
+    return {'start': start, 'end': end, 'rates': rows, 'totals': totals}
+
+
+def write_vat_return_csv(vat, out):
+    writer = csv.writer(out)
+    writer.writerow(['VAT return', vat['start'].isoformat(), vat['end'].isoformat()])
+    writer.writerow(['VAT rate %', 'Sales (net)', 'Output VAT', 'Purchases (net)', 'Input VAT', 'Net payable', 'VAT on open orders'])
+    for row in vat['rates']:
+        writer.writerow([money(row['rate']), *(money(row[name]) for name in VAT_COLUMNS)])
+    writer.writerow(['Total', *(money(vat['totals'][name]) for name in VAT_COLUMNS)])
+
+
+def _day_bounds(start, end):
+    """Aware datetimes bounding the local days [start, end], so Sale.date filters can use its index."""
+    return (
+        timezone.make_aware(datetime.combine(start, time.min)),
+        timezone.make_aware(datetime.combine(end + timedelta(days=1), time.min)),
+    )
+
+
+def _margin_rows(lines, limit=None):
+    """Margin measures of lines grouped by their 'key' annotation, in one grouped query."""
+    cost = ExpressionWrapper(F('quantity') * F('unit_cost'), output_field=DecimalField(max_digits=16, decimal_places=2))
+    rows = (
+        lines.values('key')
+        .annotate(
+            quantity_sum=Sum('quantity'), revenue_sum=Sum(F('total') - F('vat_value')), cost_sum=Sum(cost),
+            uncosted=Count('pk', filter=Q(unit_cost__isnull=True)),
+        )
+        .annotate(margin=F('revenue_sum') - Coalesce(F('cost_sum'), Value(Decimal('0')), output_field=DecimalField()))
+        .order_by('-margin')
+    )
+    # One extra row tells the caller the list was cut short
+    return rows[:limit + 1] if limit else rows
+
+
+def margin_report(start, end, by='product'):
+    """
+    Gross margin of sale lines dated in [start, end], grouped by one of MARGIN_BY.
+    Revenue is the line total net of VAT (after line discounts, before the
+    sale-level discount); cost is quantity times the line's unit_cost. Lines with
+    no recorded cost count towards revenue only and are reported as uncosted.
+
+    Returns {'start', 'end', 'by', 'rows': [...], 'totals', 'truncated'}; rows are
+    ordered by margin, largest first, except by='month' which is chronological.
+    """
+    if by not in MARGIN_BY:
+        raise ValueError(f"Unknown grouping '{by}'.")
+    live_keys = {
+        'product': F('product_id'), 'category': F('product__category_id'), 'customer': F('sale__customer_id'),
+        'sale': F('sale_id'), 'month': TruncMonth('sale__date', output_field=DateField()),
+    }
+    archived_keys = dict(live_keys, month=TruncMonth('sale_date'))
+    since, until = _day_bounds(start, end)
+    # A sale's lines are all live or all archived, so limiting each side keeps the overall top rows
+    limit = SALE_ROWS if by == 'sale' else None
+
+    sources = _sources(
+        SaleItem.objects.filter(sale__date__gte=since, sale__date__lt=until).annotate(key=live_keys[by]),
+        ArchivedSaleItem.objects.filter(sale_date__gte=start, sale_date__lte=end).annotate(key=archived_keys[by]),
+        start, end, closed_through(),
+    )
+    rows = _merge_margin_rows(_margin_rows(lines, limit) for lines in sources)
+    if by == 'month':
+        rows.sort(key=lambda row: row['key'])
+    else:
+        rows.sort(key=lambda row: row['margin'], reverse=True)
+    truncated = limit is not None and len(rows) > limit
+    if truncated:
+        rows = rows[:limit]
+        # The listed sales are only the top ones; total the whole period separately
+        totals = _merge_margin_rows(_margin_rows(lines.annotate(key=Value(0))) for lines in sources)[0]
+        del totals['key']
+    else:
+        totals = {name: sum((row[name] for row in rows), Decimal('0')) for name in ('quantity', 'revenue', 'cost')}
+        totals['uncosted'] = sum(row['uncosted'] for row in rows)
+        _add_margin(totals)
+
+    if by in ('product', 'category', 'customer'):
+        labels = dimension_labels(by, [row['key'] for row in rows])
+        for row in rows:
+            row['label'] = labels.get(row['key'], '-')
+    else:
+        for row in rows:
+            row['label'] = f"Sale {row['key']}" if by == 'sale' else row['key'].strftime('%b %Y')
+    return {'start': start, 'end': end, 'by': by, 'rows': rows, 'totals': totals, 'truncated': truncated}
+
+
+def _merge_margin_rows(groups):
+    """Sum rows from several _margin_rows() results by key, adding margin and margin_percent."""
+    merged = {}
+    for rows in groups:
+        for row in rows:
+            entry = merged.setdefault(row['key'], {
+                'key': row['key'], 'quantity': Decimal('0'), 'revenue': Decimal('0'), 'cost': Decimal('0'), 'uncosted': 0,
+            })
+            entry['quantity'] += to_decimal(row['quantity_sum'])
+            entry['revenue'] += to_decimal(row['revenue_sum'])
+            entry['cost'] += to_decimal(row['cost_sum'])
+            entry['uncosted'] += row['uncosted']
+    rows = list(merged.values())
+    for row in rows:
+        _add_margin(row)
+    return rows
+
+
+def _add_margin(row):
+    row['margin'] = row['revenue'] - row['cost']
+    row['margin_percent'] = (row['margin'] * 100 / row['revenue']).quantize(Decimal('0.01')) if row['revenue'] else None
+
+
+def write_margin_report_csv(report, out):
+    writer = csv.writer(out)
+    writer.writerow(['Gross margin', report['start'].isoformat(), report['end'].isoformat()])
+    writer.writerow([report['by'].capitalize(), 'Quantity', 'Revenue (net)', 'Cost', 'Margin', 'Margin %', 'Lines without cost'])
+    for row in [*report['rows'], dict(report['totals'], label='Total')]:
+        writer.writerow([
+            row['label'], row['quantity'], money(row['revenue']), money(row['cost']), money(row['margin']),
+            '' if row['margin_percent'] is None else row['margin_percent'], row['uncosted'],
+        ])
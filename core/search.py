@@ -0,0 +1,210 @@
+"""
+Ranked full-text search over products, customers and suppliers.
+
+Documents live in one table, core_search_index, created by core migration 0002.
+On SQLite it is an FTS5 virtual table ranked with bm25(). On PostgreSQL it is a
+regular table with a stored tsvector column (GIN-indexed) plus a pg_trgm index on
+the title for fuzzy matches. Signals in core.signals keep it in sync. Bulk
+writers should call index_objects() themselves, because bulk_create sends no
+signals. Other database backends fall back to icontains queries.
+"""
+import re
+from django.db import DEFAULT_DB_ALIAS, connection, connections, router
+from django.db.models.expressions import RawSQL
+from django.urls import reverse
+from customer.models import Customer
+from product.models import Product
+from supplier.models import Supplier
+
+TABLE = 'core_search_index'
+KINDS = {'product': 1, 'customer': 2, 'supplier': 3}
+PAGE_SIZE = 20
+# Title columns matched with icontains on backends without an index
+FALLBACK_FIELDS = {
+    'product': (Product, 'name'),
+    'customer': (Customer, 'customer_name'),
+    'supplier': (Supplier, 'supplier_name'),
+}
+
+
+def _document(obj):
+    """Return (kind, title, body) for an indexable instance."""
+    if isinstance(obj, Product):
+        return 'product', obj.name, ' '.join(filter(None, [obj.barcode, obj.model, obj.serial_number, obj.details]))
+    if isinstance(obj, Customer):
+        return 'customer', obj.customer_name, ' '.join(filter(None, [obj.phone, obj.mobile, obj.vat_no, obj.email]))
+    if isinstance(obj, Supplier):
+        return 'supplier', obj.supplier_name, ' '.join(filter(None, [obj.phone, obj.mobile, obj.vat, obj.email]))
+    raise TypeError(f"{type(obj).__name__} is not searchable")
+
+
+def _rowid(kind, object_id):
+    # A deterministic rowid lets FTS5 rows be replaced without scanning
+    return object_id * 4 + KINDS[kind]
+
+
+def _tokens(query):
+    return re.findall(r'\w+', query.lower())
+
+
+def _read_connection():
+    # The index mirrors these models, so its reads follow them (to the replica in replica views)
+    return connections[router.db_for_read(Product) or DEFAULT_DB_ALIAS]
+
+
+def supported():
+    return connection.vendor in ('sqlite', 'postgresql')
+
+
+def index_objects(objs):
+    objs = [obj for obj in objs if obj.pk is not None]
+    if not objs or not supported():
+        return
+    docs = [(kind, obj.pk, title or '', body or '') for obj in objs for kind, title, body in [_document(obj)]]
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            rowids = [_rowid(kind, object_id) for kind, object_id, _, _ in docs]
+            cursor.execute(f"DELETE FROM {TABLE} WHERE rowid IN ({', '.join(['%s'] * len(rowids))})", rowids)
+            cursor.executemany(
+                f"INSERT INTO {TABLE} (rowid, kind, object_id, title, body) VALUES (%s, %s, %s, %s, %s)",
+                [(_rowid(kind, object_id), kind, object_id, title, body) for kind, object_id, title, body in docs],
+            )
+        else:
+            cursor.executemany(
+                f"INSERT INTO {TABLE} (kind, object_id, title, body) VALUES (%s, %s, %s, %s) "
+                f"ON CONFLICT (kind, object_id) DO UPDATE SET title = EXCLUDED.title, body = EXCLUDED.body",
+                docs,
+            )
+
+
+def remove_object(kind, object_id):
+    if not supported():
+        return
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute(f"DELETE FROM {TABLE} WHERE rowid = %s", [_rowid(kind, object_id)])
+        else:
+            cursor.execute(f"DELETE FROM {TABLE} WHERE kind = %s AND object_id = %s", [kind, object_id])
+
+
+def rebuild(batch_size=1000):
+    """Re-index every searchable row and return the number indexed."""
+    if not supported():
+        return 0
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {TABLE}")
+    count = 0
+    for model in (Product, Customer, Supplier):
+        batch = []
+        for obj in model.objects.order_by('pk').iterator(chunk_size=batch_size):
+            batch.append(obj)
+            if len(batch) >= batch_size:
+                index_objects(batch)
+                count += len(batch)
+                batch = []
+        index_objects(batch)
+        count += len(batch)
+    return count
+
+
+def search(query, kind=None, page=1, page_size=PAGE_SIZE):
+    """
+    Return (results, has_next) for one page of ranked matches.
+
+    Every query token must match, either as a word prefix or (PostgreSQL) by trigram
+    similarity on the title. Each result is a dict with kind, id, title, url and rank.
+    """
+    tokens = _tokens(query)
+    if not tokens:
+        return [], False
+    offset = (max(page, 1) - 1) * page_size
+    kind_filter = kind if kind in KINDS else None
+
+    reader = _read_connection()
+    if reader.vendor == 'sqlite':
+        match = ' '.join(f'"{token}"*' for token in tokens)
+        sql = (
+            f"SELECT kind, object_id, title, bm25({TABLE}, 0.0, 0.0, 10.0, 1.0) AS rank "
+            f"FROM {TABLE} WHERE {TABLE} MATCH %s"
+        )
+        params = [match]
+        if kind_filter:
+            sql += " AND kind = %s"
+            params.append(kind_filter)
+        sql += " ORDER BY rank LIMIT %s OFFSET %s"
+        params += [page_size + 1, offset]
+    elif reader.vendor == 'postgresql':
+        tsquery = ' & '.join(f'{token}:*' for token in tokens)
+        text = ' '.join(tokens)
+        sql = (
+            f"SELECT kind, object_id, title, "
+            f"ts_rank(document, to_tsquery('simple', %s)) + similarity(title, %s) AS rank "
+            f"FROM {TABLE} WHERE (document @@ to_tsquery('simple', %s) OR title %% %s)"
+        )
+        params = [tsquery, text, tsquery, text]
+        if kind_filter:
+            sql += " AND kind = %s"
+            params.append(kind_filter)
+        sql += " ORDER BY rank DESC LIMIT %s OFFSET %s"
+        params += [page_size + 1, offset]
+    else:
+        return _fallback_search(tokens, kind_filter, offset, page_size)
+
+    with reader.cursor() as cursor:
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()
+    has_next = len(rows) > page_size
+    return [_result(kind, object_id, title, rank) for kind, object_id, title, rank in rows[:page_size]], has_next
+
+
+def filter_matching(queryset, query, kind):
+    """
+    Narrow queryset (of kind's model) to every row matching query, for list views
+    that keep their own ordering. The index is read in a subquery of the same SQL
+    statement, so nothing is ranked, limited or loaded into Python.
+    """
+    tokens = _tokens(query)
+    if not tokens:
+        return queryset.none()
+    vendor = connections[queryset.db].vendor
+    if vendor == 'sqlite':
+        ids = RawSQL(
+            f"SELECT object_id FROM {TABLE} WHERE {TABLE} MATCH %s AND kind = %s",
+            [' '.join(f'"{token}"*' for token in tokens), kind],
+        )
+    elif vendor == 'postgresql':
+        ids = RawSQL(
+            f"SELECT object_id FROM {TABLE} "
+            f"WHERE (document @@ to_tsquery('simple', %s) OR title %% %s) AND kind = %s",
+            [' & '.join(f'{token}:*' for token in tokens), ' '.join(tokens), kind],
+        )
+    else:
+        field = FALLBACK_FIELDS[kind][1]
+        for token in tokens:
+            queryset = queryset.filter(**{f'{field}__icontains': token})
+        return queryset
+    return queryset.filter(pk__in=ids)
+
+
+def _result(kind, object_id, title, rank):
+    url_names = {'product': 'update_product', 'customer': 'update_customer', 'supplier': 'update_supplier'}
+    return {
+        'kind': kind,
+        'id': object_id,
+        'title': title,
+        'url': reverse(url_names[kind], args=[object_id]),
+        'rank': round(abs(float(rank or 0)), 4),
+    }
+
+
+def _fallback_search(tokens, kind, offset, page_size):
+    results = []
+    for name, (model, field) in FALLBACK_FIELDS.items():
+        if kind and kind != name:
+            continue
+        queryset = model.objects.all()
+        for token in tokens:
+            queryset = queryset.filter(**{f'{field}__icontains': token})
+        results += [_result(name, pk, title, 0) for pk, title in queryset.values_list('pk', field)[:offset + page_size + 1]]
+    page = results[offset:offset + page_size + 1]
+    return page[:page_size], len(page) > page_size
@@ -0,0 +1,60 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from customer.models import Customer
+from product.models import Product
+from supplier.models import Supplier
+from . import audit, search, versioning
+from .softdelete import soft_deleted
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_save, sender=Customer)
+@receiver(post_save, sender=Supplier)
+def index_search_document(sender, instance, raw=False, **kwargs):
+    if not raw and instance.deleted_at is None:
+        search.index_objects([instance])
+
+
+@receiver(post_delete, sender=Product)
+@receiver(post_delete, sender=Customer)
+@receiver(post_delete, sender=Supplier)
+def remove_search_document(sender, instance, **kwargs):
+    search.remove_object(search._document(instance)[0], instance.pk)
+
+
+@receiver(soft_deleted)
+def remove_soft_deleted(sender, pks, **kwargs):
+    kind = search._document(sender())[0]
+    for pk in pks:
+        search.remove_object(kind, pk)
+    domains = versioning.DOMAIN_MODELS.get(sender._meta.label_lower)
+    if domains:
+        versioning.bump(*domains)
+    if audit.audited(sender):
+        audit.record_soft_delete(sender, pks)
+
+
+@receiver(post_save)
+@receiver(post_delete)
+def bump_data_version(sender, raw=False, **kwargs):
+    domains = versioning.DOMAIN_MODELS.get(sender._meta.label_lower)
+    if domains and not raw:
+        versioning.bump(*domains)
+
+
+@receiver(pre_save)
+def remember_audited_row(sender, instance, raw=False, **kwargs):
+    if not raw and audit.audited(sender):
+        audit.remember(instance)
+
+
+@receiver(post_save)
+def audit_save(sender, instance, created, raw=False, **kwargs):
+    if not raw and audit.audited(sender):
+        audit.record_save(instance, created)
+
+
+@receiver(post_delete)
+def audit_delete(sender, instance, **kwargs):
+    if audit.audited(sender):
+        audit.record_delete(instance)
@@ -0,0 +1,86 @@
+"""
+Soft delete for products, customers and suppliers.
+
+Deleting one of them only stamps deleted_at, which hides it from the default
+manager (Model.objects); all_objects still sees every row, and foreign keys from
+existing documents keep resolving. Soft-deletable rows that would have cascaded
+(a supplier's products) are stamped in the same request with one UPDATE.
+
+The rows themselves, and everything that cascades from them, are removed later by
+the core.purge job (see core.tasks), which deletes in chunks of
+settings.SOFT_DELETE_PURGE_CHUNK rows (default 500) so no single statement holds
+long locks. It runs settings.SOFT_DELETE_PURGE_DAYS days (default 30) after the
+delete.
+"""
+from datetime import timedelta
+from django.conf import settings
+from django.db import models, transaction
+from django.dispatch import Signal
+from django.utils import timezone
+from . import jobs
+
+# Sent with sender=model and pks=[...] whenever rows are soft-deleted
+soft_deleted = Signal()
+
+
+def purge_chunk_size():
+    return getattr(settings, 'SOFT_DELETE_PURGE_CHUNK', 500)
+
+
+def purge_delay():
+    return timedelta(days=getattr(settings, 'SOFT_DELETE_PURGE_DAYS', 30))
+
+
+class ActiveManager(models.Manager):
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted_at__isnull=True)
+
+
+class SoftDeleteModel(models.Model):
+    deleted_at = models.DateTimeField(null=True, blank=True, editable=False, db_index=True)
+
+    objects = ActiveManager()
+    all_objects = models.Manager()
+
+    class Meta:
+        abstract = True
+
+    def soft_delete(self):
+        """Hide this row (and its soft-deletable cascades) now and schedule the purge; returns the purge Job."""
+        now = timezone.now()
+        with transaction.atomic():
+            type(self).all_objects.filter(pk=self.pk).update(deleted_at=now)
+            self.deleted_at = now
+            soft_deleted.send(sender=type(self), pks=[self.pk])
+            for relation in self._meta.related_objects:
+                related = relation.related_model
+                if getattr(relation, 'on_delete', None) is models.CASCADE and issubclass(related, SoftDeleteModel):
+                    children = related.objects.filter(**{relation.field.name: self})
+                    pks = list(children.values_list('pk', flat=True))
+                    if pks:
+                        related.all_objects.filter(pk__in=pks).update(deleted_at=now)
+                        soft_deleted.send(sender=related, pks=pks)
+            return jobs.enqueue(
+                'core.purge', {'model': self._meta.label_lower, 'pk': self.pk},
+                run_after=now + purge_delay(),
+            )
+
+
+def purge_rows(queryset, chunk_size):
+    """
+    Delete every row of queryset, chunk_size rows at a time, returning the number of
+    rows deleted. Cascading rows are purged first, chunk by chunk, so each DELETE
+    (and the signals it sends) only ever touches a bounded number of rows.
+    """
+    model = queryset.model
+    deleted = 0
+    while True:
+        pks = list(queryset.order_by('pk').values_list('pk', flat=True)[:chunk_size])
+        if not pks:
+            return deleted
+        for relation in model._meta.related_objects:
+            if getattr(relation, 'on_delete', None) is models.CASCADE:
+                children = relation.related_model._base_manager.filter(**{f'{relation.field.name}__in': pks})
+                deleted += purge_rows(children, chunk_size)
+        with transaction.atomic():
+            deleted += model._base_manager.filter(pk__in=pks).delete()[0]
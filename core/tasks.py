@@ -0,0 +1,11 @@
+from django.apps import apps
+from .jobs import task
+from .softdelete import purge_chunk_size, purge_rows
+
+
+@task('core.purge')
+def purge_soft_deleted(job, model, pk):
+    """Permanently delete a soft-deleted row and everything that cascades from it, in chunks."""
+    rows = apps.get_model(model).all_objects.filter(pk=pk, deleted_at__isnull=False)
+    deleted = purge_rows(rows, purge_chunk_size())
+    return {'model': model, 'pk': pk, 'deleted': deleted}
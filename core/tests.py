@@ -1,3 +1,166 @@
-from django.test import TestCase
+import itertools
+from decimal import Decimal
+from django.contrib.auth.models import User
+from django.contrib.sessions.models import Session
+from django.db import transaction
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from core import db_routers, jobs
+from core.db_routers import ReplicaRouter
+from core.models import AuditEntry, Job
+from core.pricing import price_lines
+from customer.models import Customer
+from product.models import Category, Product, Unit
+from sale.models import Sale, SaleItem
+from stock.levels import default_location
+from supplier.models import Supplier
 
-# Create your tests here.
+
+def make_product(name='Widget', barcode=None, **fields):
+    supplier = Supplier.objects.get_or_create(supplier_name='Acme')[0]
+    category = Category.objects.get_or_create(name='General', status='Active')[0]
+    unit = Unit.objects.get_or_create(name='pcs', status='Active')[0]
+    fields = dict({'sale_price': Decimal('10.00'), 'cost_price': Decimal('6.00')}, **fields)
+    return Product.objects.create(
+        barcode=barcode or name, name=name, category=category, supplier=supplier, unit=unit, **fields,
+    )
+
+
+class LineAmountParityTests(TestCase):
+    """The database-generated line amounts must match price_lines() to the cent."""
+
+    QUANTITIES = ('1', '1.5', '3', '0.25', '7.33', '12')
+    RATES = ('0.05', '0.35', '0.70', '1.25', '12.45', '19.99', '333.33')
+    DISCOUNTS = ('0', '2.5', '12.5', '15', '33.33', '50')
+    VATS = ('0', '2.5', '5', '7.5', '10', '15', '20')
+
+    def test_generated_columns_match_price_lines(self):
+        product = make_product()
+        sale = Sale.objects.create(customer=Customer.objects.create(customer_name='Bob'), location=default_location())
+        grid = [
+            tuple(Decimal(value) for value in values)
+            for values in itertools.product(self.QUANTITIES, self.RATES, self.DISCOUNTS, self.VATS)
+        ]
+        SaleItem.objects.bulk_create([
+            SaleItem(sale=sale, product=product, quantity=q, rate=r, discount_percent=d, vat_percent=v)
+            for q, r, d, v in grid
+        ])
+        stored = SaleItem.objects.filter(sale=sale).order_by('id').values_list('discount_value', 'vat_value', 'total')
+        mismatches = [
+            (inputs, tuple(row), tuple(expected))
+            for inputs, row, expected in zip(grid, stored, price_lines(grid))
+            if tuple(row) != tuple(expected)
+        ]
+        self.assertEqual(mismatches, [])
+
+    def test_known_half_cent_cases(self):
+        product = make_product()
+        sale = Sale.objects.create(customer=Customer.objects.create(customer_name='Bob'), location=default_location())
+        for quantity, rate, discount, vat, expected in (
+            ('1.5', '0.35', '50', '0', ('0.26', '0.00', '0.27')),
+            ('3', '0.70', '50', '10', ('1.05', '0.11', '1.16')),
+            ('1.5', '12.45', '15', '2.5', ('2.80', '0.40', '16.28')),
+        ):
+            item = SaleItem.objects.create(
+                sale=sale, product=product, quantity=quantity, rate=rate, discount_percent=discount, vat_percent=vat,
+            )
+            item.refresh_from_db()
+            self.assertEqual((item.discount_value, item.vat_value, item.total), tuple(Decimal(v) for v in expected))
+
+
+class AuditRollbackTests(TestCase):
+    def setUp(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product = make_product()
+
+    def updates(self):
+        return list(
+            AuditEntry.objects.filter(model='product.product', object_id=str(self.product.pk), action='UPDATE')
+            .values_list('changes', flat=True)
+        )
+
+    def test_rolled_back_savepoint_is_not_logged(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                self.product.name = 'Outer'
+                self.product.save()
+                try:
+                    with transaction.atomic():
+                        self.product.sale_price = Decimal('99')
+                        self.product.save()
+                        raise RuntimeError
+                except RuntimeError:
+                    pass
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.sale_price, Decimal('10.00'))
+        self.assertEqual(self.updates(), [{'name': ['Widget', 'Outer']}])
+
+    def test_released_savepoint_is_logged_in_order(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                self.product.name = 'First'
+                self.product.save()
+                with transaction.atomic():
+                    self.product.name = 'Second'
+                    self.product.save()
+                try:
+                    with transaction.atomic():
+                        self.product.sale_price = Decimal('99')
+                        self.product.save()
+                        raise RuntimeError
+                except RuntimeError:
+                    self.product.sale_price = Decimal('10.00')
+                self.product.name = 'Third'
+                self.product.save()
+        self.assertEqual(self.updates(), [{'name': ['Widget', 'Third']}])
+
+    def test_rolled_back_transaction_is_not_logged(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    self.product.name = 'Gone'
+                    self.product.save()
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+            with transaction.atomic():
+                self.product.name = 'Kept'
+                self.product.save()
+        self.assertEqual(self.updates(), [{'name': ['Widget', 'Kept']}])
+
+
+class ReleaseJobsTests(TestCase):
+    def test_lost_jobs_are_requeued_until_out_of_attempts(self):
+        retry, spent = jobs.enqueue('dev.retry', max_attempts=2), jobs.enqueue('dev.spent', max_attempts=1)
+        self.assertEqual(jobs.claim_jobs(2), [retry.pk, spent.pk])
+        self.assertEqual(jobs.release_jobs([retry.pk, spent.pk], 'Worker died'), 1)
+        self.assertEqual(
+            dict(Job.objects.values_list('name', 'status')), {'dev.retry': 'QUEUED', 'dev.spent': 'FAILED'},
+        )
+
+
+@override_settings(REPLICA_DATABASE='default')
+class ReplicaRouterTests(TestCase):
+    def test_sessions_and_auth_stay_on_the_primary(self):
+        router = ReplicaRouter()
+        token = db_routers._reading_from_replica.set(True)
+        try:
+            self.assertEqual(router.db_for_read(Product), 'default')
+            self.assertIsNone(router.db_for_read(Session))
+            self.assertIsNone(router.db_for_read(User))
+        finally:
+            db_routers._reading_from_replica.reset(token)
+
+
+@override_settings(TERMINAL_API_TOKENS={'till-1': 'till-secret'})
+class ApiAuthTests(TestCase):
+    ENDPOINTS = ('api_products', 'api_stock_levels', 'api_sales', 'api_purchase_orders')
+
+    def test_read_endpoints_require_a_terminal_token(self):
+        make_product()
+        for name in self.ENDPOINTS:
+            self.assertEqual(self.client.get(reverse(name)).status_code, 401)
+            self.assertEqual(self.client.get(reverse(name), HTTP_AUTHORIZATION='Bearer wrong').status_code, 401)
+            response = self.client.get(reverse(name), HTTP_AUTHORIZATION='Bearer till-secret')
+            self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'], [])
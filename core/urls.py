@@ -0,0 +1,17 @@
+from django.urls import path
+from . import api, views
+
+urlpatterns = [
+    path('api/products/', api.products, name='api_products'),
+    path('api/stock/', api.stock_levels, name='api_stock_levels'),
+    path('api/sales/', api.sales, name='api_sales'),
+    path('api/sales/batch/', api.sale_batch, name='api_sale_batch'),
+    path('api/purchase-orders/', api.purchase_orders, name='api_purchase_orders'),
+    path('search/', views.global_search, name='global_search'),
+    path('jobs/<int:pk>/', views.job_status, name='job_status'),
+    path('reports/profit/', views.profit_report, name='profit_report'),
+    path('reports/vat/', views.vat_tax_report, name='vat_tax_report'),
+    path('profiles/', views.profile_list, name='profile_list'),
+    path('profiles/<str:name>/', views.profile_detail, name='profile_detail'),
+    path('profiles/<str:name>/download/', views.profile_download, name='profile_download'),
+]
@@ -0,0 +1,94 @@
+"""
+Per-domain data versions for conditional GET.
+
+Every write to a model listed in DOMAIN_MODELS bumps the version of its domains
+(see core.signals); bulk writers that skip signals call bump() themselves. Views
+wrapped in @conditional(...) answer If-None-Match / If-Modified-Since from those
+counters alone, so an unchanged page returns 304 without querying the movement
+tables.
+"""
+import hashlib
+from django.db.models import F
+from django.utils import timezone
+from django.views.decorators.http import condition
+from . import oncommit
+from .models import DataVersion
+
+# Model label -> domains whose pages change when a row of that model is written
+DOMAIN_MODELS = {
+    'product.product': ('products', 'stock'),
+    'product.category': ('products',),
+    'product.unit': ('products',),
+    'customer.customer': ('customers', 'sales'),
+    'supplier.supplier': ('suppliers', 'purchases'),
+    'purchase.purchase': ('purchases', 'stock'),
+    'purchase.purchaseitem': ('purchases', 'stock'),
+    'purchaseorder.purchaseorder': ('purchases',),
+    'purchaseorder.purchaseorderitem': ('purchases',),
+    'sale.sale': ('sales', 'stock'),
+    'sale.saleitem': ('sales', 'stock'),
+    'stock.location': ('stock',),
+    'stock.stocktransfer': ('stock',),
+    'stock.stocktransferitem': ('stock',),
+}
+
+
+def bump(*domains):
+    """
+    Mark domains as changed. Inside a transaction the bumps are coalesced and written
+    after commit, so concurrent writers never queue on the version rows.
+    """
+    pending = oncommit.collect('data_versions', _write)
+    if pending is None:
+        _write(domains)
+    else:
+        pending.extend(domains)
+
+
+def _write(domains):
+    now = timezone.now()
+    for domain in set(domains):
+        updated = DataVersion.objects.filter(domain=domain).update(version=F('version') + 1, updated_at=now)
+        if not updated:
+            DataVersion.objects.get_or_create(domain=domain, defaults={'version': 1, 'updated_at': now})
+
+
+def current(domains):
+    """Return {domain: (version, updated_at)} for the given domains in one query."""
+    rows = DataVersion.objects.filter(domain__in=domains).values_list('domain', 'version', 'updated_at')
+    return {domain: (version, updated_at) for domain, version, updated_at in rows}
+
+
+def conditional(*domains):
+    """
+    Decorate a view so its ETag and Last-Modified derive from the domain versions.
+
+    The ETag also covers the full path (filters, cursor, as-of date) and the user, so
+    different query strings and users never share a validator. Pages with pending
+    flash messages are always rendered in full.
+    """
+    def _versions(request):
+        if not hasattr(request, '_data_versions'):
+            request._data_versions = current(domains)
+        return request._data_versions
+
+    def _has_messages(request):
+        storage = getattr(request, '_messages', None)
+        return storage is not None and len(storage) > 0
+
+    def etag(request, *args, **kwargs):
+        if _has_messages(request):
+            return None
+        versions = _versions(request)
+        user = getattr(request, 'user', None)
+        parts = [f"{domain}:{versions.get(domain, (0, None))[0]}" for domain in domains]
+        parts += [request.get_full_path(), str(user.pk if user is not None and user.is_authenticated else '')]
+        return hashlib.sha1('|'.join(parts).encode()).hexdigest()
+
+    def last_modified(request, *args, **kwargs):
+        if _has_messages(request):
+            return None
+        stamps = [updated_at for _, updated_at in _versions(request).values()]
+        return max(stamps) if stamps else None
+
+    return condition(etag_func=etag, last_modified_func=last_modified)
@@ -0,0 +1,100 @@
+from django.contrib import messages
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import FileResponse, Http404, HttpResponse, JsonResponse
+from django.shortcuts import get_object_or_404, render
+from django.utils import timezone
+from . import profiling, reports, search
+from .db_routers import use_replica
+from .models import Job
+
+def job_status(request, pk):
+    job = get_object_or_404(Job, pk=pk)
+    return JsonResponse({
+        'id': job.id,
+        'name': job.name,
+        'status': job.status,
+        'progress': job.progress,
+        'message': job.message,
+        'result': job.result,
+        'error': job.error.strip().splitlines()[-1] if job.error else '',
+        'attempts': job.attempts,
+    })
+
+
+@use_replica
+def global_search(request):
+    query = request.GET.get('q', '').strip()
+    kind = request.GET.get('type') or None
+    if kind is not None and kind not in search.KINDS:
+        return JsonResponse({'error': f"Unknown type '{kind}'."}, status=400)
+    try:
+        page = max(int(request.GET.get('page', 1)), 1)
+    except ValueError:
+        return JsonResponse({'error': "page must be a positive integer."}, status=400)
+    results, has_next = search.search(query, kind=kind, page=page)
+    return JsonResponse({'query': query, 'page': page, 'has_next': has_next, 'results': results})
+
+
+@staff_member_required
+def profile_list(request):
+    return render(request, 'profile_list.html', {
+        'profiles': profiling.recent_profiles(),
+        'profile_dir': profiling.profile_dir(),
+    })
+
+
+@staff_member_required
+def profile_detail(request, name):
+    sort = request.GET.get('sort', 'cumulative')
+    if sort not in ('cumulative', 'tottime', 'ncalls'):
+        sort = 'cumulative'
+    loaded = profiling.load_profile(name, sort=sort)
+    if loaded is None:
+        raise Http404("Profile not found.")
+    meta, stats, statements = loaded
+    return render(request, 'profile_detail.html', {
+        'profile': meta, 'stats': stats, 'statements': statements, 'sort': sort,
+    })
+
+
+@staff_member_required
+def profile_download(request, name):
+    path = profiling.profile_path(name, '.prof')
+    if path is None:
+        raise Http404("Profile not found.")
+    return FileResponse(open(path, 'rb'), as_attachment=True, filename=f"{name}.prof")
+
+
+@use_replica
+def vat_tax_report(request):
+    try:
+        start, end = reports.parse_period(request.GET, timezone.localdate())
+    except ValueError:
+        messages.error(request, "Invalid dates. Showing the previous month.")
+        start, end = reports.parse_period({}, timezone.localdate())
+    vat = reports.vat_return(start, end)
+    if request.GET.get('export') == 'csv':
+        response = HttpResponse(content_type='text/csv')
+        response['Content-Disposition'] = f'attachment; filename="vat-return-{start}-{end}.csv"'
+        reports.write_vat_return_csv(vat, response)
+        return response
+    return render(request, 'vat_tax_report.html', {'vat': vat})
+
+
+@use_replica
+def profit_report(request):
+    try:
+        start, end = reports.parse_period(request.GET, timezone.localdate())
+    except ValueError:
+        messages.error(request, "Invalid dates. Showing the previous month.")
+        start, end = reports.parse_period({}, timezone.localdate())
+    by = request.GET.get('by', 'product')
+    if by not in reports.MARGIN_BY:
+        by = 'product'
+    report = reports.margin_report(start, end, by)
+    if request.GET.get('export') == 'csv':
+        response = HttpResponse(content_type='text/csv')
+        response['Content-Disposition'] = f'attachment; filename="gross-margin-{by}-{start}-{end}.csv"'
+        reports.write_margin_report_csv(report, response)
+        return response
+    return render(request, 'profit_report.html', {'report': report, 'groupings': reports.MARGIN_BY})
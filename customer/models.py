@@ -1,8 +1,9 @@
 
 # Create your models here.
 from django.db import models
+from core.softdelete import SoftDeleteModel
 
-class Customer(models.Model):
+class Customer(SoftDeleteModel):
     customer_name = models.CharField(max_length=100)
     email = models.EmailField(blank=True, null=True)
     address = models.CharField(max_length=255, blank=True, null=True)
@@ -1,4 +1,6 @@
 from django.shortcuts import render, redirect, get_object_or_404
+from core.pagination import KeysetPaginator
+from core.versioning import conditional
 from .models import Customer
 
 # Create your views here.
@@ -38,8 +40,9 @@ def add_customer(request):
         return redirect('customer_list')
     return render(request, 'add_customer.html')
 
+@conditional('customers')
 def customer_list(request):
-    customers = Customer.objects.all()
+    customers = KeysetPaginator(Customer.objects.all(), per_page=25).get_page(request.GET.get('cursor'))
     updated_customer = request.session.pop('updated_customer', None)
     deleted_customer = request.session.pop('deleted_customer', None)
     return render(request, 'customer_list.html', {
@@ -76,7 +79,8 @@ def delete_customer(request, pk):
     customer = get_object_or_404(Customer, pk=pk)
     if request.method == 'POST':
         customer_name = customer.customer_name
-        customer.delete()
+        # Hidden now; the row and its sales are purged later by a background job
+        customer.soft_delete()
         request.session['deleted_customer'] = customer_name
         return redirect('customer_list')
     return redirect('customer_list')
\ No newline at end of file
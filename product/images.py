@@ -0,0 +1,91 @@
+"""
+Resized renditions of product images.
+
+Each upload gets a small set of renditions (RENDITIONS x FORMATS) stored next to
+the originals under deterministic names, so they can be generated at upload time,
+lazily on first use, or in bulk by `manage.py generate_thumbnails`, and always land
+on the same file.
+"""
+import hashlib
+import io
+import logging
+import posixpath
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+RENDITION_DIR = 'products img/renditions'
+RENDITIONS = {
+    'thumb': (64, 64),
+    'card': (320, 320),
+}
+FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+
+def rendition_name(image_name, size, fmt):
+    """Storage name of one rendition; it depends only on the source name."""
+    stem = posixpath.splitext(posixpath.basename(image_name))[0][:40]
+    digest = hashlib.sha1(image_name.encode()).hexdigest()[:12]
+    width, height = RENDITIONS[size]
+    return f"{RENDITION_DIR}/{stem}-{digest}-{width}x{height}.{'jpg' if fmt == 'jpeg' else fmt}"
+
+
+def generate_renditions(image_name, force=False):
+    """Create any missing renditions for a stored image and return how many were written."""
+    wanted = [
+        (size, fmt) for size in RENDITIONS for fmt in FORMATS
+        if force or not default_storage.exists(rendition_name(image_name, size, fmt))
+    ]
+    if not wanted:
+        return 0
+
+    with default_storage.open(image_name, 'rb') as source:
+        original = Image.open(source)
+        original = ImageOps.exif_transpose(original)
+        original.load()
+
+    written = 0
+    for size, fmt in wanted:
+        image = original.copy()
+        image.thumbnail(RENDITIONS[size], Image.Resampling.LANCZOS)
+        pil_format, options = FORMATS[fmt]
+        if pil_format == 'JPEG' and image.mode not in ('RGB', 'L'):
+            image = image.convert('RGB')
+        elif image.mode not in ('RGB', 'RGBA', 'L'):
+            image = image.convert('RGBA')
+        buffer = io.BytesIO()
+        image.save(buffer, pil_format, **options)
+
+        name = rendition_name(image_name, size, fmt)
+        if default_storage.exists(name):
+            default_storage.delete(name)
+        default_storage.save(name, ContentFile(buffer.getvalue()))
+        written += 1
+    return written
+
+
+def delete_renditions(image_name):
+    for size in RENDITIONS:
+        for fmt in FORMATS:
+            name = rendition_name(image_name, size, fmt)
+            if default_storage.exists(name):
+                default_storage.delete(name)
+
+
+def rendition_url(product, size='thumb', fmt='webp'):
+    """URL of a product's rendition, generating it on first use. None if there is no usable image."""
+    if not product.image:
+        return None
+    name = rendition_name(product.image.name, size, fmt)
+    if not default_storage.exists(name):
+        try:
+            generate_renditions(product.image.name)
+        except (OSError, Image.DecompressionBombError) as e:
+            logger.warning(f"Could not create renditions for product {product.pk}: {e}")
+            return None
+    return default_storage.url(name)
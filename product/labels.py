@@ -0,0 +1,198 @@
+"""
+Printable barcode label sheets.
+
+Barcodes are encoded as Code 128 (code set B, which covers printable ASCII) and
+drawn with Pillow; rendered barcodes are cached by value, so a hundred labels of
+one product draw its barcode once. Labels are laid out LABELS_ACROSS x
+LABELS_DOWN to an A4 sheet at core.pdf's resolution and returned as a PDF, or as
+PNG pages (zipped when there is more than one).
+
+Sheets are independent, so a batch of more than POOL_MIN_SHEETS sheets is
+rendered in a process pool, one sheet per task. Models are imported inside the
+functions that read them, so a spawned worker can import this module before
+Django is set up.
+"""
+import io
+import os
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from PIL import Image, ImageDraw
+from django.db import connections
+from core.pdf import DPI, MARGIN, PAGE_SIZE, get_font
+
+LABELS_ACROSS = 3
+LABELS_DOWN = 8
+LABELS_PER_SHEET = LABELS_ACROSS * LABELS_DOWN
+POOL_MIN_SHEETS = 4
+MAX_LABELS = 5000
+FORMATS = ('pdf', 'png')
+
+MODULE_WIDTH = 2  # Pixels per narrow bar at 150 dpi (0.34 mm)
+BAR_HEIGHT = 80
+QUIET_ZONE = 10  # Modules of white on each side
+
+# Bar/space widths of Code 128 symbols 0-106 (103-105 are the start codes, 106 is stop)
+PATTERNS = (
+    '212222', '222122', '222221', '121223', '121322', '131222', '122213', '122312', '132212', '221213',
+    '221312', '231212', '112232', '122132', '122231', '113222', '123122', '123221', '223211', '221132',
+    '221231', '213212', '223112', '312131', '311222', '321122', '321221', '312212', '322112', '322211',
+    '212123', '212321', '232121', '111323', '131123', '131321', '112313', '132113', '132311', '211313',
+    '231113', '231311', '112133', '112331', '132131', '113123', '113321', '133121', '313121', '211331',
+    '231131', '213113', '213311', '213131', '311123', '311321', '331121', '312113', '312311', '332111',
+    '314111', '221411', '431111', '111224', '111422', '121124', '121421', '141122', '141221', '112214',
+    '112412', '122114', '122411', '142112', '142211', '241211', '221114', '413111', '241112', '134111',
+    '111242', '121142', '121241', '114212', '124112', '124211', '411212', '421112', '421211', '212141',
+    '214121', '412121', '111143', '111341', '131141', '114113', '114311', '411113', '411311', '113141',
+    '114131', '311141', '411131', '211412', '211214', '211232', '2331112',
+)
+START_B = 104
+STOP = 106
+
+
+def code128_widths(value):
+    """Bar and space widths (in modules) encoding value in Code 128B; raises ValueError on unsupported characters."""
+    if not value:
+        raise ValueError("Empty barcode.")
+    codes = []
+    for char in value:
+        if not 32 <= ord(char) <= 126:
+            raise ValueError(f"Barcode '{value}' has a character Code 128 cannot encode.")
+        codes.append(ord(char) - 32)
+    checksum = (START_B + sum(position * code for position, code in enumerate(codes, start=1))) % 103
+    return ''.join(PATTERNS[code] for code in (START_B, *codes, checksum, STOP))
+
+
+@lru_cache(maxsize=2048)
+def barcode_image(value, module_width=MODULE_WIDTH, height=BAR_HEIGHT):
+    """Greyscale image of value's barcode with quiet zones. Cached: treat the result as read-only."""
+    widths = code128_widths(value)
+    total = sum(int(width) for width in widths) + 2 * QUIET_ZONE
+    image = Image.new('L', (total * module_width, height), 255)
+    draw = ImageDraw.Draw(image)
+    x = QUIET_ZONE * module_width
+    for index, width in enumerate(widths):
+        span = int(width) * module_width
+        if index % 2 == 0:  # Patterns alternate bar, space, bar, ...
+            draw.rectangle((x, 0, x + span - 1, height - 1), fill=0)
+        x += span
+    return image
+
+
+def _fit(draw, text, font, width):
+    while text and draw.textlength(text, font=font) > width:
+        text = text[:-1]
+    return text
+
+
+def render_sheet(labels):
+    """Draw up to LABELS_PER_SHEET labels ({'barcode', 'name', 'price'}) on one greyscale A4 page."""
+    page = Image.new('L', PAGE_SIZE, 255)
+    draw = ImageDraw.Draw(page)
+    cell_width = (PAGE_SIZE[0] - 2 * MARGIN) // LABELS_ACROSS
+    cell_height = (PAGE_SIZE[1] - 2 * MARGIN) // LABELS_DOWN
+    name_font, small_font = get_font(20, bold=True), get_font(18)
+    for index, label in enumerate(labels):
+        left = MARGIN + (index % LABELS_ACROSS) * cell_width
+        top = MARGIN + (index // LABELS_ACROSS) * cell_height
+        inner = cell_width - 20
+        draw.text((left + 10, top + 8), _fit(draw, label['name'], name_font, inner), fill=0, font=name_font)
+
+        barcode = barcode_image(label['barcode'])
+        if barcode.width > inner:
+            # Long values get narrower bars rather than being cut off
+            barcode = barcode.resize((inner, barcode.height), Image.NEAREST)
+        page.paste(barcode, (left + (cell_width - barcode.width) // 2, top + 36))
+
+        caption_y = top + 36 + barcode.height + 4
+        draw.text((left + 10, caption_y), _fit(draw, label['barcode'], small_font, inner * 2 // 3), fill=0, font=small_font)
+        if label.get('price') is not None:
+            price = f"${label['price']}"
+            draw.text((left + cell_width - 10 - draw.textlength(price, font=small_font), caption_y), price, fill=0, font=small_font)
+    return page
+
+
+def _init_worker():
+    import django
+    from django.apps import apps
+    if not apps.ready:
+        django.setup()
+    # Rendering needs no database; drop any connections inherited from the parent
+    connections.close_all()
+
+
+def _render_sheet_bytes(labels):
+    # Raw pixels pickle back to the parent much faster than an Image
+    page = render_sheet(labels)
+    return page.tobytes()
+
+
+def render_sheets(labels, workers=None):
+    """Render labels onto as many sheets as they need, in a process pool for large batches."""
+    chunks = [labels[i:i + LABELS_PER_SHEET] for i in range(0, len(labels), LABELS_PER_SHEET)] or [[]]
+    if len(chunks) <= POOL_MIN_SHEETS:
+        return [render_sheet(chunk) for chunk in chunks]
+    # Forked workers must not inherit open database connections
+    connections.close_all()
+    with ProcessPoolExecutor(max_workers=max(1, workers or os.cpu_count() or 2), initializer=_init_worker) as pool:
+        return [Image.frombytes('L', PAGE_SIZE, data) for data in pool.map(_render_sheet_bytes, chunks)]
+
+
+def purchase_labels(purchase_id):
+    """[(product, quantity)] for each line of a purchase (archived lines once its period is closed)."""
+    from purchase.models import Purchase
+    from stock.archive import document_lines
+    purchase = Purchase.objects.get(pk=purchase_id)
+    return [(line.product, line.quantity) for line in document_lines(purchase).select_related('product').order_by('id')]
+
+
+def purchase_order_labels(order_id):
+    """[(product, quantity)] for a purchase order: the received quantity once goods arrive, else the ordered one."""
+    from purchaseorder.models import PurchaseOrder
+    order = PurchaseOrder.objects.get(pk=order_id)
+    return [
+        (item.product, item.received_quantity or item.ordered_quantity)
+        for item in order.items.select_related('product').order_by('id')
+    ]
+
+
+def product_labels(product_ids, copies=1):
+    """[(product, copies)] for a set of products, in the order given."""
+    from .models import Product
+    products = Product.objects.in_bulk(product_ids)
+    return [(products[pk], copies) for pk in product_ids if pk in products]
+
+
+def expand(products):
+    """Turn [(product, copies)] into one label dict per copy, skipping products without a barcode."""
+    labels = []
+    for product, copies in products:
+        copies = int(copies)
+        if product is None or not product.barcode or copies <= 0:
+            continue
+        # Check the count before building anything, so a huge copies value costs nothing
+        if len(labels) + copies > MAX_LABELS:
+            raise ValueError(f"At most {MAX_LABELS} labels can be printed at once.")
+        code128_widths(product.barcode)  # Fail before rendering anything
+        labels.extend([{'barcode': product.barcode, 'name': product.name, 'price': product.sale_price}] * copies)
+    return labels
+
+
+def render_labels(labels, fmt='pdf', workers=None):
+    """Return (content, content_type, extension) for a label batch in fmt ('pdf' or 'png')."""
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown format '{fmt}'.")
+    sheets = render_sheets(labels, workers)
+    buffer = io.BytesIO()
+    if fmt == 'pdf':
+        sheets[0].save(buffer, 'PDF', resolution=DPI, save_all=True, append_images=sheets[1:])
+        return buffer.getvalue(), 'application/pdf', 'pdf'
+    if len(sheets) == 1:
+        sheets[0].save(buffer, 'PNG', dpi=(DPI, DPI))
+        return buffer.getvalue(), 'image/png', 'png'
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for number, sheet in enumerate(sheets, start=1):
+            page = io.BytesIO()
+            sheet.save(page, 'PNG', dpi=(DPI, DPI))
+            archive.writestr(f"labels-{number:03d}.png", page.getvalue())
+    return buffer.getvalue(), 'application/zip', 'zip'
@@ -0,0 +1,46 @@
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from django.core.management.base import BaseCommand
+from django.db import connections
+from product.images import generate_renditions
+from product.models import Product
+
+
+def _init_worker():
+    import django
+    from django.apps import apps
+    if not apps.ready:
+        django.setup()
+    # Workers only touch storage; drop any database connections inherited from the parent
+    connections.close_all()
+
+
+def _render(image_name, force):
+    return generate_renditions(image_name, force=force)
+
+
+class Command(BaseCommand):
+    help = "Generate (or regenerate) resized renditions for every product image."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 2, help="Worker processes.")
+        parser.add_argument('--force', action='store_true', help="Rewrite renditions that already exist.")
+
+    def handle(self, *args, **options):
+        names = list(
+            Product.objects.exclude(image='').exclude(image__isnull=True)
+            .order_by('image').values_list('image', flat=True).distinct()
+        )
+        connections.close_all()
+        written = failed = 0
+        with ProcessPoolExecutor(max_workers=max(1, options['workers']), initializer=_init_worker) as pool:
+            futures = {pool.submit(_render, name, options['force']): name for name in names}
+            for future in as_completed(futures):
+                try:
+                    written += future.result()
+                except Exception as e:
+                    failed += 1
+                    self.stderr.write(f"{futures[future]}: {e}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Processed {len(names)} images: {written} renditions written, {failed} failed."
+        ))
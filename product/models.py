@@ -1,4 +1,5 @@
 from django.db import models
+from core.softdelete import SoftDeleteModel
 from supplier.models import Supplier
 
 class Category(models.Model):
@@ -19,7 +20,7 @@ class Unit(models.Model):
     def __str__(self):
         return self.name
 
-class Product(models.Model):
+class Product(SoftDeleteModel):
     barcode = models.CharField(max_length=100, unique=True)
     name = models.CharField(max_length=100)
     category = models.ForeignKey(Category, on_delete=models.CASCADE)
@@ -33,16 +34,11 @@ class Product(models.Model):
     details = models.TextField(blank=True)
     vat_percentage = models.DecimalField(max_digits=5, decimal_places=2, default=0.00)
 
-    def get_stock(self):
-        from purchase.models import PurchaseItem
-        from sale.models import SaleItem
-        total_purchased = PurchaseItem.objects.filter(product=self).aggregate(
-            total=models.Sum('quantity')
-        )['total'] or 0
-        total_sold = SaleItem.objects.filter(product=self).aggregate(
-            total=models.Sum('quantity')
-        )['total'] or 0
-        return max(0, total_purchased - total_sold)
+    def get_stock(self, location=None):
+        # Summed from the maintained per-location levels (see stock.levels)
+        levels = self.stock_levels.all() if location is None else self.stock_levels.filter(location=location)
+        total = levels.aggregate(total=models.Sum('quantity'))['total'] or 0
+        return max(0, total)
 
     def __str__(self):
         return self.name
\ No newline at end of file
@@ -0,0 +1,33 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from core.jobs import enqueue
+from . import images
+from .models import Product
+
+
+@receiver(pre_save, sender=Product)
+def remember_previous_image(sender, instance, **kwargs):
+    instance._previous_image = None
+    if instance.pk:
+        instance._previous_image = sender.objects.filter(pk=instance.pk).values_list('image', flat=True).first()
+
+
+@receiver(post_save, sender=Product)
+def queue_image_renditions(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    current = instance.image.name if instance.image else None
+    previous = getattr(instance, '_previous_image', None)
+    if previous and previous != current:
+        transaction.on_commit(lambda: images.delete_renditions(previous))
+    if current and current != previous:
+        # Resizing happens in the job runner; templates fall back to generating lazily
+        transaction.on_commit(lambda: enqueue('product.generate_renditions', {'image_name': current}))
+
+
+@receiver(post_delete, sender=Product)
+def delete_image_renditions(sender, instance, **kwargs):
+    if instance.image:
+        name = instance.image.name
+        transaction.on_commit(lambda: images.delete_renditions(name))
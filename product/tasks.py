@@ -0,0 +1,95 @@
+import csv
+import io
+from decimal import Decimal, InvalidOperation
+from django.core.files.storage import default_storage
+from core import search, versioning
+from core.jobs import task
+from supplier.models import Supplier
+from . import images
+from .models import Category, Product, Unit
+
+CSV_COLUMNS = [
+    'barcode', 'name', 'category', 'supplier', 'unit', 'sale_price', 'cost_price',
+    'model', 'serial_number', 'details', 'vat_percentage',
+]
+REQUIRED_COLUMNS = ['barcode', 'name', 'category', 'supplier', 'unit', 'sale_price', 'cost_price']
+BATCH_SIZE = 500
+
+
+def _decimal(value, field):
+    try:
+        number = Decimal((value or '0').strip())
+    except InvalidOperation:
+        raise ValueError(f"{field} must be a number")
+    if number < 0:
+        raise ValueError(f"{field} cannot be negative")
+    return number
+
+
+@task('product.import_csv')
+def import_products_csv(job, path):
+    """Create products from an uploaded CSV; rows with existing barcodes are skipped."""
+    with default_storage.open(path, 'rb') as fh:
+        rows = list(csv.DictReader(io.TextIOWrapper(fh, encoding='utf-8-sig')))
+
+    categories = {c.name.strip().lower(): c for c in Category.objects.filter(status='Active')}
+    suppliers = {s.supplier_name.strip().lower(): s for s in Supplier.objects.all()}
+    units = {u.name.strip().lower(): u for u in Unit.objects.filter(status='Active')}
+    existing = set(Product.all_objects.values_list('barcode', flat=True))  # Deleted products keep their barcode until purged
+
+    created, skipped, errors = 0, 0, []
+    batch = []
+    total = len(rows) or 1
+    for line, row in enumerate(rows, start=2):
+        row = {key.strip().lower(): (value or '').strip() for key, value in row.items() if key}
+        try:
+            missing = [column for column in REQUIRED_COLUMNS if not row.get(column)]
+            if missing:
+                raise ValueError(f"missing {', '.join(missing)}")
+            if row['barcode'] in existing:
+                skipped += 1
+                continue
+            category = categories.get(row['category'].lower())
+            supplier = suppliers.get(row['supplier'].lower())
+            unit = units.get(row['unit'].lower())
+            if not category:
+                raise ValueError(f"unknown or inactive category '{row['category']}'")
+            if not supplier:
+                raise ValueError(f"unknown supplier '{row['supplier']}'")
+            if not unit:
+                raise ValueError(f"unknown or inactive unit '{row['unit']}'")
+            batch.append(Product(
+                barcode=row['barcode'],
+                name=row['name'],
+                category=category,
+                supplier=supplier,
+                unit=unit,
+                sale_price=_decimal(row['sale_price'], 'sale_price'),
+                cost_price=_decimal(row['cost_price'], 'cost_price'),
+                model=row.get('model', ''),
+                serial_number=row.get('serial_number', ''),
+                details=row.get('details', ''),
+                vat_percentage=_decimal(row.get('vat_percentage'), 'vat_percentage'),
+            ))
+            existing.add(row['barcode'])
+        except ValueError as e:
+            errors.append(f"Line {line}: {e}")
+
+        if len(batch) >= BATCH_SIZE:
+            search.index_objects(Product.objects.bulk_create(batch))
+            created += len(batch)
+            batch = []
+            job.set_progress(line * 100 // total, f"Imported {created} products")
+
+    if batch:
+        search.index_objects(Product.objects.bulk_create(batch))
+        created += len(batch)
+    # bulk_create sends no signals, so mark the catalog changed explicitly
+    versioning.bump('products', 'stock')
+    default_storage.delete(path)
+    return {'created': created, 'skipped': skipped, 'errors': errors[:100], 'error_count': len(errors)}
+
+
+@task('product.generate_renditions')
+def generate_image_renditions(job, image_name):
+    return {'image': image_name, 'written': images.generate_renditions(image_name)}
@@ -0,0 +1,15 @@
+from django import template
+from product.images import rendition_url
+
+register = template.Library()
+
+
+@register.inclusion_tag('product_picture.html')
+def product_picture(product, size='thumb', css_class='product-thumb'):
+    """WebP rendition with a JPEG fallback for browsers without WebP support."""
+    return {
+        'product': product,
+        'webp': rendition_url(product, size, 'webp'),
+        'jpeg': rendition_url(product, size, 'jpeg'),
+        'css_class': css_class,
+    }
@@ -1,3 +1,47 @@
+from unittest import mock
+from django.http import HttpResponse
 from django.test import TestCase
+from django.urls import reverse
+from core.tests import make_product
+from . import labels
 
-# Create your tests here.
+
+class LabelTests(TestCase):
+    def setUp(self):
+        self.product = make_product(barcode='W-1001')
+
+    def test_copies_are_checked_before_labels_are_built(self):
+        with self.assertRaises(ValueError):
+            labels.expand([(self.product, 10 ** 12)])
+        with self.assertRaises(ValueError):
+            labels.expand([(self.product, labels.MAX_LABELS), (self.product, 1)])
+        self.assertEqual(len(labels.expand([(self.product, labels.MAX_LABELS)])), labels.MAX_LABELS)
+
+    def test_view_caps_copies(self):
+        response = self.client.get(reverse('barcode_labels'), {'product': self.product.pk, 'copies': '10' * 20})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+
+    def test_large_batches_render_in_worker_processes(self):
+        count = labels.LABELS_PER_SHEET * (labels.POOL_MIN_SHEETS + 1)
+        sheets = labels.render_sheets(labels.expand([(self.product, count)]), workers=2)
+        self.assertEqual(len(sheets), labels.POOL_MIN_SHEETS + 1)
+        first = labels.render_sheet(labels.expand([(self.product, labels.LABELS_PER_SHEET)]))
+        self.assertEqual(sheets[0].tobytes(), first.tobytes())
+
+
+class ProductListCachingTests(TestCase):
+    def get(self, etag=None):
+        headers = {'HTTP_IF_NONE_MATCH': etag} if etag else {}
+        with mock.patch('product.views.render', return_value=HttpResponse()):
+            return self.client.get(reverse('product_list'), **headers)
+
+    def test_supplier_rename_invalidates_the_list(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            supplier = make_product().supplier
+        etag = self.get()['ETag']
+        self.assertEqual(self.get(etag).status_code, 304)
+        with self.captureOnCommitCallbacks(execute=True):
+            supplier.supplier_name = 'Acme Ltd'
+            supplier.save()
+        self.assertEqual(self.get(etag).status_code, 200)
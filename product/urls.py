@@ -16,4 +16,5 @@ urlpatterns = [
     path('delete-product/<int:pk>/', views.delete_product, name='delete_product'),
     path('add-product-csv/', views.add_product_csv, name='add_product_csv'),
     path('manage-product/', views.manage_product, name='manage_product'),
+    path('labels/', views.barcode_labels, name='barcode_labels'),
 ]
\ No newline at end of file
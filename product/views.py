@@ -1,9 +1,19 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
+from django.http import Http404, HttpResponse
+from django.core.exceptions import ObjectDoesNotExist
 from django.db import IntegrityError
 from .models import Category, Unit, Product
+from . import labels
 from supplier.models import Supplier
+from django.core.files.storage import default_storage
+from core.jobs import enqueue
+from core.models import Job
+from core.pagination import KeysetPaginator
+from core.versioning import conditional
+from .tasks import CSV_COLUMNS
 import logging
+import uuid
 
 # Set up logging for debugging
 logger = logging.getLogger(__name__)
@@ -24,8 +34,9 @@ def add_category(request):
         return redirect('category_list')
     return render(request, 'add_category.html')
 
+@conditional('products')
 def category_list(request):
-    categories = Category.objects.all()
+    categories = KeysetPaginator(Category.objects.all(), per_page=25).get_page(request.GET.get('cursor'))
     updated_category = request.session.pop('updated_category', None)
     deleted_category = request.session.pop('deleted_category', None)
     return render(request, 'category_list.html', {
@@ -93,8 +104,9 @@ def add_unit(request):
         return redirect('unit_list')
     return render(request, 'add_unit.html')
 
+@conditional('products')
 def unit_list(request):
-    units = Unit.objects.all()
+    units = KeysetPaginator(Unit.objects.all(), per_page=25).get_page(request.GET.get('cursor'))
     updated_unit = request.session.pop('updated_unit', None)
     return render(request, 'unit_list.html', {
         'units': units,
@@ -197,7 +209,7 @@ def add_product(request):
 
         # Validate barcode uniqueness
         if barcode and not errors.get('barcode'):
-            if Product.objects.filter(barcode=barcode).exists():
+            if Product.all_objects.filter(barcode=barcode).exists():
                 errors['barcode'] = "A product with this barcode already exists."
 
         # Validate foreign keys
@@ -303,11 +315,14 @@ def add_product(request):
         'units': Unit.objects.filter(status='Active'),
     })
 
+@conditional('products', 'suppliers')
 def product_list(request):
-    products = Product.objects.all()
+    products = KeysetPaginator(
+        Product.objects.select_related('category', 'supplier', 'unit'), per_page=25
+    ).get_page(request.GET.get('cursor'))
     updated_product = request.session.pop('updated_product', None)
     deleted_product = request.session.pop('deleted_product', None)
-    logger.info(f"Retrieved {products.count()} products for product_list")
+    logger.info(f"Retrieved {len(products)} products for product_list")
     return render(request, 'product_list.html', {
         'products': products,
         'updated_product': updated_product,
@@ -374,7 +389,7 @@ def update_product(request, pk):
 
         # Validate barcode uniqueness (exclude current product)
         if barcode and not errors.get('barcode'):
-            if Product.objects.filter(barcode=barcode).exclude(pk=product.pk).exists():
+            if Product.all_objects.filter(barcode=barcode).exclude(pk=product.pk).exists():
                 errors['barcode'] = "A product with this barcode already exists."
 
         # Validate foreign keys
@@ -523,7 +538,8 @@ def delete_product(request, pk):
     if request.method == 'POST':
         try:
             product_name = product.name
-            product.delete()
+            # Hidden now; the row and its history are purged later by a background job
+            product.soft_delete()
             request.session.pop(f'product_{pk}', None)  # Clear session data for deleted product
             request.session['deleted_product'] = product_name
             messages.success(request, f"Product '{product_name}' deleted successfully!")
@@ -534,7 +550,49 @@ def delete_product(request, pk):
     return redirect('product_list')
 
 def add_product_csv(request):
-    return render(request, 'add_product_csv.html')
+    if request.method == 'POST':
+        csv_file = request.FILES.get('csv_file')
+        if not csv_file or not csv_file.name.lower().endswith('.csv'):
+            messages.error(request, "Please upload a .csv file.")
+            return redirect('add_product_csv')
+        # The import runs in the background job worker, not in this request
+        path = default_storage.save(f'imports/{uuid.uuid4().hex}.csv', csv_file)
+        job = enqueue('product.import_csv', {'path': path}, max_attempts=1)
+        logger.info(f"Queued product CSV import job {job.id} for '{csv_file.name}'")
+        messages.success(request, "Import queued. Progress is shown below.")
+        return redirect(f"{request.path}?job={job.id}")
+
+    job = None
+    job_id = request.GET.get('job', '')
+    if job_id.isdigit():
+        job = Job.objects.filter(pk=job_id, name='product.import_csv').first()
+    return render(request, 'add_product_csv.html', {'job': job, 'columns': CSV_COLUMNS})
 
 def manage_product(request):
-    return render(request, 'manage_product.html')
\ No newline at end of file
+    return render(request, 'manage_product.html')
+
+def barcode_labels(request):
+    """Label sheet for ?purchase=<id>, ?purchase_order=<id> or ?product=<id>&product=<id>[&copies=n]."""
+    fmt = request.GET.get('format', 'pdf')
+    try:
+        if request.GET.get('purchase'):
+            source, name = labels.purchase_labels(int(request.GET['purchase'])), f"purchase-{request.GET['purchase']}"
+        elif request.GET.get('purchase_order'):
+            source, name = labels.purchase_order_labels(int(request.GET['purchase_order'])), f"po-{request.GET['purchase_order']}"
+        else:
+            ids = [int(pk) for pk in request.GET.getlist('product')]
+            copies = min(max(1, int(request.GET.get('copies', 1))), labels.MAX_LABELS)
+            source, name = labels.product_labels(ids, copies), 'products'
+        items = labels.expand(source)
+        if not items:
+            raise Http404("Nothing to print.")
+        content, content_type, extension = labels.render_labels(items, fmt)
+    except ObjectDoesNotExist:
+        raise Http404("Document not found.")
+    except ValueError as e:
+        messages.error(request, f"Could not print labels: {e}")
+        return redirect(request.META.get('HTTP_REFERER') or 'product_list')
+    logger.info(f"Printed {len(items)} barcode labels for {name}")
+    response = HttpResponse(content, content_type=content_type)
+    response['Content-Disposition'] = f'inline; filename="labels-{name}.{extension}"'
+    return response
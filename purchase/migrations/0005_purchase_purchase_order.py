@@ -0,0 +1,20 @@
+# Generated by Django 5.2.1 on 2026-10-19 18:49
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('purchase', '0004_purchaseitem_product'),
+        ('purchaseorder', '0006_purchaseorderitem_posted_quantity'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='purchase',
+            name='purchase_order',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='receipts', to='purchaseorder.purchaseorder'),
+        ),
+    ]
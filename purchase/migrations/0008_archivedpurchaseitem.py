@@ -0,0 +1,40 @@
+# Generated by Django 5.2.1 on 2026-10-19 19:21
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('product', '0008_alter_product_supplier_delete_supplier'),
+        ('purchase', '0007_purchase_location'),
+        ('stock', '0004_closed_periods'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedPurchaseItem',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('item_name', models.CharField(max_length=255)),
+                ('stock', models.CharField(blank=True, max_length=100)),
+                ('quantity', models.PositiveIntegerField()),
+                ('batch_no', models.CharField(blank=True, max_length=50)),
+                ('expiry_date', models.DateField(blank=True, null=True)),
+                ('rate', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('discount_percent', models.DecimalField(decimal_places=2, default=0.0, max_digits=5)),
+                ('vat_percent', models.DecimalField(decimal_places=2, default=0.0, max_digits=5)),
+                ('discount_value', models.DecimalField(decimal_places=2, default=0.0, max_digits=10)),
+                ('vat_value', models.DecimalField(decimal_places=2, default=0.0, max_digits=10)),
+                ('total', models.DecimalField(decimal_places=2, default=0.0, max_digits=10)),
+                ('purchase_date', models.DateField()),
+                ('location', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='archived_purchase_items', to='stock.location')),
+                ('product', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='product.product')),
+                ('purchase', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_items', to='purchase.purchase')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['purchase_date', 'location'], name='archived_purchase_item_date')],
+            },
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.1 on 2026-10-19 19:59
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def link_receipt_lines(apps, schema_editor):
+    # Existing receipt lines match their PO line by product where the PO has only one line for it
+    PurchaseItem = apps.get_model('purchase', 'PurchaseItem')
+    PurchaseOrderItem = apps.get_model('purchaseorder', 'PurchaseOrderItem')
+    po_lines = {}
+    for pk, order_id, product_id in PurchaseOrderItem.objects.filter(product__isnull=False).values_list(
+        'pk', 'purchase_order_id', 'product_id'
+    ):
+        po_lines.setdefault((order_id, product_id), []).append(pk)
+    lines = PurchaseItem.objects.filter(purchase__purchase_order__isnull=False).values_list(
+        'pk', 'purchase__purchase_order_id', 'product_id'
+    )
+    for pk, order_id, product_id in lines.iterator():
+        matches = po_lines.get((order_id, product_id), [])
+        if len(matches) == 1:
+            PurchaseItem.objects.filter(pk=pk).update(purchase_order_item_id=matches[0])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('purchase', '0009_line_amounts_exact'),
+        ('purchaseorder', '0009_line_amounts_exact'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='purchaseitem',
+            name='purchase_order_item',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='receipt_lines', to='purchaseorder.purchaseorderitem'),
+        ),
+        migrations.RunPython(link_receipt_lines, migrations.RunPython.noop),
+    ]
@@ -2,6 +2,7 @@ from django.db import models
 from django.core.validators import MinValueValidator, MaxValueValidator
 from supplier.models import Supplier
 from product.models import Product
+from core.pricing import line_amount_fields
 
 class Purchase(models.Model):
     PAYMENT_TYPES = (
@@ -39,19 +40,15 @@ class Purchase(models.Model):
         validators=[MinValueValidator(0.00)]
     )
     payment_type = models.CharField(max_length=20, choices=PAYMENT_TYPES, default='CASH')
+    location = models.ForeignKey('stock.Location', on_delete=models.PROTECT, related_name='purchases')
+    purchase_order = models.ForeignKey(
+        'purchaseorder.PurchaseOrder', on_delete=models.SET_NULL,
+        related_name='receipts', null=True, blank=True
+    )
 
     def __str__(self):
         return f"Purchase {self.challan_no} - {self.supplier.supplier_name}"
 
-    def save(self, *args, **kwargs):
-        if not self.pk:
-            items = self.items.all() if self.pk else []
-            self.total_discount = sum(item.discount_value for item in items) + self.purchase_discount
-            self.total_vat = sum(item.vat_value for item in items)
-            self.grand_total = sum(item.total for item in items) + self.total_vat - self.purchase_discount
-            self.due_amount = self.grand_total - self.paid_amount
-        super().save(*args, **kwargs)
-
 class PurchaseItem(models.Model):
     purchase = models.ForeignKey(Purchase, on_delete=models.CASCADE, related_name='items')
     product = models.ForeignKey(Product, on_delete=models.CASCADE, null=True, blank=True)  # Allow null temporarily
@@ -68,29 +65,46 @@ class PurchaseItem(models.Model):
         max_digits=5, decimal_places=2, default=0.00,
         validators=[MinValueValidator(0.00), MaxValueValidator(100.00)]
     )
-    discount_value = models.DecimalField(
-        max_digits=10, decimal_places=2, default=0.00,
-        validators=[MinValueValidator(0.00)]
-    )
     vat_percent = models.DecimalField(
         max_digits=5, decimal_places=2, default=0.00,
         validators=[MinValueValidator(0.00), MaxValueValidator(100.00)]
     )
-    vat_value = models.DecimalField(
-        max_digits=10, decimal_places=2, default=0.00,
-        validators=[MinValueValidator(0.00)]
-    )
-    total = models.DecimalField(
-        max_digits=10, decimal_places=2, default=0.00,
-        validators=[MinValueValidator(0.00)]
+    # Computed and stored by the database from the columns above
+    discount_value, vat_value, total = line_amount_fields()
+    # The PO line a goods receipt booked this from (see purchaseorder.receiving)
+    purchase_order_item = models.ForeignKey(
+        'purchaseorder.PurchaseOrderItem', on_delete=models.SET_NULL,
+        related_name='receipt_lines', null=True, blank=True, editable=False
     )
 
     def __str__(self):
         return f"{self.item_name} (Purchase {self.purchase.challan_no})"
 
-    def save(self, *args, **kwargs):
-        self.discount_value = (self.rate * self.quantity * self.discount_percent) / 100
-        subtotal = (self.rate * self.quantity) - self.discount_value
-        self.vat_value = (subtotal * self.vat_percent) / 100
-        self.total = subtotal + self.vat_value
-        super().save(*args, **kwargs)
\ No newline at end of file
+class ArchivedPurchaseItem(models.Model):
+    """
+    A PurchaseItem from a closed period, moved here by stock.archive. It keeps the
+    original id and its stored amounts; the purchase date and location are copied
+    from the header so closed-period reads never need the join.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    purchase = models.ForeignKey(Purchase, on_delete=models.CASCADE, related_name='archived_items')
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, null=True, blank=True)
+    item_name = models.CharField(max_length=255)
+    stock = models.CharField(max_length=100, blank=True)
+    quantity = models.PositiveIntegerField()
+    batch_no = models.CharField(max_length=50, blank=True)
+    expiry_date = models.DateField(null=True, blank=True)
+    rate = models.DecimalField(max_digits=10, decimal_places=2)
+    discount_percent = models.DecimalField(max_digits=5, decimal_places=2, default=0.00)
+    vat_percent = models.DecimalField(max_digits=5, decimal_places=2, default=0.00)
+    discount_value = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
+    vat_value = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
+    total = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
+    purchase_date = models.DateField()
+    location = models.ForeignKey('stock.Location', on_delete=models.PROTECT, related_name='archived_purchase_items')
+
+    class Meta:
+        indexes = [models.Index(fields=['purchase_date', 'location'], name='archived_purchase_item_date')]
+
+    def __str__(self):
+        return f"{self.item_name} (Purchase {self.purchase.challan_no}, archived)"
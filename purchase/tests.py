@@ -1,3 +1,39 @@
+from datetime import date
 from django.test import TestCase
+from core.tests import make_product
+from purchaseorder.models import PurchaseOrder, PurchaseOrderItem
+from purchaseorder.views import PurchaseOrderItemForm
+from stock.levels import default_location
+from supplier.models import Supplier
+from .models import Purchase, PurchaseItem
+from .views import PurchaseItemForm
 
-# Create your tests here.
+
+class DeletedProductLineTests(TestCase):
+    def setUp(self):
+        self.product = make_product()
+        self.product.soft_delete()
+        self.supplier = Supplier.objects.get(supplier_name='Acme')
+
+    def test_purchase_line_keeps_its_deleted_product(self):
+        purchase = Purchase.objects.create(
+            supplier=self.supplier, challan_no='CH1', purchase_date=date.today(), location=default_location(),
+        )
+        line = PurchaseItem.objects.create(
+            purchase=purchase, product=self.product, item_name='Widget', quantity=2, rate=5,
+        )
+        data = {'product': self.product.pk, 'quantity': '3', 'rate': '5', 'discount_percent': '0', 'vat_percent': '0'}
+        self.assertTrue(PurchaseItemForm(data, instance=line).is_valid())
+        self.assertIn('product', PurchaseItemForm(data).errors)
+
+    def test_purchase_order_line_keeps_its_deleted_product(self):
+        order = PurchaseOrder.objects.create(supplier=self.supplier, location=default_location())
+        line = PurchaseOrderItem.objects.create(
+            purchase_order=order, product=self.product, ordered_quantity=2, unit_price=5,
+        )
+        data = {
+            'product': self.product.pk, 'ordered_quantity': '3', 'received_quantity': '0',
+            'unit_price': '5', 'discount_percent': '0', 'vat_percent': '0',
+        }
+        self.assertTrue(PurchaseOrderItemForm(data, instance=line).is_valid())
+        self.assertIn('product', PurchaseOrderItemForm(data).errors)
@@ -3,12 +3,21 @@ from django.contrib import messages
 from django.forms import inlineformset_factory
 from django.views.generic import ListView, CreateView, UpdateView, DeleteView
 from django.urls import reverse_lazy
+from django.utils.decorators import method_decorator
+from core.db_routers import use_replica
+from core.versioning import conditional
 from .models import Purchase, PurchaseItem
 from supplier.models import Supplier
 from product.models import Product
+from stock.archive import closed_through, document_lines
+from stock.levels import default_location
+from stock.models import Location
 from django import forms
+from django.db.models import Q
 import logging
-from decimal import Decimal, ROUND_HALF_UP
+from decimal import Decimal
+from core.forms import LineAmountsFormMixin
+from core.pricing import header_totals, line_sums, money
 
 logger = logging.getLogger(__name__)
 
@@ -16,7 +25,7 @@ class PurchaseForm(forms.ModelForm):
     class Meta:
         model = Purchase
         fields = [
-            'supplier', 'challan_no', 'purchase_date', 'details', 'purchase_discount',
+            'supplier', 'challan_no', 'location', 'purchase_date', 'details', 'purchase_discount',
             'total_discount', 'total_vat', 'grand_total', 'paid_amount', 'due_amount',
             'payment_type'
         ]
@@ -33,6 +42,17 @@ class PurchaseForm(forms.ModelForm):
         super().__init__(*args, **kwargs)
         self.fields['supplier'].queryset = Supplier.objects.all()
         self.fields['supplier'].empty_label = "Select Supplier"
+        # Inactive locations stay selectable on documents that already use them
+        self.fields['location'].queryset = Location.objects.filter(Q(is_active=True) | Q(pk=self.instance.location_id))
+        if not self.instance.pk:
+            self.fields['location'].initial = default_location()
+
+    def clean_purchase_date(self):
+        purchase_date = self.cleaned_data['purchase_date']
+        closed_end = closed_through()
+        if closed_end and purchase_date and purchase_date <= closed_end:
+            raise forms.ValidationError(f"The period through {closed_end} is closed.")
+        return purchase_date
 
     def clean_supplier(self):
         supplier_data = self.cleaned_data['supplier']
@@ -40,7 +60,7 @@ class PurchaseForm(forms.ModelForm):
             raise forms.ValidationError("Supplier is required.")
         return supplier_data
 
-class PurchaseItemForm(forms.ModelForm):
+class PurchaseItemForm(LineAmountsFormMixin, forms.ModelForm):
     product = forms.ModelChoiceField(
         queryset=Product.objects.all(),
         empty_label="Select Product",
@@ -50,8 +70,7 @@ class PurchaseItemForm(forms.ModelForm):
     class Meta:
         model = PurchaseItem
         fields = [
-            'product', 'quantity', 'rate', 'discount_percent',
-            'discount_value', 'vat_percent', 'vat_value', 'total',
+            'product', 'quantity', 'rate', 'discount_percent', 'vat_percent',
             'batch_no', 'expiry_date'
         ]
         widgets = {
@@ -59,9 +78,6 @@ class PurchaseItemForm(forms.ModelForm):
             'rate': forms.NumberInput(attrs={'step': '0.01', 'min': 0}),
             'discount_percent': forms.NumberInput(attrs={'step': '0.01', 'min': 0, 'max': 100}),
             'vat_percent': forms.NumberInput(attrs={'step': '0.01', 'min': 0, 'max': 100}),
-            'discount_value': forms.NumberInput(attrs={'readonly': 'readonly'}),
-            'vat_value': forms.NumberInput(attrs={'readonly': 'readonly'}),
-            'total': forms.NumberInput(attrs={'readonly': 'readonly'}),
             'batch_no': forms.TextInput(),
             'expiry_date': forms.DateInput(attrs={'type': 'date'}),
         }
@@ -69,28 +85,21 @@ class PurchaseItemForm(forms.ModelForm):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.fields['product'].required = True
+        # A soft-deleted product stays selectable on the lines that already use it
+        self.fields['product'].queryset = Product.all_objects.filter(
+            Q(deleted_at__isnull=True) | Q(pk=self.instance.product_id)
+        )
 
     def clean(self):
         cleaned_data = super().clean()
         product = cleaned_data.get('product')
-        quantity = cleaned_data.get('quantity', 0)
-        rate = cleaned_data.get('rate', 0)
-        discount_percent = cleaned_data.get('discount_percent', 0)
-        vat_percent = cleaned_data.get('vat_percent', 0)
 
         if not product:
             raise forms.ValidationError("Product is required.")
-
-        subtotal = Decimal(quantity) * Decimal(str(rate))
-        discount_value = (subtotal * Decimal(str(discount_percent)) / Decimal('100')).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
-        vat_value = ((subtotal - discount_value) * Decimal(str(vat_percent)) / Decimal('100')).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
-        total = (subtotal - discount_value + vat_value).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
-
-        cleaned_data['discount_value'] = discount_value
-        cleaned_data['vat_value'] = vat_value
-        cleaned_data['total'] = total
         return cleaned_data
 
+@method_decorator(use_replica, name='dispatch')
+@method_decorator(conditional('purchases'), name='dispatch')
 class PurchaseListView(ListView):
     model = Purchase
     template_name = 'manage_purchase.html'
@@ -101,7 +110,30 @@ class PurchaseListView(ListView):
         context['updated_purchase'] = self.request.GET.get('updated_purchase')
         return context
 
-class PurchaseCreateView(CreateView):
+class OpenPeriodMixin:
+    """Refuse to change a purchase whose period is closed; its lines are archived."""
+    def dispatch(self, request, *args, **kwargs):
+        purchase = self.get_object()
+        closed_end = closed_through()
+        if closed_end and purchase.purchase_date <= closed_end:
+            messages.error(request, f"Purchase {purchase.challan_no} is in a closed period and cannot be changed.")
+            return redirect('manage_purchase')
+        return super().dispatch(request, *args, **kwargs)
+
+class PurchaseTotalsMixin:
+    def _apply_totals(self, form):
+        # Recalculate summary fields from the amounts the database stored on the lines
+        paid_amount = form.cleaned_data.get('paid_amount') or Decimal('0')
+        totals = header_totals(
+            [line_sums(self.object.items.all())], discount=form.cleaned_data['purchase_discount'], paid_amount=paid_amount,
+        )
+        self.object.total_discount = totals.total_discount
+        self.object.total_vat = totals.total_vat
+        self.object.grand_total = totals.net_total
+        self.object.paid_amount = money(paid_amount)
+        self.object.due_amount = totals.due_amount
+
+class PurchaseCreateView(PurchaseTotalsMixin, CreateView):
     model = Purchase
     form_class = PurchaseForm
     template_name = 'add_purchase.html'
@@ -128,19 +160,7 @@ class PurchaseCreateView(CreateView):
             formset.instance = self.object
             formset.save()
 
-            # Recalculate summary fields
-            items_total = sum(item.total for item in self.object.items.all())
-            total_discount = sum(item.discount_value for item in self.object.items.all()) + form.cleaned_data['purchase_discount']
-            total_vat = sum(item.vat_value for item in self.object.items.all())
-            grand_total = items_total - form.cleaned_data['purchase_discount']
-            paid_amount = form.cleaned_data.get('paid_amount', grand_total)  # Fix: Use form data
-            due_amount = form.cleaned_data.get('due_amount', Decimal('0'))
-
-            self.object.total_discount = total_discount.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
-            self.object.total_vat = total_vat.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
-            self.object.grand_total = grand_total.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
-            self.object.paid_amount = paid_amount.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
-            self.object.due_amount = due_amount.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+            self._apply_totals(form)
             self.object.save()
 
             messages.success(self.request, f"Purchase {self.object.challan_no} added successfully.")
@@ -149,7 +169,7 @@ class PurchaseCreateView(CreateView):
             logger.error(f"Form errors: {form.errors}, Formset errors: {formset.errors}")
             return self.render_to_response(self.get_context_data(form=form))
 
-class PurchaseUpdateView(UpdateView):
+class PurchaseUpdateView(OpenPeriodMixin, PurchaseTotalsMixin, UpdateView):
     model = Purchase
     form_class = PurchaseForm
     template_name = 'add_purchase.html'
@@ -176,19 +196,7 @@ class PurchaseUpdateView(UpdateView):
             formset.instance = self.object
             formset.save()
 
-            # Recalculate summary fields
-            items_total = sum(item.total for item in self.object.items.all())
-            total_discount = sum(item.discount_value for item in self.object.items.all()) + form.cleaned_data['purchase_discount']
-            total_vat = sum(item.vat_value for item in self.object.items.all())
-            grand_total = items_total - form.cleaned_data['purchase_discount']
-            paid_amount = form.cleaned_data['paid_amount']
-            due_amount = form.cleaned_data.get('due_amount', Decimal('0'))
-
-            self.object.total_discount = total_discount.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
-            self.object.total_vat = total_vat.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
-            self.object.grand_total = grand_total.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
-            self.object.paid_amount = paid_amount.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
-            self.object.due_amount = due_amount.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+            self._apply_totals(form)
             self.object.save()
 
             messages.success(self.request, f"Purchase {self.object.challan_no} updated successfully.")
@@ -197,7 +205,7 @@ class PurchaseUpdateView(UpdateView):
             logger.error(f"Form errors: {form.errors}, Formset errors: {formset.errors}")
             return self.render_to_response(self.get_context_data(form=form))
 
-class PurchaseDeleteView(DeleteView):
+class PurchaseDeleteView(OpenPeriodMixin, DeleteView):
     model = Purchase
     template_name = 'purchase_confirm_delete.html'
     success_url = reverse_lazy('manage_purchase')
@@ -211,5 +219,5 @@ class PurchaseDeleteView(DeleteView):
 
 def purchase_detail_view(request, purchase_id):
     purchase = get_object_or_404(Purchase, id=purchase_id)
-    context = {'purchase': purchase}
+    context = {'purchase': purchase, 'items': document_lines(purchase).select_related('product')}
     return render(request, 'purchase_detail.html', context)
\ No newline at end of file
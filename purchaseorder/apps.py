@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class PurchaseorderConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'purchaseorder'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand, CommandError
+from purchaseorder.replenishment import create_draft_purchase_orders
+from stock.forecast import parse_reorder_params
+
+
+class Command(BaseCommand):
+    help = "Create draft purchase orders, grouped by supplier, for products below their reorder point."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--window', type=int, default=90, help="Demand window in days.")
+        parser.add_argument('--lead-time', type=int, default=7, help="Supplier lead time in days.")
+        parser.add_argument('--service-level', type=float, default=0.95, help="Target service level (0.5-0.999).")
+
+    def handle(self, *args, **options):
+        try:
+            params = parse_reorder_params({name: options[name] for name in ('window', 'lead_time', 'service_level')})
+        except ValueError as e:
+            raise CommandError(e)
+        created = create_draft_purchase_orders(**params)
+        for purchase_order in created:
+            self.stdout.write(f"{purchase_order.po_number}: {purchase_order.items.count()} item(s)")
+        self.stdout.write(self.style.SUCCESS(f"Created {len(created)} draft purchase order(s)."))
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.1 on 2026-10-19 18:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('purchaseorder', '0004_purchaseorder_po_number'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='purchaseorder',
+            name='status',
+            field=models.CharField(choices=[('DRAFT', 'Draft'), ('ORDERED', 'Ordered')], default='ORDERED', max_length=10),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.1 on 2026-10-19 18:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('purchaseorder', '0005_purchaseorder_status'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='purchaseorderitem',
+            name='posted_quantity',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
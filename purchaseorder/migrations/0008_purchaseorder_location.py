@@ -0,0 +1,21 @@
+# Generated by Django 5.2.1 on 2026-10-19 19:14
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('purchaseorder', '0007_line_amounts_generated'),
+        ('stock', '0002_locations'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='purchaseorder',
+            name='location',
+            field=models.ForeignKey(default=1, on_delete=django.db.models.deletion.PROTECT, related_name='purchase_orders', to='stock.location'),
+            preserve_default=False,
+        ),
+    ]
@@ -1,15 +1,39 @@
+from datetime import datetime
 from django.db import models
 from django.db.models import F
 from django.core.validators import MinValueValidator, MaxValueValidator
+from core.pricing import header_totals, line_amount_fields, line_sums
 from supplier.models import Supplier
 from product.models import Product
 
+def generate_po_number():
+    """Generate a unique PO number in the format PO-YYYYMMDD-XXX"""
+    today_str = datetime.now().strftime('%Y%m%d')
+    last_po_today = PurchaseOrder.objects.filter(
+        po_number__startswith=f'PO-{today_str}-'
+    ).order_by('-po_number').first()
+
+    if last_po_today:
+        try:
+            last_num = int(last_po_today.po_number.split('-')[-1])
+            new_num = last_num + 1
+        except (IndexError, ValueError):
+            new_num = 1
+    else:
+        new_num = 1
+
+    return f'PO-{today_str}-{new_num:03d}'
+
 class PurchaseOrder(models.Model):
     PAYMENT_TYPES = (
         ('CASH', 'Cash'),
         ('CREDIT', 'Credit'),
         ('BANK', 'Bank Transfer'),
     )
+    STATUS_CHOICES = (
+        ('DRAFT', 'Draft'),
+        ('ORDERED', 'Ordered'),
+    )
 
     supplier = models.ForeignKey(
         Supplier,
@@ -45,6 +69,8 @@ class PurchaseOrder(models.Model):
         validators=[MinValueValidator(0.00)]
     )
     payment_type = models.CharField(max_length=20, choices=PAYMENT_TYPES, default='CASH')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='ORDERED')
+    location = models.ForeignKey('stock.Location', on_delete=models.PROTECT, related_name='purchase_orders')  # Receiving location
     created_at = models.DateTimeField(auto_now_add=True)
 
     def save(self, *args, **kwargs):
@@ -53,14 +79,18 @@ class PurchaseOrder(models.Model):
             max_id = PurchaseOrder.objects.aggregate(models.Max('id'))['id__max'] or 0
             self.po_number = f"PO-{max_id + 1:04d}"  # e.g., PO-0001
 
-        # Calculate totals
-        items = self.items.all() if self.pk else []
-        self.total_discount = sum(item.discount_value for item in items) + self.purchase_discount
-        self.total_vat = sum(item.vat_value for item in items)
-        self.grand_total = sum(item.total for item in items) + self.total_vat - self.purchase_discount
-        self.due_amount = self.grand_total - self.paid_amount
         super().save(*args, **kwargs)
 
+    def apply_totals(self):
+        """Set the header totals from the stored line amounts (one aggregate query); the caller saves."""
+        totals = header_totals(
+            [line_sums(self.items.all())], discount=self.purchase_discount, paid_amount=self.paid_amount,
+        )
+        self.total_discount = totals.total_discount
+        self.total_vat = totals.total_vat
+        self.grand_total = totals.net_total
+        self.due_amount = totals.due_amount
+
     def __str__(self):
         return f"{self.po_number or f'PO#{self.id}'} - {self.supplier.supplier_name if self.supplier else 'No Supplier'}"
 
@@ -73,6 +103,7 @@ class PurchaseOrderItem(models.Model):
     stock = models.CharField(max_length=100, blank=True)
     ordered_quantity = models.PositiveIntegerField(validators=[MinValueValidator(1)])
     received_quantity = models.PositiveIntegerField(default=0, validators=[MinValueValidator(0)])
+    posted_quantity = models.PositiveIntegerField(default=0, editable=False)  # Received qty already booked as purchases
     unit_price = models.DecimalField(
         max_digits=10, decimal_places=2,
         validators=[MinValueValidator(0.01)]
@@ -81,29 +112,20 @@ class PurchaseOrderItem(models.Model):
         max_digits=5, decimal_places=2, default=0.00,
         validators=[MinValueValidator(0.00), MaxValueValidator(100.00)]
     )
-    discount_value = models.DecimalField(
-        max_digits=10, decimal_places=2, default=0.00,
-        validators=[MinValueValidator(0.00)]
-    )
     vat_percent = models.DecimalField(
         max_digits=5, decimal_places=2, default=0.00,
         validators=[MinValueValidator(0.00), MaxValueValidator(100.00)]
     )
-    vat_value = models.DecimalField(
-        max_digits=10, decimal_places=2, default=0.00,
-        validators=[MinValueValidator(0.00)]
-    )
-    total = models.DecimalField(
-        max_digits=10, decimal_places=2, default=0.00,
-        validators=[MinValueValidator(0.00)]
-    )
+    # Computed and stored by the database from the columns above
+    discount_value, vat_value, total = line_amount_fields(quantity='ordered_quantity', rate='unit_price')
 
     def __str__(self):
         return f"Item for {self.purchase_order.po_number or f'PO#{self.purchase_order.id}'} (Product: {self.product.name if self.product else 'No Product'})"
 
-    def save(self, *args, **kwargs):
-        self.discount_value = (self.unit_price * self.ordered_quantity * self.discount_percent) / 100
-        subtotal = (self.unit_price * self.ordered_quantity) - self.discount_value
-        self.vat_value = (subtotal * self.vat_percent) / 100
-        self.total = subtotal + self.vat_value
-        super().save(*args, **kwargs)
\ No newline at end of file
+    @property
+    def outstanding_quantity(self):
+        return max(0, self.ordered_quantity - self.received_quantity)
+
+    @property
+    def unposted_quantity(self):
+        return max(0, self.received_quantity - self.posted_quantity)
\ No newline at end of file
@@ -0,0 +1,113 @@
+from decimal import Decimal
+from django.db import transaction
+from django.utils import timezone
+from core import versioning
+from core.pricing import header_totals, line_sums
+from purchase.models import Purchase, PurchaseItem
+from stock import levels
+from .models import PurchaseOrder, PurchaseOrderItem
+
+
+def _next_receipt_number(purchase_order):
+    """
+    Challan number for the next receipt of a purchase order: <PO number>-R<nn>, one
+    above the highest number in use, so deleting an earlier receipt never leads to
+    a duplicate. The caller holds the order's row lock, so concurrent receipts of
+    one order take turns.
+    """
+    prefix = f"{purchase_order.po_number or f'PO{purchase_order.id}'}-R"
+    used = [
+        int(challan_no[len(prefix):])
+        for challan_no in Purchase.objects.filter(challan_no__startswith=prefix).values_list('challan_no', flat=True)
+        if challan_no[len(prefix):].isdigit()
+    ]
+    return f"{prefix}{max(used, default=0) + 1:02d}"
+
+
+def receive_purchase_order(purchase_order_id, received=None, receipt_date=None):
+    """
+    Book newly received PO quantities as a purchase, in one transaction.
+
+    received optionally maps PurchaseOrderItem ids to their new cumulative received
+    quantity. Whatever has been received but not yet posted becomes one Purchase with
+    bulk-created PurchaseItems linked to their PO lines, and each line's
+    posted_quantity moves forward (deleting a receipt line moves it back). Calling
+    this again with the same quantities does nothing, so partial receipts can be
+    posted as they arrive. Returns the created Purchase, or None if nothing was new.
+    """
+    received = received or {}
+    receipt_date = receipt_date or timezone.localdate()
+
+    with transaction.atomic():
+        purchase_order = PurchaseOrder.objects.select_for_update().select_related('supplier').get(pk=purchase_order_id)
+        items = list(
+            PurchaseOrderItem.objects.select_for_update()
+            .filter(purchase_order=purchase_order)
+            .select_related('product')
+            .order_by('id')
+        )
+
+        for item in items:
+            if item.id not in received:
+                continue
+            quantity = received[item.id]
+            if quantity < item.posted_quantity:
+                raise ValueError(
+                    f"{item.product.name if item.product else 'Item'}: {item.posted_quantity} already booked, "
+                    f"received quantity cannot go below that."
+                )
+            if quantity > item.ordered_quantity:
+                raise ValueError(
+                    f"{item.product.name if item.product else 'Item'}: received quantity cannot exceed ordered quantity."
+                )
+            item.received_quantity = quantity
+
+        lines = [(item, item.unposted_quantity) for item in items if item.product_id and item.unposted_quantity > 0]
+        purchase = None
+        if lines:
+            if purchase_order.supplier_id is None:
+                raise ValueError("Set a supplier on the purchase order before receiving it.")
+
+            purchase = Purchase.objects.create(
+                supplier_id=purchase_order.supplier_id,
+                challan_no=_next_receipt_number(purchase_order),
+                purchase_date=receipt_date,
+                details=f"Goods receipt for {purchase_order.po_number or f'PO#{purchase_order.id}'}",
+                purchase_order=purchase_order,
+                location_id=purchase_order.location_id,
+                purchase_discount=Decimal('0.00'),
+                paid_amount=Decimal('0.00'),
+            )
+            purchase_items = [
+                PurchaseItem(
+                    purchase=purchase,
+                    product=item.product,
+                    item_name=item.product.name,
+                    stock=item.stock,
+                    quantity=quantity,
+                    rate=item.unit_price,
+                    discount_percent=item.discount_percent,
+                    vat_percent=item.vat_percent,
+                    purchase_order_item=item,
+                )
+                for item, quantity in lines
+            ]
+            for item, quantity in lines:
+                item.posted_quantity += quantity
+            PurchaseItem.objects.bulk_create(purchase_items, batch_size=500)
+            # bulk_create skips signals, so book the on-hand increase here
+            levels.adjust(levels.lines_deltas(PurchaseItem, purchase, purchase_items))
+
+            # Header totals from the amounts the database just computed
+            totals = header_totals([line_sums(purchase.items.all())])
+            purchase.total_discount = totals.total_discount
+            purchase.total_vat = totals.total_vat
+            purchase.grand_total = totals.net_total
+            purchase.due_amount = totals.due_amount
+            purchase.save(update_fields=['total_discount', 'total_vat', 'grand_total', 'due_amount'])
+
+        PurchaseOrderItem.objects.bulk_update(items, ['received_quantity', 'posted_quantity'])
+        versioning.bump('purchases', 'stock')
+        if purchase and purchase_order.status == 'DRAFT':
+            PurchaseOrder.objects.filter(pk=purchase_order.pk).update(status='ORDERED')
+    return purchase
@@ -0,0 +1,70 @@
+from collections import defaultdict
+from decimal import Decimal
+from django.db import transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+from stock.forecast import reorder_suggestions
+from stock.levels import default_location
+from .models import PurchaseOrder, PurchaseOrderItem, generate_po_number
+
+
+def create_draft_purchase_orders(rows=None, **params):
+    """
+    Create one draft purchase order per supplier for products below their reorder point.
+
+    rows defaults to stock.forecast.reorder_suggestions(**params). Products that already
+    sit on an open draft are skipped, so running the job twice does not double-order,
+    and quantities still due on ordered POs (ordered but not yet booked into stock) are
+    taken off the suggestion. Returns the list of created PurchaseOrder instances.
+    """
+    if rows is None:
+        rows = reorder_suggestions(only_below=True, **params)
+
+    drafted = set(
+        PurchaseOrderItem.objects.filter(purchase_order__status='DRAFT', product__isnull=False)
+        .values_list('product_id', flat=True)
+    )
+    inbound = dict(
+        PurchaseOrderItem.objects.filter(
+            purchase_order__status='ORDERED', product__isnull=False, posted_quantity__lt=F('ordered_quantity'),
+        )
+        .values('product_id').annotate(due=Sum(F('ordered_quantity') - F('posted_quantity')))
+        .values_list('product_id', 'due').order_by()
+    )
+    by_supplier = defaultdict(list)
+    for row in rows:
+        product = row['product']
+        quantity = row['suggested_qty'] - inbound.get(product.id, 0)
+        if quantity > 0 and product.id not in drafted:
+            by_supplier[product.supplier_id].append(dict(row, suggested_qty=quantity))
+
+    created = []
+    location = default_location()
+    with transaction.atomic():
+        for supplier_id, supplier_rows in by_supplier.items():
+            purchase_order = PurchaseOrder.objects.create(
+                supplier_id=supplier_id,
+                po_number=generate_po_number(),
+                purchase_date=timezone.localdate(),
+                status='DRAFT',
+                location=location,
+                purchase_discount=Decimal('0.00'),
+                paid_amount=Decimal('0.00'),
+            )
+            PurchaseOrderItem.objects.bulk_create([
+                PurchaseOrderItem(
+                    purchase_order=purchase_order,
+                    product=row['product'],
+                    ordered_quantity=row['suggested_qty'],
+                    unit_price=row['product'].cost_price,
+                    discount_percent=Decimal('0.00'),
+                    vat_percent=row['product'].vat_percentage,
+                )
+                for row in supplier_rows
+            ], batch_size=500)
+
+            # One header-totals pass now that all lines exist
+            purchase_order.apply_totals()
+            purchase_order.save(update_fields=['total_discount', 'total_vat', 'grand_total', 'due_amount'])
+            created.append(purchase_order)
+    return created
@@ -0,0 +1,45 @@
+from django.db.models import F, Value
+from django.db.models.functions import Greatest
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from purchase.models import PurchaseItem
+from .models import PurchaseOrderItem
+
+
+def _shift_posted(item_id, quantity):
+    # Receiving again posts whatever is received but no longer booked
+    PurchaseOrderItem.objects.filter(pk=item_id).update(
+        posted_quantity=Greatest(F('posted_quantity') + quantity, Value(0)),
+    )
+
+
+@receiver(pre_save, sender=PurchaseItem)
+def remember_receipt_line(sender, instance, raw=False, **kwargs):
+    instance._receipt_previous = None
+    if instance.pk and not raw:
+        instance._receipt_previous = (
+            PurchaseItem.objects.filter(pk=instance.pk).values_list('purchase_order_item_id', 'quantity').first()
+        )
+
+
+@receiver(post_save, sender=PurchaseItem)
+def repost_receipt_line(sender, instance, created, raw=False, **kwargs):
+    # An edited receipt line books its new quantity against the PO line instead of the old one
+    previous = getattr(instance, '_receipt_previous', None)
+    if created or raw or previous is None:
+        return
+    previous_item_id, previous_quantity = previous
+    shifts = {}
+    if previous_item_id:
+        shifts[previous_item_id] = -previous_quantity
+    if instance.purchase_order_item_id:
+        shifts[instance.purchase_order_item_id] = shifts.get(instance.purchase_order_item_id, 0) + instance.quantity
+    for item_id, quantity in shifts.items():
+        if quantity:
+            _shift_posted(item_id, quantity)
+
+
+@receiver(post_delete, sender=PurchaseItem)
+def unpost_receipt_line(sender, instance, **kwargs):
+    if instance.purchase_order_item_id:
+        _shift_posted(instance.purchase_order_item_id, -instance.quantity)
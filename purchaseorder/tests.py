@@ -1,3 +1,87 @@
+from decimal import Decimal
+from django.core.management import CommandError, call_command
 from django.test import TestCase
+from core.tests import make_product
+from purchase.models import Purchase
+from stock.levels import default_location
+from supplier.models import Supplier
+from .models import PurchaseOrder, PurchaseOrderItem
+from .receiving import receive_purchase_order
+from .replenishment import create_draft_purchase_orders
 
-# Create your tests here.
+
+class ReceivingTests(TestCase):
+    def setUp(self):
+        self.product = make_product()
+        self.order = PurchaseOrder.objects.create(
+            supplier=Supplier.objects.get(supplier_name='Acme'), location=default_location(),
+        )
+        self.item = PurchaseOrderItem.objects.create(
+            purchase_order=self.order, product=self.product, ordered_quantity=10, unit_price=5,
+        )
+
+    def receive(self, quantity):
+        return receive_purchase_order(self.order.pk, {self.item.pk: quantity})
+
+    def test_numbers_continue_after_a_deleted_receipt(self):
+        first = self.receive(2)
+        second = self.receive(5)
+        first.delete()
+        third = self.receive(7)
+        prefix = f'{self.order.po_number}-R'
+        self.assertEqual([second.challan_no, third.challan_no], [f'{prefix}02', f'{prefix}03'])
+        self.assertEqual(Purchase.objects.filter(purchase_order=self.order).count(), 2)
+
+    def test_deleting_a_receipt_unposts_its_lines(self):
+        receipt = self.receive(4)
+        receipt.delete()
+        self.item.refresh_from_db()
+        self.assertEqual((self.item.received_quantity, self.item.posted_quantity), (4, 0))
+        # Receiving again books the quantity that is no longer on a receipt
+        again = receive_purchase_order(self.order.pk)
+        self.assertEqual(again.items.get().quantity, Decimal('4'))
+        self.assertEqual(self.product.get_stock(), Decimal('4'))
+
+    def test_editing_a_receipt_line_reposts_its_quantity(self):
+        line = self.receive(6).items.get()
+        line.quantity = 4
+        line.save()
+        self.item.refresh_from_db()
+        self.assertEqual((self.item.received_quantity, self.item.posted_quantity), (6, 4))
+        # The two units taken off the receipt are booked by the next one
+        self.assertEqual(receive_purchase_order(self.order.pk).items.get().quantity, Decimal('2'))
+        line.quantity = 5
+        line.save()
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.posted_quantity, 7)
+
+
+class ReplenishmentTests(TestCase):
+    def setUp(self):
+        self.product = make_product()
+
+    def suggest(self, quantity):
+        return [{'product': self.product, 'suggested_qty': quantity}]
+
+    def order(self, ordered, received=0):
+        order = PurchaseOrder.objects.create(
+            supplier=self.product.supplier, location=default_location(), status='ORDERED',
+        )
+        item = PurchaseOrderItem.objects.create(
+            purchase_order=order, product=self.product, ordered_quantity=ordered, unit_price=5,
+        )
+        if received:
+            receive_purchase_order(order.pk, {item.pk: received})
+
+    def test_inbound_quantity_is_subtracted(self):
+        self.order(10, received=4)
+        created = create_draft_purchase_orders(self.suggest(15))
+        self.assertEqual(created[0].items.get().ordered_quantity, 9)
+
+    def test_nothing_is_drafted_when_enough_is_inbound(self):
+        self.order(20)
+        self.assertEqual(create_draft_purchase_orders(self.suggest(15)), [])
+
+    def test_command_rejects_an_invalid_service_level(self):
+        with self.assertRaises(CommandError):
+            call_command('generate_draft_purchase_orders', '--service-level', '1.0')
@@ -7,4 +7,6 @@ urlpatterns = [
     path('purchase-orders/update/<int:pk>/', views.PurchaseOrderUpdateView.as_view(), name='update_purchase_order'),
     path('purchase-orders/delete/<int:pk>/', views.PurchaseOrderDeleteView.as_view(), name='delete_purchase_order'),
     path('purchase-orders/detail/<int:pk>/', views.purchase_order_detail_view, name='purchase_order_detail'),
+    path('purchase-orders/receive/<int:pk>/', views.receive_purchase_order_view, name='receive_purchase_order'),
+    path('purchase-orders/generate-drafts/', views.generate_draft_purchase_orders, name='generate_draft_purchase_orders'),
 ]
\ No newline at end of file
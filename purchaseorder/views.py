@@ -3,28 +3,44 @@ from django.contrib import messages
 from django.forms import inlineformset_factory, BaseInlineFormSet
 from django.views.generic import ListView, CreateView, UpdateView, DeleteView
 from django.urls import reverse_lazy
-from .models import PurchaseOrder, PurchaseOrderItem
+from django.utils.decorators import method_decorator
+from core.db_routers import use_replica
+from core.forms import LineAmountsFormMixin
+from core.pricing import money
+from core.versioning import conditional
+from .models import PurchaseOrder, PurchaseOrderItem, generate_po_number
+from .receiving import receive_purchase_order
+from .replenishment import create_draft_purchase_orders
+from stock.forecast import parse_reorder_params
 from supplier.models import Supplier
 from product.models import Product
-from decimal import Decimal, ROUND_HALF_UP
+from stock.levels import default_location
+from stock.models import Location
+from decimal import Decimal
 import logging
 from django import forms
-from django.db.models import F
+from django.db.models import F, Q
+from django.views.decorators.http import require_POST
 from datetime import datetime
 
 logger = logging.getLogger(__name__)
 
-class PurchaseOrderItemForm(forms.ModelForm):
+class PurchaseOrderItemForm(LineAmountsFormMixin, forms.ModelForm):
+    line_amount_attrs = {'class': 'form-control', 'readonly': True}
+
     class Meta:
         model = PurchaseOrderItem
         fields = [
             'id', 'product', 'stock', 'ordered_quantity', 'received_quantity',
-            'unit_price', 'discount_percent', 'discount_value', 'vat_percent', 'vat_value', 'total'
+            'unit_price', 'discount_percent', 'vat_percent'
         ]
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        self.fields['product'].queryset = Product.objects.all()
+        # A soft-deleted product stays selectable on the lines that already use it
+        self.fields['product'].queryset = Product.all_objects.filter(
+            Q(deleted_at__isnull=True) | Q(pk=self.instance.product_id)
+        )
 
     def clean(self):
         cleaned_data = super().clean()
@@ -32,6 +48,10 @@ class PurchaseOrderItemForm(forms.ModelForm):
         received_quantity = cleaned_data.get('received_quantity')
         if ordered_quantity and received_quantity and received_quantity > ordered_quantity:
             raise forms.ValidationError("Received quantity cannot exceed ordered quantity.")
+        if received_quantity is not None and self.instance.pk and received_quantity < self.instance.posted_quantity:
+            raise forms.ValidationError(
+                f"Received quantity cannot go below {self.instance.posted_quantity}, which is already booked as purchases."
+            )
         return cleaned_data
 
 class PurchaseOrderItemFormSet(BaseInlineFormSet):
@@ -46,6 +66,8 @@ class PurchaseOrderItemFormSet(BaseInlineFormSet):
                         raise forms.ValidationError(f"Product {product.name} is selected multiple times.")
                     product_ids.append(product.id)
 
+@method_decorator(use_replica, name='dispatch')
+@method_decorator(conditional('purchases'), name='dispatch')
 class PurchaseOrderListView(ListView):
     model = PurchaseOrder
     template_name = 'manage_purchase_order.html'
@@ -61,7 +83,7 @@ class PurchaseOrderListView(ListView):
 class PurchaseOrderCreateView(CreateView):
     model = PurchaseOrder
     fields = [
-        'supplier', 'purchase_date', 'purchase_discount',
+        'supplier', 'location', 'purchase_date', 'purchase_discount',
         'total_discount', 'total_vat', 'grand_total', 'paid_amount', 'due_amount',
         'payment_type'
     ]
@@ -70,21 +92,7 @@ class PurchaseOrderCreateView(CreateView):
 
     def generate_po_number(self):
         """Generate a unique PO number in the format PO-YYYYMMDD-XXX"""
-        today_str = datetime.now().strftime('%Y%m%d')
-        last_po_today = PurchaseOrder.objects.filter(
-            po_number__startswith=f'PO-{today_str}-'
-        ).order_by('-po_number').first()
-        
-        if last_po_today:
-            try:
-                last_num = int(last_po_today.po_number.split('-')[-1])
-                new_num = last_num + 1
-            except (IndexError, ValueError):
-                new_num = 1
-        else:
-            new_num = 1
-            
-        return f'PO-{today_str}-{new_num:03d}'
+        return generate_po_number()
 
     def get_form(self, form_class=None):
         form = super().get_form(form_class)
@@ -93,6 +101,8 @@ class PurchaseOrderCreateView(CreateView):
             attrs={'type': 'date', 'class': 'form-control'}
         )
         form.fields['purchase_date'].initial = datetime.now().strftime('%Y-%m-%d')
+        form.fields['location'].queryset = Location.objects.filter(is_active=True)
+        form.fields['location'].initial = default_location()
         return form
 
     def get_context_data(self, **kwargs):
@@ -103,7 +113,7 @@ class PurchaseOrderCreateView(CreateView):
             formset=PurchaseOrderItemFormSet,
             fields=[
                 'id', 'product', 'stock', 'ordered_quantity', 'received_quantity',
-                'unit_price', 'discount_percent', 'discount_value', 'vat_percent', 'vat_value', 'total'
+                'unit_price', 'discount_percent', 'vat_percent'
             ],
             extra=1, can_delete=True,
             widgets={
@@ -114,10 +124,7 @@ class PurchaseOrderCreateView(CreateView):
                 'received_quantity': forms.NumberInput(attrs={'class': 'form-control', 'min': 0, 'step': 1}),
                 'unit_price': forms.NumberInput(attrs={'class': 'form-control', 'step': '0.01', 'min': '0.01'}),
                 'discount_percent': forms.NumberInput(attrs={'class': 'form-control', 'step': '0.01', 'min': 0, 'max': 100}),
-                'discount_value': forms.NumberInput(attrs={'class': 'form-control', 'readonly': True}),
                 'vat_percent': forms.NumberInput(attrs={'class': 'form-control', 'step': '0.01', 'min': 0, 'max': 100}),
-                'vat_value': forms.NumberInput(attrs={'class': 'form-control', 'readonly': True}),
-                'total': forms.NumberInput(attrs={'class': 'form-control', 'readonly': True}),
             }
         )
         if self.request.POST:
@@ -136,20 +143,8 @@ class PurchaseOrderCreateView(CreateView):
             formset.instance = self.object
             formset.save()
 
-            # Calculate totals
-            items_total = sum(item.total for item in self.object.items.all())
-            total_discount = sum(item.discount_value for item in self.object.items.all()) + form.cleaned_data['purchase_discount']
-            total_vat = sum(item.vat_value for item in self.object.items.all())
-            grand_total = items_total + total_vat - form.cleaned_data['purchase_discount']
-            paid_amount = form.cleaned_data.get('paid_amount', Decimal('0'))
-            due_amount = grand_total - paid_amount
-
-            # Update totals
-            self.object.total_discount = total_discount.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
-            self.object.total_vat = total_vat.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
-            self.object.grand_total = grand_total.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
-            self.object.paid_amount = paid_amount.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
-            self.object.due_amount = due_amount.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+            self.object.paid_amount = money(form.cleaned_data.get('paid_amount') or Decimal('0'))
+            self.object.apply_totals()
             self.object.save()
 
             # Check for discrepancies
@@ -166,9 +161,9 @@ class PurchaseOrderCreateView(CreateView):
 class PurchaseOrderUpdateView(UpdateView):
     model = PurchaseOrder
     fields = [
-        'supplier', 'purchase_date', 'purchase_discount',
+        'supplier', 'location', 'purchase_date', 'purchase_discount',
         'total_discount', 'total_vat', 'grand_total', 'paid_amount', 'due_amount',
-        'payment_type'
+        'payment_type', 'status'
     ]
     template_name = 'update_purchase_order.html'
     success_url = reverse_lazy('manage_purchase_order')
@@ -179,6 +174,7 @@ class PurchaseOrderUpdateView(UpdateView):
         form.fields['purchase_date'].widget = forms.DateInput(
             attrs={'type': 'date', 'class': 'form-control'}
         )
+        form.fields['location'].queryset = Location.objects.filter(Q(is_active=True) | Q(pk=self.object.location_id))
         return form
 
     def get_context_data(self, **kwargs):
@@ -189,7 +185,7 @@ class PurchaseOrderUpdateView(UpdateView):
             formset=PurchaseOrderItemFormSet,
             fields=[
                 'id', 'product', 'stock', 'ordered_quantity', 'received_quantity',
-                'unit_price', 'discount_percent', 'discount_value', 'vat_percent', 'vat_value', 'total'
+                'unit_price', 'discount_percent', 'vat_percent'
             ],
             extra=0, can_delete=True,
             widgets={
@@ -200,10 +196,7 @@ class PurchaseOrderUpdateView(UpdateView):
                 'received_quantity': forms.NumberInput(attrs={'class': 'form-control', 'min': 0, 'step': 1}),
                 'unit_price': forms.NumberInput(attrs={'class': 'form-control', 'step': '0.01', 'min': '0.01'}),
                 'discount_percent': forms.NumberInput(attrs={'class': 'form-control', 'step': '0.01', 'min': 0, 'max': 100}),
-                'discount_value': forms.NumberInput(attrs={'class': 'form-control', 'readonly': True}),
                 'vat_percent': forms.NumberInput(attrs={'class': 'form-control', 'step': '0.01', 'min': 0, 'max': 100}),
-                'vat_value': forms.NumberInput(attrs={'class': 'form-control', 'readonly': True}),
-                'total': forms.NumberInput(attrs={'class': 'form-control', 'readonly': True}),
             }
         )
         if self.request.POST:
@@ -221,20 +214,8 @@ class PurchaseOrderUpdateView(UpdateView):
             formset.instance = self.object
             formset.save()
 
-            # Calculate totals
-            items_total = sum(item.total for item in self.object.items.all())
-            total_discount = sum(item.discount_value for item in self.object.items.all()) + form.cleaned_data['purchase_discount']
-            total_vat = sum(item.vat_value for item in self.object.items.all())
-            grand_total = items_total + total_vat - form.cleaned_data['purchase_discount']
-            paid_amount = form.cleaned_data.get('paid_amount', Decimal('0'))
-            due_amount = grand_total - paid_amount
-
-            # Update totals
-            self.object.total_discount = total_discount.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
-            self.object.total_vat = total_vat.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
-            self.object.grand_total = grand_total.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
-            self.object.paid_amount = paid_amount.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
-            self.object.due_amount = due_amount.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+            self.object.paid_amount = money(form.cleaned_data.get('paid_amount') or Decimal('0'))
+            self.object.apply_totals()
             self.object.save()
 
             # Check for discrepancies
@@ -270,4 +251,47 @@ def purchase_order_detail_view(request, pk):
         'purchase_order': purchase_order,
         'discrepancies': discrepancies
     }
-    return render(request, 'purchase_order_detail.html', context)
\ No newline at end of file
+    return render(request, 'purchase_order_detail.html', context)
+
+@require_POST
+def generate_draft_purchase_orders(request):
+    try:
+        params = parse_reorder_params(request.POST)
+    except ValueError as e:
+        messages.error(request, f"Could not generate purchase orders: {e}")
+        return redirect('reorder_report')
+    created = create_draft_purchase_orders(**params)
+    if created:
+        messages.success(request, f"Created {len(created)} draft purchase order(s): {', '.join(po.po_number for po in created)}.")
+    else:
+        messages.info(request, "No products need reordering.")
+    return redirect('manage_purchase_order')
+
+def receive_purchase_order_view(request, pk):
+    purchase_order = get_object_or_404(PurchaseOrder, pk=pk)
+    items = purchase_order.items.select_related('product').order_by('id')
+    if request.method == 'POST':
+        received = {}
+        try:
+            for item in items:
+                value = request.POST.get(f'received-{item.id}', '').strip()
+                if value:
+                    received[item.id] = int(value)
+        except ValueError:
+            messages.error(request, "Received quantities must be whole numbers.")
+            return redirect('receive_purchase_order', pk=pk)
+        try:
+            purchase = receive_purchase_order(purchase_order.pk, received)
+        except ValueError as e:
+            messages.error(request, str(e))
+            return redirect('receive_purchase_order', pk=pk)
+        if purchase:
+            messages.success(request, f"Received goods booked as purchase {purchase.challan_no}.")
+        else:
+            messages.info(request, "No newly received quantities to book.")
+        return redirect('purchase_order_detail', pk=pk)
+    return render(request, 'receive_purchase_order.html', {
+        'purchase_order': purchase_order,
+        'items': items,
+        'receipts': purchase_order.receipts.order_by('id'),
+    })
\ No newline at end of file
@@ -0,0 +1,300 @@
+"""
+Batch upload of sales recorded offline by store terminals.
+
+Each sale carries a client-generated idempotency key. Keys already stored on
+Sale.idempotency_key (a unique index) are reported as duplicates and skipped, so
+a terminal can replay the same batch as often as it needs to. The remaining
+sales are validated against one bulk load of customers, products and the stock
+levels at the batch's location, priced in one pass, and inserted with
+bulk_create(). The work the per-row save signals would have done (stock levels,
+checkpoints, data versions, sales cube days) is done once for the whole batch.
+
+A sale that fails validation is rejected on its own; the rest of the batch is
+still applied.
+"""
+import logging
+from collections import defaultdict
+from decimal import Decimal, ROUND_HALF_UP
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from core import versioning
+from core.pricing import HUNDRED, header_totals, price_lines, to_decimal
+from customer.models import Customer
+from product.models import Product
+from stock import levels
+from stock.archive import closed_through
+from stock.history import invalidate_from
+from stock.models import Location, StockLevel
+from . import cube
+from .models import Sale, SaleItem
+
+logger = logging.getLogger(__name__)
+
+MAX_BATCH_SIZE = 500
+MAX_KEY_LENGTH = Sale._meta.get_field('idempotency_key').max_length
+
+
+class BatchError(ValueError):
+    """The batch as a whole is malformed; nothing was applied."""
+
+
+def _fits(number, model, name):
+    """Whether number fits the integer digits of model's DecimalField name."""
+    field = model._meta.get_field(name)
+    if field.generated:
+        field = field.output_field
+    return number.adjusted() < field.max_digits - field.decimal_places
+
+
+def _number(value, model, name, maximum=None):
+    """
+    Read value for a DecimalField of model: a finite number that fits the column,
+    rounded half-up to its decimal places, from 0 to maximum. Raises ValueError.
+    """
+    field = model._meta.get_field(name)
+    label = name.replace('_', ' ').capitalize()
+    number = to_decimal(value)
+    if not number.is_finite():
+        raise ValueError(f"{label} must be a finite number.")
+    # Checked before rounding as well, so quantize() never overflows
+    if not _fits(number, model, name):
+        raise ValueError(f"{label} is too large.")
+    number = number.quantize(Decimal(1).scaleb(-field.decimal_places), rounding=ROUND_HALF_UP)
+    if not _fits(number, model, name):
+        raise ValueError(f"{label} is too large.")
+    if number < 0:
+        raise ValueError(f"{label} cannot be negative.")
+    if maximum is not None and number > maximum:
+        raise ValueError(f"{label} cannot be more than {maximum}.")
+    return number
+
+
+def _line_bound(line):
+    # The line total before discount, which the priced total can never exceed
+    return line['quantity'] * line['rate'] * (HUNDRED + line['vat_percent']) / HUNDRED
+
+
+def _parse_sale(entry, index):
+    """Normalise one sale entry; returns (sale dict, errors)."""
+    errors = []
+    if not isinstance(entry, dict):
+        return None, [f"Sale {index + 1} must be an object."]
+    key = entry.get('key')
+    if not isinstance(key, str) or not key.strip() or len(key) > MAX_KEY_LENGTH:
+        return None, [f"Sale {index + 1} needs a key of 1-{MAX_KEY_LENGTH} characters."]
+
+    sale = {'key': key, 'customer_id': entry.get('customer'), 'items': []}
+    try:
+        for field in ('sale_discount', 'shipping_cost', 'paid_amount'):
+            sale[field] = _number(entry.get(field), Sale, field)
+    except ValueError as e:
+        errors.append(str(e))
+
+    sale['date'] = timezone.now()
+    if entry.get('date'):
+        date = parse_datetime(str(entry['date']))
+        if date is None:
+            errors.append(f"Invalid date '{entry['date']}'.")
+        else:
+            sale['date'] = timezone.make_aware(date) if timezone.is_naive(date) else date
+
+    items = entry.get('items')
+    if not isinstance(items, list) or not items:
+        errors.append("At least one item is required.")
+        items = []
+    for number, item in enumerate(items, start=1):
+        if not isinstance(item, dict):
+            errors.append(f"Item {number} must be an object.")
+            continue
+        try:
+            line = {
+                'product_id': item.get('product'),
+                'quantity': _number(item.get('quantity'), SaleItem, 'quantity'),
+                'rate': _number(item.get('rate'), SaleItem, 'rate'),
+                'discount_percent': _number(item.get('discount_percent'), SaleItem, 'discount_percent', HUNDRED),
+                'vat_percent': _number(item.get('vat_percent'), SaleItem, 'vat_percent', HUNDRED),
+                'description': str(item.get('description') or ''),
+            }
+        except ValueError as e:
+            errors.append(f"Item {number}: {e}")
+            continue
+        if line['quantity'] <= 0:
+            errors.append(f"Item {number}: Quantity must be positive.")
+        if not _fits(_line_bound(line), SaleItem, 'total'):
+            errors.append(f"Item {number}: The line total is too large.")
+        sale['items'].append(line)
+    if not errors:
+        if not _fits(sum(map(_line_bound, sale['items']), sale['shipping_cost']), Sale, 'net_total'):
+            errors.append("The sale total is too large.")
+    return sale, errors
+
+
+def apply_sale_batch(payload, terminal=None):
+    """
+    Apply a batch of offline sales and return one result per sale, in order.
+
+    payload is {'location': id (optional), 'sales': [{'key', 'customer', 'date',
+    'sale_discount', 'shipping_cost', 'paid_amount', 'items': [{'product',
+    'quantity', 'rate', 'discount_percent', 'vat_percent', 'description'}]}]}.
+    Each result is {'key', 'status': 'created' | 'duplicate' | 'rejected'} plus
+    'sale_id' or 'errors'. terminal names the sender in the log. Raises BatchError
+    if the payload itself is unusable.
+    """
+    if not isinstance(payload, dict) or not isinstance(payload.get('sales'), list):
+        raise BatchError("Expected an object with a 'sales' list.")
+    entries = payload['sales']
+    if len(entries) > MAX_BATCH_SIZE:
+        raise BatchError(f"At most {MAX_BATCH_SIZE} sales per batch.")
+
+    location_id = payload.get('location')
+    if location_id is None:
+        location = levels.default_location()
+    else:
+        location = Location.objects.filter(pk=location_id, is_active=True).first() if str(location_id).isdigit() else None
+        if location is None:
+            raise BatchError(f"Unknown location '{location_id}'.")
+
+    try:
+        return _apply(entries, location, terminal)
+    except IntegrityError:
+        # Another request stored one of these keys between our lookup and insert;
+        # the retry sees it and reports it as a duplicate.
+        logger.info("Sale batch hit a concurrent idempotency key, retrying")
+        return _apply(entries, location, terminal)
+
+
+def _apply(entries, location, terminal):
+    results = [None] * len(entries)
+    parsed = []
+    for index, entry in enumerate(entries):
+        sale, errors = _parse_sale(entry, index)
+        if errors:
+            results[index] = {'key': sale['key'] if sale else None, 'status': 'rejected', 'errors': errors}
+        else:
+            parsed.append((index, sale))
+
+    # Cheap skip of keys already applied, through the unique index
+    existing = dict(
+        Sale.objects.filter(idempotency_key__in=[sale['key'] for _, sale in parsed])
+        .values_list('idempotency_key', 'id')
+    )
+    pending, seen = [], set()
+    for index, sale in parsed:
+        if sale['key'] in existing:
+            results[index] = {'key': sale['key'], 'status': 'duplicate', 'sale_id': existing[sale['key']]}
+        elif sale['key'] in seen:
+            results[index] = {'key': sale['key'], 'status': 'rejected', 'errors': ["Key repeated within the batch."]}
+        else:
+            seen.add(sale['key'])
+            pending.append((index, sale))
+
+    # One load for every customer and product the batch mentions
+    customers = Customer.objects.in_bulk({sale['customer_id'] for _, sale in pending if str(sale['customer_id']).isdigit()})
+    product_ids = {
+        item['product_id'] for _, sale in pending for item in sale['items'] if str(item['product_id']).isdigit()
+    }
+    products = Product.objects.select_related('unit').in_bulk(product_ids)
+    closed_end = closed_through()
+
+    with transaction.atomic():
+        # Lock this location's levels for the batch's products and spend them as sales are accepted
+        available = defaultdict(Decimal, StockLevel.objects.select_for_update().filter(
+            location=location, product_id__in=products,
+        ).values_list('product_id', 'quantity'))
+
+        accepted = []
+        for index, sale in pending:
+            errors = []
+            customer = customers.get(int(sale['customer_id'])) if str(sale['customer_id']).isdigit() else None
+            if customer is None:
+                errors.append(f"Unknown customer '{sale['customer_id']}'.")
+            if closed_end and timezone.localdate(sale['date']) <= closed_end:
+                errors.append(f"The period through {closed_end} is closed.")
+            wanted = defaultdict(Decimal)
+            for number, item in enumerate(sale['items'], start=1):
+                product = products.get(int(item['product_id'])) if str(item['product_id']).isdigit() else None
+                if product is None:
+                    errors.append(f"Item {number}: unknown product '{item['product_id']}'.")
+                else:
+                    item['product'] = product
+                    wanted[product.id] += item['quantity']
+            for product_id, quantity in wanted.items():
+                if quantity > available[product_id]:
+                    errors.append(
+                        f"Insufficient stock for {products[product_id].name} "
+                        f"(Available: {max(available[product_id], 0)})."
+                    )
+            if errors:
+                results[index] = {'key': sale['key'], 'status': 'rejected', 'errors': errors}
+                continue
+            sale['customer'] = customer
+            sale['available'] = {product_id: available[product_id] for product_id in wanted}
+            for product_id, quantity in wanted.items():
+                available[product_id] -= quantity
+            accepted.append((index, sale))
+
+        if not accepted:
+            return results
+
+        # Price every line of the batch in one pass
+        lines = [item for _, sale in accepted for item in sale['items']]
+        for item, amounts in zip(lines, price_lines(
+            (item['quantity'], item['rate'], item['discount_percent'], item['vat_percent']) for item in lines
+        )):
+            item['amounts'] = amounts
+
+        sales = []
+        for _, sale in accepted:
+            totals = header_totals(
+                (item['amounts'] for item in sale['items']),
+                discount=sale['sale_discount'], shipping_cost=sale['shipping_cost'], paid_amount=sale['paid_amount'],
+            )
+            sales.append(Sale(
+                customer=sale['customer'],
+                location=location,
+                date=sale['date'],
+                idempotency_key=sale['key'],
+                sale_discount=sale['sale_discount'],
+                shipping_cost=sale['shipping_cost'],
+                total_discount=totals.total_discount,
+                total_vat=totals.total_vat,
+                grand_total=totals.items_total,
+                net_total=totals.net_total,
+                paid_amount=sale['paid_amount'],
+            ))
+        Sale.objects.bulk_create(sales, batch_size=500)
+        if any(sale.pk is None for sale in sales):
+            # Backends that cannot return ids from a bulk insert
+            ids = dict(Sale.objects.filter(idempotency_key__in=[s.idempotency_key for s in sales]).values_list('idempotency_key', 'id'))
+            for sale in sales:
+                sale.pk = ids[sale.idempotency_key]
+
+        items = []
+        for sale, (_, data) in zip(sales, accepted):
+            for item in data['items']:
+                items.append(SaleItem(
+                    sale=sale,
+                    product=item['product'],
+                    description=item['description'],
+                    available_quantity=data['available'][item['product'].id],
+                    unit=item['product'].unit,
+                    quantity=item['quantity'],
+                    rate=item['rate'],
+                    discount_percent=item['discount_percent'],
+                    vat_percent=item['vat_percent'],
+                    unit_cost=item['product'].cost_price,
+                ))
+        SaleItem.objects.bulk_create(items, batch_size=1000)
+
+        # What the per-row signals would have done, once for the whole batch
+        # Every sale in the batch is at the same location, so any of them can stand in as the header
+        levels.adjust(levels.lines_deltas(SaleItem, sales[0], items))
+        invalidate_from(min(timezone.localdate(sale.date) for sale in sales))
+        versioning.bump('sales', 'stock')
+        cube.mark_dirty(*{cube.sale_day(sale.date) for sale in sales})
+
+    for sale, (index, data) in zip(sales, accepted):
+        results[index] = {'key': data['key'], 'status': 'created', 'sale_id': sale.pk}
+    logger.info(f"Sale batch from {terminal or 'unknown terminal'} at {location.name}: {len(sales)} created")
+    return results
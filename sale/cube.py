@@ -0,0 +1,311 @@
+"""
+Sales analytics cube.
+
+Sale lines are pre-aggregated into four rollup tables, from finest to coarsest:
+
+    SalesDayRollup           day   x product x customer
+    SalesDayProductRollup    day   x product
+    SalesMonthRollup         month x product x customer
+    SalesMonthProductRollup  month x product
+
+Every rollup also carries the product's category and supplier. query() answers a
+breakdown by any of product, category, customer and supplier, bucketed by day,
+week, month or year, from the coarsest rollup that still has the dimensions,
+filters and date precision the request needs. A year of monthly category totals
+therefore reads a few hundred rows, not every sale line.
+
+The rollups are refreshed incrementally. Saving or deleting a sale or sale line
+marks its day stale (SalesCubeDirtyDay), once per transaction, and queues a
+sale.refresh_cube job. refresh() claims the stale days, recomputes them from
+SaleItem (and ArchivedSaleItem for closed periods), then rebuilds the months they
+fall in from the day rollups. Until that job runs, query() serves the previous totals.
+"""
+import calendar
+import logging
+from datetime import date, timedelta
+from decimal import Decimal
+from django.db import transaction
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Sum
+from django.db.models.functions import TruncDate, TruncMonth, TruncWeek, TruncYear
+from django.utils import timezone
+from core import jobs, oncommit
+from customer.models import Customer
+from product.models import Category, Product
+from supplier.models import Supplier
+from .models import (
+    ArchivedSaleItem, SaleItem, SalesCubeDirtyDay, SalesDayProductRollup, SalesDayRollup,
+    SalesMonthProductRollup, SalesMonthRollup,
+)
+
+logger = logging.getLogger(__name__)
+
+DIMENSIONS = ('product', 'category', 'customer', 'supplier')
+PERIODS = ('day', 'week', 'month', 'year')
+MEASURES = ('quantity', 'gross', 'discount', 'vat', 'total', 'lines')
+REFRESH_DELAY = timedelta(seconds=60)
+DAYS_PER_REFRESH = 31
+
+# Coarsest first: (model, period field, period grain, dimensions available)
+ROLLUPS = (
+    (SalesMonthProductRollup, 'month', 'month', {'product', 'category', 'supplier'}),
+    (SalesMonthRollup, 'month', 'month', {'product', 'category', 'supplier', 'customer'}),
+    (SalesDayProductRollup, 'day', 'day', {'product', 'category', 'supplier'}),
+    (SalesDayRollup, 'day', 'day', {'product', 'category', 'supplier', 'customer'}),
+)
+TRUNCATE = {'day': TruncDate, 'week': TruncWeek, 'month': TruncMonth, 'year': TruncYear}
+# Drill-down order on the analysis page
+DRILL_DIMENSION = {'category': 'product', 'supplier': 'product', 'product': 'customer'}
+DRILL_PERIOD = {'year': 'month', 'month': 'day', 'week': 'day'}
+
+
+# --- Staleness tracking ---
+
+def sale_day(value):
+    """The cube day of a Sale.date value."""
+    return timezone.localdate(value) if timezone.is_aware(value) else value.date()
+
+
+def mark_dirty(*days):
+    """Mark sale days whose rollups must be recomputed."""
+    days = {day for day in days if day is not None}
+    if not days:
+        return
+    pending = oncommit.collect('cube_days', _mark)
+    if pending is None:
+        _mark(days)
+    else:
+        pending.extend(days)
+
+
+def _mark(days):
+    SalesCubeDirtyDay.objects.bulk_create([SalesCubeDirtyDay(day=day) for day in set(days)], ignore_conflicts=True)
+    # One queued refresh at a time picks up every day marked before it runs
+    if not jobs.Job.objects.filter(name='sale.refresh_cube', status='QUEUED').exists():
+        jobs.enqueue('sale.refresh_cube', run_after=timezone.now() + REFRESH_DELAY)
+
+
+# --- Refresh ---
+
+def _day_rows(days):
+    """Aggregate the live and archived sale lines of the given days into {(day, product, customer): measures}."""
+    gross = ExpressionWrapper(F('quantity') * F('rate'), output_field=DecimalField(max_digits=16, decimal_places=2))
+    sources = (
+        SaleItem.objects.filter(sale__date__date__in=days).annotate(day=TruncDate('sale__date')),
+        ArchivedSaleItem.objects.filter(sale_date__in=days).annotate(day=F('sale_date')),
+    )
+    totals = {}
+    for lines in sources:
+        rows = (
+            lines.values('day', 'product_id', 'sale__customer_id', 'product__category_id', 'product__supplier_id')
+            .annotate(
+                quantity_sum=Sum('quantity'), gross_sum=Sum(gross), discount_sum=Sum('discount_value'),
+                vat_sum=Sum('vat_value'), total_sum=Sum('total'), line_count=Count('id'),
+            )
+            .order_by()
+        )
+        for row in rows:
+            entry = totals.setdefault((row['day'], row['product_id'], row['sale__customer_id']), {
+                'category_id': row['product__category_id'], 'supplier_id': row['product__supplier_id'],
+                'quantity': Decimal('0'), 'gross': Decimal('0'), 'discount': Decimal('0'),
+                'vat': Decimal('0'), 'total': Decimal('0'), 'lines': 0,
+            })
+            entry['quantity'] += Decimal(row['quantity_sum'] or 0)
+            entry['gross'] += Decimal(row['gross_sum'] or 0)
+            entry['discount'] += Decimal(row['discount_sum'] or 0)
+            entry['vat'] += Decimal(row['vat_sum'] or 0)
+            entry['total'] += Decimal(row['total_sum'] or 0)
+            entry['lines'] += row['line_count']
+    return totals
+
+
+def _fold(totals, key_of):
+    """Sum measure dicts into coarser keys, keeping category and supplier."""
+    folded = {}
+    for key, entry in totals.items():
+        target = folded.setdefault(key_of(key), dict(entry, **{name: 0 for name in MEASURES}))
+        for name in MEASURES:
+            target[name] += entry[name]
+    return folded
+
+
+def _refresh_days(days):
+    """
+    Recompute the rollups of the given stale days and return how many were refreshed.
+
+    The dirty rows are claimed (locked and deleted) before any sale line is read. A
+    sale committed after that marks its day again, and the next refresh picks it up;
+    days another refresh has already claimed are skipped.
+    """
+    with transaction.atomic():
+        claimed = list(
+            SalesCubeDirtyDay.objects.select_for_update().filter(day__in=days).values_list('pk', 'day')
+        )
+        if not claimed:
+            return 0
+        SalesCubeDirtyDay.objects.filter(pk__in=[pk for pk, _ in claimed]).delete()
+        days = sorted(day for _, day in claimed)
+        months = sorted({day.replace(day=1) for day in days})
+        totals = _day_rows(days)
+        by_product = _fold(totals, lambda key: (key[0], key[1]))
+        SalesDayRollup.objects.filter(day__in=days).delete()
+        SalesDayProductRollup.objects.filter(day__in=days).delete()
+        SalesDayRollup.objects.bulk_create([
+            SalesDayRollup(day=day, product_id=product_id, customer_id=customer_id, **entry)
+            for (day, product_id, customer_id), entry in totals.items()
+        ], batch_size=1000)
+        SalesDayProductRollup.objects.bulk_create([
+            SalesDayProductRollup(day=day, product_id=product_id, **entry)
+            for (day, product_id), entry in by_product.items()
+        ], batch_size=1000)
+
+        # Rebuild the touched months from their (now current) day rollups
+        for model, day_model, keys in (
+            (SalesMonthRollup, SalesDayRollup, ('product_id', 'customer_id', 'category_id', 'supplier_id')),
+            (SalesMonthProductRollup, SalesDayProductRollup, ('product_id', 'category_id', 'supplier_id')),
+        ):
+            model.objects.filter(month__in=months).delete()
+            rows = (
+                day_model.objects.filter(day__gte=months[0], day__lte=_month_end(months[-1]))
+                .annotate(month_start=TruncMonth('day')).filter(month_start__in=months)
+                .values('month_start', *keys).annotate(**{name: Sum(name) for name in MEASURES}).order_by()
+            )
+            model.objects.bulk_create([
+                model(month=row.pop('month_start'), **row) for row in rows
+            ], batch_size=1000)
+    return len(days)
+
+
+def _month_end(month):
+    return month.replace(day=calendar.monthrange(month.year, month.month)[1])
+
+
+def refresh(limit=None):
+    """Recompute every stale day (up to limit days), a month's worth at a time; returns the number of days."""
+    refreshed = 0
+    while limit is None or refreshed < limit:
+        batch = DAYS_PER_REFRESH if limit is None else min(DAYS_PER_REFRESH, limit - refreshed)
+        days = list(SalesCubeDirtyDay.objects.order_by('day').values_list('day', flat=True)[:batch])
+        if not days:
+            break
+        refreshed += _refresh_days(days)
+    if refreshed:
+        logger.info(f"Sales cube refreshed for {refreshed} day(s)")
+    return refreshed
+
+
+def mark_all():
+    """Mark every day that has sales or rollups as stale, for a full rebuild."""
+    live = SaleItem.objects.annotate(day=TruncDate('sale__date')).values_list('day', flat=True).distinct().order_by()
+    archived = ArchivedSaleItem.objects.values_list('sale_date', flat=True).distinct().order_by()
+    rolled_up = SalesDayProductRollup.objects.values_list('day', flat=True).distinct().order_by()
+    days = set(live) | set(archived) | set(rolled_up)
+    SalesCubeDirtyDay.objects.bulk_create([SalesCubeDirtyDay(day=day) for day in days], ignore_conflicts=True, batch_size=1000)
+    return len(days)
+
+
+# --- Query ---
+
+def choose_rollup(dimensions, period=None, start=None, end=None, filters=()):
+    """
+    Return (model, period field) of the coarsest rollup that can answer a query
+    grouped by dimensions and period, over [start, end], filtered on filters.
+    """
+    needed = set(dimensions) | set(filters)
+    month_aligned = (
+        period in (None, 'month', 'year')
+        and (start is None or start.day == 1)
+        and (end is None or end == _month_end(end))
+    )
+    for model, field, grain, available in ROLLUPS:
+        if needed <= available and (grain == 'day' or month_aligned):
+            return model, field
+    raise ValueError("No rollup covers that combination.")
+
+
+def query(dimensions=(), period=None, start=None, end=None, filters=None):
+    """
+    Sales totals grouped by dimensions (any of DIMENSIONS) and an optional time
+    bucket (one of PERIODS), for sales dated in [start, end] and matching filters
+    ({dimension: id}). Returns a list of dicts with '<dimension>_id' keys, 'period'
+    when bucketed, and the MEASURES, ordered by period then total descending.
+    """
+    filters = filters or {}
+    unknown = [name for name in (*dimensions, *filters) if name not in DIMENSIONS]
+    if unknown:
+        raise ValueError(f"Unknown dimension '{unknown[0]}'.")
+    if period is not None and period not in PERIODS:
+        raise ValueError(f"Unknown period '{period}'.")
+
+    model, field = choose_rollup(dimensions, period, start, end, filters)
+    rows = model.objects.all()
+    if start is not None:
+        rows = rows.filter(**{f'{field}__gte': start})
+    if end is not None:
+        rows = rows.filter(**{f'{field}__lte': end})
+    rows = rows.filter(**{f'{name}_id': value for name, value in filters.items()})
+
+    group = [f'{name}_id' for name in dimensions]
+    if period is not None:
+        # Month rollups are already month-bucketed; truncation only coarsens them further
+        rows = rows.annotate(period=TRUNCATE[period](field) if period != field else F(field))
+        group.insert(0, 'period')
+    rows = rows.values(*group).annotate(**{name: Sum(name) for name in MEASURES})
+    ordering = (['period'] if period is not None else []) + ['-total']
+    return list(rows.order_by(*ordering))
+
+
+# --- Drill-down ---
+
+def parse_analysis_params(data):
+    """Read by, period, start, end and dimension filters from a QueryDict, raising ValueError if invalid."""
+    params = {
+        'by': data.get('by') or 'category',
+        'period': data.get('period') or 'year',
+        'start': None,
+        'end': None,
+        'filters': {},
+    }
+    if params['by'] not in DIMENSIONS or params['period'] not in PERIODS:
+        raise ValueError("Unknown breakdown.")
+    for name in ('start', 'end'):
+        if data.get(name):
+            params[name] = date.fromisoformat(data[name])
+    for name in DIMENSIONS:
+        if data.get(name):
+            params['filters'][name] = int(data[name])
+    return params
+
+
+def period_range(period, start):
+    """First and last day of the period bucket starting on start."""
+    if period == 'year':
+        return start, start.replace(month=12, day=31)
+    if period == 'month':
+        return start, _month_end(start)
+    if period == 'week':
+        return start, start + timedelta(days=6)
+    return start, start
+
+
+def dimension_labels(dimension, ids):
+    """Return {id: display name} for ids of a dimension, including soft-deleted rows."""
+    if dimension == 'category':
+        rows = Category.objects.filter(pk__in=ids).values_list('pk', 'name')
+    elif dimension == 'product':
+        rows = Product.all_objects.filter(pk__in=ids).values_list('pk', 'name')
+    elif dimension == 'customer':
+        rows = Customer.all_objects.filter(pk__in=ids).values_list('pk', 'customer_name')
+    else:
+        rows = Supplier.all_objects.filter(pk__in=ids).values_list('pk', 'supplier_name')
+    return dict(rows)
+
+
+def drill_down(by, period, start=None, end=None, filters=None):
+    """query() grouped by one dimension and period, with each row's label attached."""
+    rows = query([by], period, start, end, filters)
+    labels = dimension_labels(by, {row[f'{by}_id'] for row in rows})
+    for row in rows:
+        row['key'] = row[f'{by}_id']
+        row['label'] = labels.get(row['key'], '-')
+        row['period_end'] = period_range(period, row['period'])[1]
+    return rows
@@ -0,0 +1,133 @@
+"""
+Rendered invoices, cached by sale id and version.
+
+Sale.version is bumped whenever the sale, one of its items, its customer, or the
+name of a product or unit it lists changes (see sale.signals), so a cached rendition never needs explicit invalidation: an edit
+simply makes the next request miss under a new key. The cache alias and timeout come
+from settings.INVOICE_CACHE (default 'default') and settings.INVOICE_CACHE_SECONDS
+(default 30 days).
+"""
+from django.conf import settings
+from django.core.cache import caches
+from django.template.loader import render_to_string
+from django.utils import timezone
+from core.pdf import PdfDocument
+from stock.archive import document_lines
+from .models import Sale
+
+
+def _cache():
+    return caches[getattr(settings, 'INVOICE_CACHE', 'default')]
+
+
+def _timeout():
+    return getattr(settings, 'INVOICE_CACHE_SECONDS', 60 * 60 * 24 * 30)
+
+
+def sale_version(sale_id):
+    """Return the current version of a sale, or None if it does not exist."""
+    return Sale.objects.filter(pk=sale_id).values_list('version', flat=True).first()
+
+
+def invoice_etag(request, pk):
+    version = sale_version(pk)
+    return None if version is None else f"invoice-{pk}-v{version}"
+
+
+def invoice_data(sale_id):
+    """Build the invoice dict with one query for the header and one for the items (archived once its period is closed)."""
+    sale = Sale.objects.select_related('customer').get(pk=sale_id)
+    customer = sale.customer
+    return {
+        'id': sale.id,
+        'version': sale.version,
+        'customer_name': customer.customer_name if customer else 'Unknown',
+        'customer_address': customer.address if customer else '-',
+        'customer_email': customer.email if customer else '-',
+        'customer_mobile': customer.mobile if customer else '-',
+        'customer_vat_number': customer.vat_no if customer else '-',
+        'date': timezone.localtime(sale.date) if timezone.is_aware(sale.date) else sale.date,
+        'sale_discount': sale.sale_discount,
+        'shipping_cost': sale.shipping_cost,
+        'total_discount': sale.total_discount,
+        'total_vat': sale.total_vat,
+        'grand_total': sale.grand_total,
+        'net_total': sale.net_total,
+        'paid_amount': sale.paid_amount,
+        'items': [{
+            'product_name': item.product.name if item.product else 'Unknown',
+            'quantity': item.quantity,
+            'rate': item.rate,
+            'discount_percent': item.discount_percent,
+            'discount_value': item.discount_value,
+            'vat_percent': item.vat_percent,
+            'vat_value': item.vat_value,
+            'total': item.total,
+            'description': item.description or '-',
+            'unit': item.unit.name if item.unit else '-',
+        } for item in document_lines(sale).select_related('product', 'unit').order_by('id')],
+    }
+
+
+def _cached(kind, sale_id, build):
+    version = sale_version(sale_id)
+    if version is None:
+        raise Sale.DoesNotExist(f"Sale {sale_id} does not exist.")
+    key = f"invoice:{kind}:{sale_id}:{version}"
+    cache = _cache()
+    output = cache.get(key)
+    if output is None:
+        data = invoice_data(sale_id)
+        output = build(data)
+        # Key by the version the data was read at, in case the sale changed meanwhile
+        cache.set(f"invoice:{kind}:{sale_id}:{data['version']}", output, _timeout())
+    return output
+
+
+def render_invoice_html(sale_id):
+    """Return the invoice body HTML (shared by sale_detail and the printable page)."""
+    return _cached('html', sale_id, lambda data: render_to_string('invoice_body.html', {'sale_data': data}))
+
+
+def render_invoice_pdf(sale_id):
+    return _cached('pdf', sale_id, _build_pdf)
+
+
+def _build_pdf(data):
+    doc = PdfDocument()
+    doc.add_text(f"Invoice #{data['id']}", size=40, bold=True)
+    doc.add_text(f"Date: {data['date']:%Y-%m-%d %H:%M}", size=22)
+    doc.add_rule()
+
+    doc.add_text("Billing To", size=20, bold=True)
+    doc.add_text(data['customer_name'] or 'Unknown', size=24, bold=True)
+    for label, value in (
+        ('', data['customer_address']),
+        ('Email: ', data['customer_email']),
+        ('Mobile: ', data['customer_mobile']),
+        ('VAT No: ', data['customer_vat_number']),
+    ):
+        doc.add_text(f"{label}{value or '-'}", size=20)
+    doc.add_space()
+
+    widths = [0.28, 0.1, 0.12, 0.1, 0.12, 0.12, 0.16]
+    aligns = ['left'] + ['right'] * 6
+    doc.add_row(['Product', 'Qty', 'Rate', 'Disc %', 'Discount', 'VAT', 'Total'], widths, bold=True, aligns=aligns)
+    doc.add_rule(spacing=6)
+    for item in data['items']:
+        doc.add_row([
+            item['product_name'], item['quantity'], item['rate'], item['discount_percent'],
+            item['discount_value'], item['vat_value'], item['total'],
+        ], widths, aligns=aligns)
+    doc.add_rule()
+
+    for label, key in (
+        ('Sale Discount', 'sale_discount'),
+        ('Shipping Cost', 'shipping_cost'),
+        ('Total Discount', 'total_discount'),
+        ('Total VAT', 'total_vat'),
+        ('Grand Total', 'grand_total'),
+        ('Paid Amount', 'paid_amount'),
+    ):
+        doc.add_text(f"{label}: ${data[key]}", size=22, bold=key == 'grand_total', align='right')
+    return doc.to_bytes()
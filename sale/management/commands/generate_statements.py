@@ -0,0 +1,34 @@
+import os
+from datetime import datetime
+from django.core.management.base import BaseCommand, CommandError
+from sale.statements import FORMATS, generate_statements
+
+
+class Command(BaseCommand):
+    help = "Write a statement of account for every customer with a balance or sales in a period."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', required=True, help="First day of the period (YYYY-MM-DD).")
+        parser.add_argument('--end', required=True, help="Last day of the period (YYYY-MM-DD).")
+        parser.add_argument('--output', help="Directory to write to. Defaults to settings.STATEMENT_DIR.")
+        parser.add_argument('--format', choices=FORMATS, default='pdf', help="Output format.")
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 2, help="Worker processes.")
+
+    def handle(self, *args, **options):
+        try:
+            start = datetime.strptime(options['start'], '%Y-%m-%d').date()
+            end = datetime.strptime(options['end'], '%Y-%m-%d').date()
+        except ValueError:
+            raise CommandError("Dates must be YYYY-MM-DD.")
+        if start > end:
+            raise CommandError("--start is after --end.")
+
+        def progress(done, total):
+            self.stdout.write(f"{done}/{total} statements")
+
+        result = generate_statements(
+            start, end, options['output'], fmt=options['format'], workers=options['workers'], progress=progress,
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Wrote {result['written']} statement(s) to {result['directory']}, {result['failed']} failed."
+        ))
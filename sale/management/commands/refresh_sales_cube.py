@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from sale import cube
+
+
+class Command(BaseCommand):
+    help = "Recompute the sales analytics rollups for stale days, or for every day with --full."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help="Rebuild every day that has sales.")
+
+    def handle(self, *args, **options):
+        if options['full']:
+            cube.mark_all()
+        days = cube.refresh()
+        self.stdout.write(self.style.SUCCESS(f"Refreshed the sales cube for {days} day(s)."))
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.1 on 2026-10-19 19:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sale', '0002_alter_sale_paid_amount_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sale',
+            name='version',
+            field=models.PositiveIntegerField(default=1, editable=False),
+        ),
+    ]
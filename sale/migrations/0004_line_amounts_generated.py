@@ -0,0 +1,45 @@
+# Generated by Django 5.2.1 on 2026-10-19 19:08
+
+import django.db.models.expressions
+import django.db.models.functions.math
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # A column cannot be altered into a generated one, so each amount is dropped
+    # and re-added; the database fills the new columns in for existing rows.
+
+    dependencies = [
+        ('sale', '0003_sale_version'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='saleitem',
+            name='discount_value',
+        ),
+        migrations.AddField(
+            model_name='saleitem',
+            name='discount_value',
+            field=models.GeneratedField(db_persist=True, expression=django.db.models.functions.math.Round(django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(models.F('quantity'), '*', models.F('rate')), '*', models.F('discount_percent')), '*', models.Value(Decimal('0.01'))), 2), output_field=models.DecimalField(decimal_places=2, max_digits=10)),
+        ),
+        migrations.RemoveField(
+            model_name='saleitem',
+            name='total',
+        ),
+        migrations.AddField(
+            model_name='saleitem',
+            name='total',
+            field=models.GeneratedField(db_persist=True, expression=django.db.models.functions.math.Round(django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(models.F('quantity'), '*', models.F('rate')), '-', django.db.models.functions.math.Round(django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(models.F('quantity'), '*', models.F('rate')), '*', models.F('discount_percent')), '*', models.Value(Decimal('0.01'))), 2)), '+', django.db.models.functions.math.Round(django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(models.F('quantity'), '*', models.F('rate')), '-', django.db.models.functions.math.Round(django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(models.F('quantity'), '*', models.F('rate')), '*', models.F('discount_percent')), '*', models.Value(Decimal('0.01'))), 2)), '*', models.F('vat_percent')), '*', models.Value(Decimal('0.01'))), 2)), 2), output_field=models.DecimalField(decimal_places=2, max_digits=10)),
+        ),
+        migrations.RemoveField(
+            model_name='saleitem',
+            name='vat_value',
+        ),
+        migrations.AddField(
+            model_name='saleitem',
+            name='vat_value',
+            field=models.GeneratedField(db_persist=True, expression=django.db.models.functions.math.Round(django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(models.F('quantity'), '*', models.F('rate')), '-', django.db.models.functions.math.Round(django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(models.F('quantity'), '*', models.F('rate')), '*', models.F('discount_percent')), '*', models.Value(Decimal('0.01'))), 2)), '*', models.F('vat_percent')), '*', models.Value(Decimal('0.01'))), 2), output_field=models.DecimalField(decimal_places=2, max_digits=10)),
+        ),
+    ]
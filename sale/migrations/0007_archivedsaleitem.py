@@ -0,0 +1,39 @@
+# Generated by Django 5.2.1 on 2026-10-19 19:21
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('product', '0008_alter_product_supplier_delete_supplier'),
+        ('sale', '0006_sale_idempotency_key'),
+        ('stock', '0004_closed_periods'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedSaleItem',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('description', models.TextField(blank=True)),
+                ('available_quantity', models.DecimalField(decimal_places=2, default=0.0, max_digits=10)),
+                ('quantity', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('rate', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('discount_percent', models.DecimalField(decimal_places=2, default=0.0, max_digits=5)),
+                ('vat_percent', models.DecimalField(decimal_places=2, default=0.0, max_digits=5)),
+                ('discount_value', models.DecimalField(decimal_places=2, default=0.0, max_digits=10)),
+                ('vat_value', models.DecimalField(decimal_places=2, default=0.0, max_digits=10)),
+                ('total', models.DecimalField(decimal_places=2, default=0.0, max_digits=10)),
+                ('sale_date', models.DateField()),
+                ('location', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='archived_sale_items', to='stock.location')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='product.product')),
+                ('sale', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_items', to='sale.sale')),
+                ('unit', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to='product.unit')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['sale_date', 'location'], name='archived_sale_item_date')],
+            },
+        ),
+    ]
@@ -0,0 +1,103 @@
+# Generated by Django 5.2.1 on 2026-10-19 19:31
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('customer', '0002_customer_deleted_at'),
+        ('product', '0009_product_deleted_at'),
+        ('sale', '0007_archivedsaleitem'),
+        ('supplier', '0003_supplier_deleted_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SalesCubeDirtyDay',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(unique=True)),
+                ('marked_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='SalesDayProductRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.DecimalField(decimal_places=2, default=0.0, max_digits=14)),
+                ('gross', models.DecimalField(decimal_places=2, default=0.0, max_digits=16)),
+                ('discount', models.DecimalField(decimal_places=2, default=0.0, max_digits=16)),
+                ('vat', models.DecimalField(decimal_places=2, default=0.0, max_digits=16)),
+                ('total', models.DecimalField(decimal_places=2, default=0.0, max_digits=16)),
+                ('lines', models.PositiveIntegerField(default=0)),
+                ('day', models.DateField()),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='product.category')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='product.product')),
+                ('supplier', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='supplier.supplier')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('day', 'product'), name='unique_sales_day_product_rollup')],
+            },
+        ),
+        migrations.CreateModel(
+            name='SalesDayRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.DecimalField(decimal_places=2, default=0.0, max_digits=14)),
+                ('gross', models.DecimalField(decimal_places=2, default=0.0, max_digits=16)),
+                ('discount', models.DecimalField(decimal_places=2, default=0.0, max_digits=16)),
+                ('vat', models.DecimalField(decimal_places=2, default=0.0, max_digits=16)),
+                ('total', models.DecimalField(decimal_places=2, default=0.0, max_digits=16)),
+                ('lines', models.PositiveIntegerField(default=0)),
+                ('day', models.DateField()),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='product.category')),
+                ('customer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='customer.customer')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='product.product')),
+                ('supplier', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='supplier.supplier')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('day', 'product', 'customer'), name='unique_sales_day_rollup')],
+            },
+        ),
+        migrations.CreateModel(
+            name='SalesMonthProductRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.DecimalField(decimal_places=2, default=0.0, max_digits=14)),
+                ('gross', models.DecimalField(decimal_places=2, default=0.0, max_digits=16)),
+                ('discount', models.DecimalField(decimal_places=2, default=0.0, max_digits=16)),
+                ('vat', models.DecimalField(decimal_places=2, default=0.0, max_digits=16)),
+                ('total', models.DecimalField(decimal_places=2, default=0.0, max_digits=16)),
+                ('lines', models.PositiveIntegerField(default=0)),
+                ('month', models.DateField()),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='product.category')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='product.product')),
+                ('supplier', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='supplier.supplier')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('month', 'product'), name='unique_sales_month_product_rollup')],
+            },
+        ),
+        migrations.CreateModel(
+            name='SalesMonthRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.DecimalField(decimal_places=2, default=0.0, max_digits=14)),
+                ('gross', models.DecimalField(decimal_places=2, default=0.0, max_digits=16)),
+                ('discount', models.DecimalField(decimal_places=2, default=0.0, max_digits=16)),
+                ('vat', models.DecimalField(decimal_places=2, default=0.0, max_digits=16)),
+                ('total', models.DecimalField(decimal_places=2, default=0.0, max_digits=16)),
+                ('lines', models.PositiveIntegerField(default=0)),
+                ('month', models.DateField()),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='product.category')),
+                ('customer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='customer.customer')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='product.product')),
+                ('supplier', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='supplier.supplier')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('month', 'product', 'customer'), name='unique_sales_month_rollup')],
+            },
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.1 on 2026-10-19 19:37
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def backfill_unit_cost(apps, schema_editor):
+    # Lines posted before costs were captured take the product's current cost price
+    db = schema_editor.connection.alias
+    Product = apps.get_model('product', 'Product')
+    cost = Subquery(Product.objects.using(db).filter(pk=OuterRef('product_id')).values('cost_price')[:1])
+    for name in ('SaleItem', 'ArchivedSaleItem'):
+        apps.get_model('sale', name).objects.using(db).filter(unit_cost__isnull=True).update(unit_cost=cost)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('customer', '0002_customer_deleted_at'),
+        ('product', '0009_product_deleted_at'),
+        ('sale', '0008_sales_cube'),
+        ('stock', '0004_closed_periods'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='archivedsaleitem',
+            name='unit_cost',
+            field=models.DecimalField(decimal_places=2, max_digits=10, null=True),
+        ),
+        migrations.AddField(
+            model_name='saleitem',
+            name='unit_cost',
+            field=models.DecimalField(decimal_places=2, editable=False, max_digits=10, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='sale',
+            index=models.Index(fields=['date'], name='sale_date'),
+        ),
+        migrations.RunPython(backfill_unit_cost, migrations.RunPython.noop),
+    ]
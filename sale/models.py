@@ -2,6 +2,7 @@ from django.db import models
 from customer.models import Customer
 from product.models import Product, Unit
 from django.utils import timezone
+from core.pricing import line_amount_fields
 
 class Sale(models.Model):
     customer = models.ForeignKey(Customer, on_delete=models.CASCADE, related_name='sales')
@@ -13,6 +14,20 @@ class Sale(models.Model):
     grand_total = models.DecimalField(max_digits=10, decimal_places=2, default=0.00, editable=False)
     net_total = models.DecimalField(max_digits=10, decimal_places=2, default=0.00, editable=False)
     paid_amount = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
+    location = models.ForeignKey('stock.Location', on_delete=models.PROTECT, related_name='sales')
+    version = models.PositiveIntegerField(default=1, editable=False)  # Bumped on every edit; keys the invoice cache
+    idempotency_key = models.CharField(max_length=64, unique=True, null=True, blank=True, editable=False)  # Set by terminal sync
+
+    class Meta:
+        indexes = [models.Index(fields=['date'], name='sale_date')]
+
+    def save(self, *args, **kwargs):
+        # version only ever moves forward in the database (see sale.signals); never write a stale copy back
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields if not field.primary_key and field.name != 'version'
+            ]
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return f"Sale {self.id} - {self.customer.customer_name} ({self.date})"
@@ -26,10 +41,105 @@ class SaleItem(models.Model):
     quantity = models.DecimalField(max_digits=10, decimal_places=2)
     rate = models.DecimalField(max_digits=10, decimal_places=2)
     discount_percent = models.DecimalField(max_digits=5, decimal_places=2, default=0.00)
-    discount_value = models.DecimalField(max_digits=10, decimal_places=2, default=0.00, editable=False)
     vat_percent = models.DecimalField(max_digits=5, decimal_places=2, default=0.00)
-    vat_value = models.DecimalField(max_digits=10, decimal_places=2, default=0.00, editable=False)
-    total = models.DecimalField(max_digits=10, decimal_places=2, default=0.00, editable=False)
+    unit_cost = models.DecimalField(max_digits=10, decimal_places=2, null=True, editable=False)  # Product cost price when posted
+    # Computed and stored by the database from quantity, rate and the percentages
+    discount_value, vat_value, total = line_amount_fields()
+
+    def __str__(self):
+        return f"{self.product.name} ({self.quantity}) - Sale {self.sale.id}"
+
+class ArchivedSaleItem(models.Model):
+    """
+    A SaleItem from a closed period, moved here by stock.archive. It keeps the
+    original id and its stored amounts; the sale's local date and location are
+    copied from the header so closed-period reads never need the join.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    sale = models.ForeignKey(Sale, on_delete=models.CASCADE, related_name='archived_items')
+    product = models.ForeignKey(Product, on_delete=models.CASCADE)
+    description = models.TextField(blank=True)
+    available_quantity = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
+    unit = models.ForeignKey(Unit, on_delete=models.SET_NULL, null=True)
+    quantity = models.DecimalField(max_digits=10, decimal_places=2)
+    rate = models.DecimalField(max_digits=10, decimal_places=2)
+    discount_percent = models.DecimalField(max_digits=5, decimal_places=2, default=0.00)
+    vat_percent = models.DecimalField(max_digits=5, decimal_places=2, default=0.00)
+    unit_cost = models.DecimalField(max_digits=10, decimal_places=2, null=True)
+    discount_value = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
+    vat_value = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
+    total = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
+    sale_date = models.DateField()
+    location = models.ForeignKey('stock.Location', on_delete=models.PROTECT, related_name='archived_sale_items')
+
+    class Meta:
+        indexes = [models.Index(fields=['sale_date', 'location'], name='archived_sale_item_date')]
+
+    def __str__(self):
+        return f"{self.product.name} ({self.quantity}) - Sale {self.sale_id}, archived"
+
+
+class SalesRollup(models.Model):
+    """
+    Pre-aggregated sale lines for the analytics cube (see sale.cube). Category and
+    supplier are copied from the product so rollups group by them without a join.
+    """
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+')
+    category = models.ForeignKey('product.Category', on_delete=models.CASCADE, related_name='+')
+    supplier = models.ForeignKey('supplier.Supplier', on_delete=models.CASCADE, related_name='+')
+    quantity = models.DecimalField(max_digits=14, decimal_places=2, default=0.00)
+    gross = models.DecimalField(max_digits=16, decimal_places=2, default=0.00)  # quantity * rate
+    discount = models.DecimalField(max_digits=16, decimal_places=2, default=0.00)
+    vat = models.DecimalField(max_digits=16, decimal_places=2, default=0.00)
+    total = models.DecimalField(max_digits=16, decimal_places=2, default=0.00)
+    lines = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        abstract = True
+
+
+class SalesDayRollup(SalesRollup):
+    day = models.DateField()
+    customer = models.ForeignKey(Customer, on_delete=models.CASCADE, related_name='+')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'product', 'customer'], name='unique_sales_day_rollup'),
+        ]
+
+
+class SalesDayProductRollup(SalesRollup):
+    day = models.DateField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'product'], name='unique_sales_day_product_rollup'),
+        ]
+
+
+class SalesMonthRollup(SalesRollup):
+    month = models.DateField()  # First day of the month
+    customer = models.ForeignKey(Customer, on_delete=models.CASCADE, related_name='+')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['month', 'product', 'customer'], name='unique_sales_month_rollup'),
+        ]
+
+
+class SalesMonthProductRollup(SalesRollup):
+    month = models.DateField()  # First day of the month
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['month', 'product'], name='unique_sales_month_product_rollup'),
+        ]
+
+
+class SalesCubeDirtyDay(models.Model):
+    """A sale day whose rollups are stale; sale.cube.refresh() recomputes and removes it."""
+    day = models.DateField(unique=True)
+    marked_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
-        return f"{self.product.name} ({self.quantity}) - Sale {self.sale.id}"
\ No newline at end of file
+        return f"Sales cube stale for {self.day}"
@@ -0,0 +1,93 @@
+from django.db.models import F, Q
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from customer.models import Customer
+from product.models import Product, Unit
+from . import cube
+from .models import (
+    ArchivedSaleItem, Sale, SaleItem, SalesDayProductRollup, SalesDayRollup, SalesMonthProductRollup,
+    SalesMonthRollup,
+)
+
+
+@receiver(post_save, sender=Sale)
+def bump_sale_version(sender, instance, created, raw=False, **kwargs):
+    # Increment in the database so a stale in-memory copy can never reuse an old version
+    if not created and not raw:
+        Sale.objects.filter(pk=instance.pk).update(version=F('version') + 1)
+        instance.refresh_from_db(fields=['version'])
+
+
+@receiver(post_save, sender=SaleItem)
+@receiver(post_delete, sender=SaleItem)
+def bump_sale_version_for_item(sender, instance, raw=False, **kwargs):
+    if not raw:
+        Sale.objects.filter(pk=instance.sale_id).update(version=F('version') + 1)
+
+
+@receiver(post_save, sender=Customer)
+def bump_customer_sale_versions(sender, instance, created, raw=False, **kwargs):
+    # Invoices print the customer's billing details
+    if not created and not raw:
+        Sale.objects.filter(customer=instance).update(version=F('version') + 1)
+
+
+@receiver(pre_save, sender=Product)
+@receiver(pre_save, sender=Unit)
+def remember_printed_name(sender, instance, raw=False, **kwargs):
+    instance._invoice_previous_name = None
+    if instance.pk and not raw:
+        instance._invoice_previous_name = (
+            sender._base_manager.filter(pk=instance.pk).values_list('name', flat=True).first()
+        )
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_save, sender=Unit)
+def bump_sale_versions_for_rename(sender, instance, created, raw=False, **kwargs):
+    # Invoices print product and unit names, from live or archived lines
+    previous = getattr(instance, '_invoice_previous_name', None)
+    if created or raw or previous is None or previous == instance.name:
+        return
+    field = 'product' if sender is Product else 'unit'
+    Sale.objects.filter(
+        Q(pk__in=SaleItem.objects.filter(**{field: instance}).values('sale_id'))
+        | Q(pk__in=ArchivedSaleItem.objects.filter(**{field: instance}).values('sale_id'))
+    ).update(version=F('version') + 1)
+
+
+@receiver(pre_save, sender=Sale)
+def remember_sale_day(sender, instance, raw=False, **kwargs):
+    instance._cube_previous_date = None
+    if instance.pk and not raw:
+        instance._cube_previous_date = Sale.objects.filter(pk=instance.pk).values_list('date', flat=True).first()
+
+
+@receiver(post_save, sender=Sale)
+@receiver(post_delete, sender=Sale)
+def mark_sale_cube_days(sender, instance, raw=False, **kwargs):
+    # A moved date or a new customer changes the rollups of both days
+    if not raw:
+        previous = getattr(instance, '_cube_previous_date', None)
+        cube.mark_dirty(cube.sale_day(instance.date), previous and cube.sale_day(previous))
+
+
+@receiver(post_save, sender=SaleItem)
+@receiver(post_delete, sender=SaleItem)
+def mark_sale_item_cube_day(sender, instance, raw=False, **kwargs):
+    if not raw:
+        # Lines deleted along with their sale are covered by the sale's own post_delete
+        date = Sale.objects.filter(pk=instance.sale_id).values_list('date', flat=True).first()
+        if date is not None:
+            cube.mark_dirty(cube.sale_day(date))
+
+
+@receiver(post_save, sender=Product)
+def recategorise_sales_rollups(sender, instance, created, raw=False, **kwargs):
+    # Rollups copy the product's category and supplier; follow a change in place
+    if created or raw:
+        return
+    for model in (SalesDayRollup, SalesDayProductRollup, SalesMonthRollup, SalesMonthProductRollup):
+        model.objects.filter(product=instance).exclude(
+            category_id=instance.category_id, supplier_id=instance.supplier_id,
+        ).update(category_id=instance.category_id, supplier_id=instance.supplier_id)
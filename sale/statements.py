@@ -0,0 +1,198 @@
+"""
+Month-end customer statements.
+
+A statement lists a customer's sales for a period between an opening balance
+(everything invoiced and not paid before the period) and a closing balance.
+Payments are the amounts paid against each sale. The data for every customer is
+read in three queries, whatever the number of customers: one grouped query for
+the opening balances, one for the period's sales in customer order, and one for
+the customers' details.
+
+generate_statements() renders the statements as HTML or PDF (see core.pdf) in a
+process pool, a chunk of customers per task, into one file per customer, and
+reports progress through a callback as chunks finish.
+"""
+import logging
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+from django.conf import settings
+from django.db import connections
+from django.db.models import F, Sum
+from django.template.loader import render_to_string
+from django.utils import timezone
+from core.pdf import PdfDocument
+from core.pricing import to_decimal
+from customer.models import Customer
+from .models import Sale
+
+logger = logging.getLogger(__name__)
+
+FORMATS = ('pdf', 'html')
+CHUNK_SIZE = 100  # Statements rendered per pool task
+
+
+def statement_dir():
+    default = os.path.join(getattr(settings, 'BASE_DIR', None) or tempfile.gettempdir(), 'statements')
+    return str(getattr(settings, 'STATEMENT_DIR', default))
+
+
+def _bounds(start, end):
+    return (
+        timezone.make_aware(datetime.combine(start, time.min)),
+        timezone.make_aware(datetime.combine(end + timedelta(days=1), time.min)),
+    )
+
+
+def statement_data(start, end, customer_ids=None):
+    """
+    Return one statement dict per customer with an opening balance or sales in
+    [start, end], ordered by customer id. Deleted customers are included while
+    they still have a balance.
+    """
+    since, until = _bounds(start, end)
+    sales = Sale.objects.all()
+    if customer_ids is not None:
+        sales = sales.filter(customer_id__in=customer_ids)
+
+    opening = {
+        row['customer_id']: to_decimal(row['balance'])
+        for row in sales.filter(date__lt=since).values('customer_id')
+        .annotate(balance=Sum(F('net_total') - F('paid_amount'))).order_by()
+    }
+    movements = {}
+    for row in (
+        sales.filter(date__gte=since, date__lt=until)
+        .order_by('customer_id', 'date', 'id')
+        .values('id', 'customer_id', 'date', 'net_total', 'paid_amount')
+        .iterator(chunk_size=2000)
+    ):
+        movements.setdefault(row['customer_id'], []).append(row)
+
+    ids = sorted({pk for pk, balance in opening.items() if balance} | set(movements))
+    customers = {
+        row['id']: row for row in Customer.all_objects.filter(pk__in=ids)
+        .values('id', 'customer_name', 'address', 'city', 'country', 'email', 'mobile', 'vat_no')
+    }
+
+    statements = []
+    for pk in ids:
+        balance = opening.get(pk, Decimal('0'))
+        lines = []
+        for row in movements.get(pk, []):
+            balance += row['net_total'] - row['paid_amount']
+            lines.append({
+                'sale_id': row['id'],
+                'date': timezone.localtime(row['date']) if timezone.is_aware(row['date']) else row['date'],
+                'amount': row['net_total'],
+                'paid': row['paid_amount'],
+                'balance': balance,
+            })
+        statements.append({
+            'customer': customers.get(pk, {'id': pk, 'customer_name': 'Unknown'}),
+            'start': start,
+            'end': end,
+            'opening_balance': opening.get(pk, Decimal('0')),
+            'sales': sum((line['amount'] for line in lines), Decimal('0')),
+            'payments': sum((line['paid'] for line in lines), Decimal('0')),
+            'closing_balance': balance,
+            'lines': lines,
+        })
+    return statements
+
+
+def render_statement_html(statement):
+    return render_to_string('customer_statement.html', {'statement': statement})
+
+
+def render_statement_pdf(statement):
+    customer = statement['customer']
+    doc = PdfDocument()
+    doc.add_text("Statement of Account", size=40, bold=True)
+    doc.add_text(f"{statement['start']:%Y-%m-%d} to {statement['end']:%Y-%m-%d}", size=22)
+    doc.add_rule()
+
+    doc.add_text(customer['customer_name'] or 'Unknown', size=24, bold=True)
+    for label, key in (('', 'address'), ('', 'city'), ('Email: ', 'email'), ('Mobile: ', 'mobile'), ('VAT No: ', 'vat_no')):
+        if customer.get(key):
+            doc.add_text(f"{label}{customer[key]}", size=20)
+    doc.add_space()
+
+    widths = [0.24, 0.16, 0.2, 0.2, 0.2]
+    aligns = ['left', 'left', 'right', 'right', 'right']
+    doc.add_row(['Date', 'Invoice', 'Amount', 'Paid', 'Balance'], widths, bold=True, aligns=aligns)
+    doc.add_rule(spacing=6)
+    doc.add_row(['', 'Opening balance', '', '', statement['opening_balance']], widths, aligns=aligns)
+    for line in statement['lines']:
+        doc.add_row([
+            f"{line['date']:%Y-%m-%d}", f"#{line['sale_id']}", line['amount'], line['paid'], line['balance'],
+        ], widths, aligns=aligns)
+    doc.add_rule()
+
+    for label, key in (
+        ('Opening Balance', 'opening_balance'),
+        ('Sales', 'sales'),
+        ('Payments', 'payments'),
+        ('Closing Balance', 'closing_balance'),
+    ):
+        doc.add_text(f"{label}: ${statement[key]}", size=22, bold=key == 'closing_balance', align='right')
+    return doc.to_bytes()
+
+
+def statement_filename(statement, fmt):
+    return f"statement-{statement['customer']['id']}-{statement['end']:%Y%m%d}.{fmt}"
+
+
+def _init_worker():
+    import django
+    from django.apps import apps
+    if not apps.ready:
+        django.setup()
+    # Rendering needs no database; drop any connections inherited from the parent
+    connections.close_all()
+
+
+def _render_chunk(statements, fmt, directory):
+    """Render and write a chunk of statements in a worker process; returns the number written."""
+    for statement in statements:
+        path = os.path.join(directory, statement_filename(statement, fmt))
+        if fmt == 'pdf':
+            with open(path, 'wb') as fh:
+                fh.write(render_statement_pdf(statement))
+        else:
+            with open(path, 'w', encoding='utf-8') as fh:
+                fh.write(render_statement_html(statement))
+    return len(statements)
+
+
+def generate_statements(start, end, directory=None, fmt='pdf', workers=None, customer_ids=None, progress=None):
+    """
+    Write a statement file per customer for [start, end] into directory (default
+    statement_dir()) and return {'directory', 'written', 'failed'}. progress, if
+    given, is called as progress(done, total) whenever a chunk finishes.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown format '{fmt}'.")
+    directory = directory or statement_dir()
+    os.makedirs(directory, exist_ok=True)
+    statements = statement_data(start, end, customer_ids)
+    total = len(statements)
+    chunks = [statements[i:i + CHUNK_SIZE] for i in range(0, total, CHUNK_SIZE)]
+    # Forked workers must not inherit open database connections
+    connections.close_all()
+
+    written = failed = 0
+    with ProcessPoolExecutor(max_workers=max(1, workers or os.cpu_count() or 2), initializer=_init_worker) as pool:
+        futures = {pool.submit(_render_chunk, chunk, fmt, directory): chunk for chunk in chunks}
+        for future in as_completed(futures):
+            try:
+                written += future.result()
+            except Exception:
+                failed += len(futures[future])
+                logger.exception(f"Could not render {len(futures[future])} statement(s)")
+            if progress is not None:
+                progress(written + failed, total)
+    logger.info(f"Statements {start} to {end}: {written} written to {directory}, {failed} failed")
+    return {'directory': directory, 'written': written, 'failed': failed}
@@ -0,0 +1,16 @@
+from datetime import date
+from core.jobs import task
+from . import cube, statements
+
+
+@task('sale.refresh_cube')
+def refresh_sales_cube(job):
+    return {'days': cube.refresh()}
+
+
+@task('sale.generate_statements')
+def generate_customer_statements(job, start, end, fmt='pdf'):
+    def progress(done, total):
+        job.set_progress(done * 100 // (total or 1), f"Rendered {done} of {total} statements")
+
+    return statements.generate_statements(date.fromisoformat(start), date.fromisoformat(end), fmt=fmt, progress=progress)
@@ -1,3 +1,193 @@
-from django.test import TestCase
+import json
+from datetime import date
+from decimal import Decimal
+from unittest import mock
+from django.http import HttpResponse
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from core.tests import make_product
+from customer.models import Customer
+from purchase.models import Purchase, PurchaseItem
+from stock.levels import default_location
+from stock.models import StockLevel
+from supplier.models import Supplier
+from . import cube
+from .cube import sale_day
+from .invoice import render_invoice_html, sale_version
+from .models import Sale, SaleItem, SalesCubeDirtyDay, SalesDayProductRollup
 
-# Create your tests here.
+TOKEN = 'till-secret'
+
+
+@override_settings(TERMINAL_API_TOKENS={'till-1': TOKEN})
+class SaleBatchTests(TestCase):
+    def setUp(self):
+        self.location = default_location()
+        self.customer = Customer.objects.create(customer_name='Bob')
+        self.product = make_product()
+        purchase = Purchase.objects.create(
+            supplier=Supplier.objects.get(supplier_name='Acme'), challan_no='CH1',
+            purchase_date=date.today(), location=self.location,
+        )
+        PurchaseItem.objects.create(purchase=purchase, product=self.product, item_name='Widget', quantity=10, rate=5)
+
+    def post(self, sales, token=TOKEN):
+        headers = {'HTTP_AUTHORIZATION': f'Bearer {token}'} if token else {}
+        return self.client.post(
+            reverse('api_sale_batch'), json.dumps({'sales': sales}), content_type='application/json', **headers,
+        )
+
+    def sale(self, key, **item):
+        item = dict({'product': self.product.pk, 'quantity': '1', 'rate': '10'}, **item)
+        return {'key': key, 'customer': self.customer.pk, 'items': [item]}
+
+    def on_hand(self):
+        return StockLevel.objects.get(location=self.location, product=self.product).quantity
+
+    def test_requires_a_terminal_token(self):
+        self.assertEqual(self.post([self.sale('a')], token=None).status_code, 401)
+        self.assertEqual(self.post([self.sale('a')], token='wrong').status_code, 401)
+        self.assertFalse(Sale.objects.exists())
+
+    def test_replay_is_reported_as_duplicate(self):
+        first = self.post([self.sale('a'), self.sale('b')]).json()
+        self.assertEqual(first['created'], 2)
+        again = self.post([self.sale('a'), self.sale('b')]).json()
+        self.assertEqual(again['duplicate'], 2)
+        self.assertEqual([r['sale_id'] for r in again['results']], [r['sale_id'] for r in first['results']])
+        self.assertEqual(Sale.objects.count(), 2)
+        self.assertEqual(self.on_hand(), Decimal('8'))
+
+    def test_key_repeated_within_a_batch(self):
+        results = self.post([self.sale('a'), self.sale('a')]).json()['results']
+        self.assertEqual([r['status'] for r in results], ['created', 'rejected'])
+
+    def test_invalid_numbers_reject_only_their_sale(self):
+        bad = [
+            {'quantity': 'NaN'}, {'quantity': 'Infinity'}, {'quantity': '-1'}, {'quantity': '0.001'},
+            {'quantity': '1e12'}, {'rate': '1e12'}, {'rate': 'NaN'}, {'rate': '-5'},
+            {'discount_percent': '150'}, {'vat_percent': '-1'}, {'quantity': 'abc'},
+            {'quantity': '9999', 'rate': '99999'},
+        ]
+        response = self.post([self.sale(f'bad-{i}', **item) for i, item in enumerate(bad)] + [self.sale('good')])
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual(body['rejected'], len(bad))
+        self.assertEqual(body['results'][-1]['status'], 'created')
+        self.assertEqual(Sale.objects.count(), 1)
+
+    def test_quantities_are_rounded_to_the_column(self):
+        self.post([self.sale('a', quantity='1.005', rate='0.999')])
+        item = SaleItem.objects.get()
+        self.assertEqual((item.quantity, item.rate), (Decimal('1.01'), Decimal('1.00')))
+        self.assertEqual(self.on_hand(), Decimal('8.99'))
+        self.assertEqual(self.product.get_stock(), Decimal('8.99'))
+
+    def test_insufficient_stock_is_rejected(self):
+        results = self.post([self.sale('a', quantity='6'), self.sale('b', quantity='6')]).json()['results']
+        self.assertEqual([r['status'] for r in results], ['created', 'rejected'])
+        self.assertEqual(self.on_hand(), Decimal('4'))
+
+
+class CubeRefreshTests(TestCase):
+    def setUp(self):
+        self.product = make_product()
+        self.customer = Customer.objects.create(customer_name='Bob')
+
+    def sell(self, quantity):
+        with self.captureOnCommitCallbacks(execute=True):
+            sale = Sale.objects.create(customer=self.customer, location=default_location())
+            SaleItem.objects.create(sale=sale, product=self.product, quantity=quantity, rate=10)
+        return sale_day(sale.date)
+
+    def test_sale_marked_during_a_refresh_stays_stale(self):
+        day = self.sell(1)
+        read = cube._day_rows
+
+        def concurrent_sale(days):
+            # Lands after the dirty rows are claimed, before the refresh commits
+            totals = read(days)
+            self.sell(2)
+            return totals
+
+        with mock.patch.object(cube, '_day_rows', concurrent_sale):
+            self.assertEqual(cube.refresh(limit=1), 1)
+        self.assertTrue(SalesCubeDirtyDay.objects.filter(day=day).exists())
+        cube.refresh()
+        self.assertEqual(SalesDayProductRollup.objects.get(day=day, product=self.product).quantity, Decimal('3'))
+
+
+class InvoiceCacheTests(TestCase):
+    def setUp(self):
+        self.product = make_product()
+        self.sale = Sale.objects.create(customer=Customer.objects.create(customer_name='Bob'), location=default_location())
+        SaleItem.objects.create(sale=self.sale, product=self.product, unit=self.product.unit, quantity=1, rate=10)
+
+    def test_saving_a_sale_bumps_its_version(self):
+        version = sale_version(self.sale.pk)
+        self.sale.save()
+        self.assertEqual(self.sale.version, version + 1)
+        self.assertEqual(sale_version(self.sale.pk), version + 1)
+
+    def test_renaming_a_product_or_unit_refreshes_the_invoice(self):
+        self.assertIn('Widget', render_invoice_html(self.sale.pk))
+        self.product.name = 'Gadget'
+        self.product.save()
+        self.assertIn('Gadget', render_invoice_html(self.sale.pk))
+        unit = self.product.unit
+        unit.name = 'boxes'
+        unit.save()
+        self.assertIn('boxes', render_invoice_html(self.sale.pk))
+
+    def test_other_product_edits_keep_the_cached_invoice(self):
+        version = sale_version(self.sale.pk)
+        self.product.sale_price = Decimal('12.00')
+        self.product.save()
+        self.assertEqual(sale_version(self.sale.pk), version)
+
+
+
+class NewSaleTests(TestCase):
+    """new_sale redisplays the form with errors instead of failing (the form itself is not rendered here)."""
+
+    def setUp(self):
+        self.product = make_product()
+        self.customer = Customer.objects.create(customer_name='Bob')
+
+    def post(self, **data):
+        data = dict({
+            'customer': self.customer.pk, 'items-TOTAL_FORMS': '1', 'items-0-product': self.product.pk,
+            'items-0-quantity': '1', 'items-0-rate': '10',
+        }, **data)
+        with mock.patch('sale.views.render', return_value=HttpResponse()) as render:
+            self.client.post(reverse('new_sale'), data)
+        self.assertFalse(Sale.objects.exists())
+        return render.call_args.args[2]
+
+    def test_unparsable_rate_is_reported_on_the_form(self):
+        context = self.post(**{'items-0-rate': 'ten', 'items-0-discount_percent': '5'})
+        self.assertEqual(context['errors']['items'], ['At least one valid item is required.'])
+        self.assertEqual(context['form_data']['items'][0]['discount_percent'], '5')
+
+    def test_unparsable_header_amounts_are_reported_on_the_form(self):
+        for field in ('sale_discount', 'shipping_cost', 'paid_amount'):
+            context = self.post(**{field: 'abc'})
+            self.assertEqual(context['errors']['general'], "Invalid numerical values provided.")
+            self.assertEqual(context['form_data'][field], 'abc')
+
+
+class ManageSaleCachingTests(TestCase):
+    def get(self, etag=None):
+        headers = {'HTTP_IF_NONE_MATCH': etag} if etag else {}
+        with mock.patch('sale.views.render', return_value=HttpResponse()):
+            return self.client.get(reverse('manage_sale'), **headers)
+
+    def test_product_rename_invalidates_the_list(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            product = make_product()
+        etag = self.get()['ETag']
+        self.assertEqual(self.get(etag).status_code, 304)
+        with self.captureOnCommitCallbacks(execute=True):
+            product.name = 'Gadget'
+            product.save()
+        self.assertEqual(self.get(etag).status_code, 200)
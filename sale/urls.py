@@ -5,4 +5,7 @@ urlpatterns = [
     path('add/', views.new_sale, name='new_sale'),
     path('list/', views.manage_sale, name='manage_sale'),
     path('detail/<int:pk>/', views.sale_detail, name='sale_detail'),
+    path('invoice/<int:pk>/', views.sale_invoice, name='sale_invoice'),
+    path('invoice/<int:pk>/pdf/', views.sale_invoice_pdf, name='sale_invoice_pdf'),
+    path('analysis/', views.sales_analysis, name='sales_analysis'),
 ]
\ No newline at end of file
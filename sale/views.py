@@ -1,12 +1,23 @@
-from django.shortcuts import render, redirect, get_object_or_404
+from django.shortcuts import render, redirect
+from django.http import Http404, HttpResponse
+from django.utils.http import urlencode
+from django.views.decorators.http import condition
 from django.contrib import messages
 from django.db import transaction
 from django.utils import timezone
-from decimal import Decimal, ROUND_HALF_UP
+from decimal import Decimal
 import logging
-from .models import Sale, SaleItem
+from core.db_routers import use_replica
+from core.pricing import LineAmounts, header_totals, money, price_lines, to_decimal
+from core.versioning import conditional
+from . import cube
+from .invoice import invoice_etag, render_invoice_html, render_invoice_pdf
+from .models import Sale, SaleItem, SalesCubeDirtyDay
 from customer.models import Customer
 from product.models import Product, Unit
+from stock.archive import closed_through, document_lines
+from stock.levels import default_location
+from stock.models import Location
 
 logger = logging.getLogger(__name__)
 
@@ -14,6 +25,7 @@ def new_sale(request):
     if request.method == 'POST':
         logger.info(f"Full POST data: {request.POST}")
         customer_id = request.POST.get('customer')
+        location_id = request.POST.get('location')
         sale_discount = request.POST.get('sale_discount', '0.00')
         shipping_cost = request.POST.get('shipping_cost', '0.00')
         paid_amount = request.POST.get('paid_amount', '0.00')
@@ -35,6 +47,12 @@ def new_sale(request):
             except Customer.DoesNotExist:
                 errors['customer'] = "Invalid customer selected."
 
+        location = default_location()
+        if location_id:
+            location = Location.objects.filter(id=location_id, is_active=True).first() if location_id.isdigit() else None
+        if location is None:
+            errors['general'] = "Invalid location selected."
+
         # Extract and validate items
         items_data = []
         for i in range(total_forms):
@@ -53,14 +71,15 @@ def new_sale(request):
 
             item_errors = {}
             product = None
+            qty = Decimal('0.00')
             if product_id:
                 product = Product.objects.filter(id=product_id).first()
             if not product:
                 item_errors['product'] = f"Invalid product selected for item {i+1}."
             else:
                 try:
-                    qty = Decimal(quantity or '0.00')
-                    stock = product.get_stock()
+                    qty = to_decimal(quantity)
+                    stock = product.get_stock(location)
                     if qty <= 0:
                         item_errors['quantity'] = f"Quantity must be positive for item {i+1}."
                     elif qty > stock:
@@ -68,17 +87,13 @@ def new_sale(request):
                 except (ValueError, TypeError):
                     item_errors['quantity'] = f"Invalid quantity for item {i+1}."
 
-            # Recalculate discount_value, vat_value, and total
+            # Amounts are priced for all rows at once below; unparsable rows are redisplayed as typed
+            disc_percent = discount_percent
             try:
-                rate = Decimal(rate or '0.00')
-                disc_percent = Decimal(discount_percent or '0.00')
-                vat_percent = Decimal(vat_percent or '0.00')
-
-                subtotal = qty * rate
-                discount_value = (subtotal * disc_percent / 100).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
-                vat_value = ((subtotal - discount_value) * vat_percent / 100).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
-                total = (subtotal - discount_value + vat_value).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
-            except (ValueError, TypeError):
+                rate = to_decimal(rate)
+                disc_percent = to_decimal(discount_percent)
+                vat_percent = to_decimal(vat_percent)
+            except ValueError:
                 item_errors['calculation'] = f"Invalid numerical values for item {i+1}."
 
             errors['items'].append(item_errors if item_errors else None)
@@ -88,32 +103,43 @@ def new_sale(request):
                 'quantity': qty,
                 'rate': rate,
                 'discount_percent': disc_percent,
-                'discount_value': discount_value,
+                'discount_value': Decimal('0.00'),
                 'vat_percent': vat_percent,
-                'vat_value': vat_value,
-                'total': total,
+                'vat_value': Decimal('0.00'),
+                'total': Decimal('0.00'),
                 'description': description or '',
                 'available_quantity': Decimal(available_quantity or '0.00'),
                 'unit': unit or '',
             })
 
+        priceable = [item for item, item_errors in zip(items_data, errors['items']) if not (item_errors or {}).get('calculation')]
+        amounts = price_lines(
+            (item['quantity'], item['rate'], item['discount_percent'], item['vat_percent']) for item in priceable
+        )
+        for item, line in zip(priceable, amounts):
+            item['discount_value'], item['vat_value'], item['total'] = line
+
         valid_items = [item for item in items_data if item['prod_id'] and not errors['items'][items_data.index(item)]]
         logger.info(f"Valid items: {valid_items}")
         if not valid_items:
             errors['items'] = ['At least one valid item is required.']
 
+        total_discount = total_vat = grand_total = net_total = Decimal('0.00')
         try:
-            sale_discount = Decimal(sale_discount or '0.00')
-            shipping_cost = Decimal(shipping_cost or '0.00')
-            paid_amount = Decimal(paid_amount or '0.00')
+            sale_discount = money(sale_discount)
+            shipping_cost = money(shipping_cost)
+            paid_amount = money(paid_amount)
             # Recalculate summary fields
-            items_total = sum(item['total'] for item in valid_items)
-            total_discount = sum(item['discount_value'] for item in valid_items) + sale_discount
-            total_vat = sum(item['vat_value'] for item in valid_items)
-            grand_total = items_total
-            net_total = grand_total - sale_discount + shipping_cost
-            logger.info(f"Calculated: items_total={items_total}, total_discount={total_discount}, net_total={net_total}")
-        except (ValueError, TypeError):
+            totals = header_totals(
+                (LineAmounts(item['discount_value'], item['vat_value'], item['total']) for item in valid_items),
+                discount=sale_discount, shipping_cost=shipping_cost, paid_amount=paid_amount,
+            )
+            total_discount = totals.total_discount
+            total_vat = totals.total_vat
+            grand_total = totals.items_total
+            net_total = totals.net_total
+            logger.info(f"Calculated: items_total={grand_total}, total_discount={total_discount}, net_total={net_total}")
+        except ValueError:
             errors['general'] = "Invalid numerical values provided."
 
         if not errors['customer'] and not errors['general'] and all(e is None for e in errors['items']) and valid_items:
@@ -121,20 +147,21 @@ def new_sale(request):
                 with transaction.atomic():
                     sale = Sale(
                         customer=customer,
+                        location=location,
                         sale_discount=sale_discount,
                         shipping_cost=shipping_cost,
-                        total_discount=total_discount.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP),
-                        total_vat=total_vat.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP),
-                        grand_total=grand_total.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP),
-                        net_total=net_total.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP),
-                        paid_amount=paid_amount.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP),
+                        total_discount=total_discount,
+                        total_vat=total_vat,
+                        grand_total=grand_total,
+                        net_total=net_total,
+                        paid_amount=paid_amount,
                     )
                     sale.save()
                     logger.info(f"Sale saved: ID={sale.id}")
 
                     for item_data in valid_items:
                         product = Product.objects.get(id=item_data['prod_id'])
-                        if item_data['quantity'] > product.get_stock():
+                        if item_data['quantity'] > product.get_stock(location):
                             raise ValueError(f"Insufficient stock for {product.name}")
                         sale_item = SaleItem(
                             sale=sale,
@@ -142,13 +169,11 @@ def new_sale(request):
                             quantity=item_data['quantity'],
                             rate=item_data['rate'],
                             discount_percent=item_data['discount_percent'],
-                            discount_value=item_data['discount_value'],
                             vat_percent=item_data['vat_percent'],
-                            vat_value=item_data['vat_value'],
-                            total=item_data['total'],
                             description=item_data['description'],
-                            available_quantity=product.get_stock(),
+                            available_quantity=product.get_stock(location),
                             unit=product.unit,
+                            unit_cost=product.cost_price,
                         )
                         sale_item.save()
                         logger.info(f"SaleItem saved: Product={product.name}, Quantity={item_data['quantity']}")
@@ -163,10 +188,12 @@ def new_sale(request):
         logger.error(f"Validation errors: {errors}")
         return render(request, 'new_sale.html', {
             'customers': Customer.objects.all(),
+            'locations': Location.objects.filter(is_active=True),
             'all_products': Product.objects.all(),
             'errors': errors,
             'form_data': {
                 'customer': customer_id or '',
+                'location': location_id or '',
                 'sale_discount': sale_discount,
                 'shipping_cost': shipping_cost,
                 'paid_amount': paid_amount,
@@ -184,8 +211,10 @@ def new_sale(request):
     logger.info(f"GET request: {[f'cust_id: {cust.id}, cust_name: {cust.customer_name}' for cust in customers]}")
     return render(request, 'new_sale.html', {
         'customers': customers,
+        'locations': Location.objects.filter(is_active=True),
         'all_products': products,
         'form_data': {
+            'location': str(default_location().id),
             'items': [{
                 'prod_id': '',
                 'product_name': '',
@@ -216,8 +245,11 @@ def new_sale(request):
         },
     })
 
+@use_replica
+@conditional('sales', 'products')
 def manage_sale(request):
     sales = Sale.objects.all().order_by('-id')
+    closed_end = closed_through()
     logger.info(f"Sales fetched: {[f'sale_id: {s.id}, cust_name: {s.customer.customer_name}' for s in sales]}")
     return render(request, 'manage_sale.html', {
         'orders': sales,
@@ -242,42 +274,78 @@ def manage_sale(request):
                 'total': item.total,
                 'description': item.description or '-',
                 'unit': item.unit.name if item.unit else '-',
-            } for item in sale.items.all()]
+            } for item in document_lines(sale, closed_end)]
         } for sale in sales]
     })
 
 def sale_detail(request, pk):
-    sale = get_object_or_404(Sale, pk=pk)
-    sale_data = {
-        'id': sale.id,
-        'customer_name': sale.customer.customer_name if sale.customer else 'Unknown',
-        'customer_address': sale.customer.address if sale.customer else '-',
-        'customer_email': sale.customer.email if sale.customer else '-',
-        'customer_mobile': sale.customer.mobile if sale.customer else '-',
-        'customer_vat_number': sale.customer.vat_no if sale.customer else '-',
-        'date': sale.date,
-        'sale_discount': sale.sale_discount,
-        'shipping_cost': sale.shipping_cost,
-        'total_discount': sale.total_discount,
-        'total_vat': sale.total_vat,
-        'grand_total': sale.grand_total,
-        'net_total': sale.net_total,
-        'paid_amount': sale.paid_amount,
-        'items': [{
-            'product_name': item.product.name if item.product else 'Unknown',
-            'quantity': item.quantity,
-            'rate': item.rate,
-            'discount_percent': item.discount_percent,
-            'discount_value': item.discount_value,
-            'vat_percent': item.vat_percent,
-            'vat_value': item.vat_value,
-            'total': item.total,
-            'description': item.description or '-',
-            'unit': item.unit.name if item.unit else '-',
-        } for item in sale.items.all()]
-    }
-    logger.info(f"Sale detail: ID={sale.id}, customer={sale_data['customer_name']}, "
-                f"address={sale_data['customer_address']}, email={sale_data['customer_email']}, "
-                f"mobile={sale_data['customer_mobile']}, vat_no={sale_data['customer_vat_number']}, "
-                f"items={len(sale_data['items'])}")
-    return render(request, 'sale_detail.html', {'order': sale, 'sale_data': sale_data})
\ No newline at end of file
+    try:
+        invoice_html = render_invoice_html(pk)
+    except Sale.DoesNotExist:
+        raise Http404("Sale not found.")
+    logger.info(f"Sale detail viewed: ID={pk}")
+    return render(request, 'sale_detail.html', {'sale_id': pk, 'invoice_html': invoice_html})
+
+@condition(etag_func=invoice_etag)
+def sale_invoice(request, pk):
+    try:
+        invoice_html = render_invoice_html(pk)
+    except Sale.DoesNotExist:
+        raise Http404("Sale not found.")
+    return render(request, 'invoice.html', {'sale_id': pk, 'invoice_html': invoice_html})
+
+@condition(etag_func=invoice_etag)
+def sale_invoice_pdf(request, pk):
+    try:
+        pdf = render_invoice_pdf(pk)
+    except Sale.DoesNotExist:
+        raise Http404("Sale not found.")
+    response = HttpResponse(pdf, content_type='application/pdf')
+    response['Content-Disposition'] = f'inline; filename="invoice-{pk}.pdf"'
+    return response
+
+
+def _analysis_query(params, **changes):
+    """Querystring for the analysis page with params changed."""
+    params = {**params, **changes}
+    query = {'by': params['by'], 'period': params['period'], **params['filters']}
+    if params['start']:
+        query['start'] = params['start'].isoformat()
+    if params['end']:
+        query['end'] = params['end'].isoformat()
+    return '?' + urlencode(query)
+
+@use_replica
+def sales_analysis(request):
+    try:
+        params = cube.parse_analysis_params(request.GET)
+    except ValueError:
+        messages.error(request, "Invalid parameters. Using defaults.")
+        params = cube.parse_analysis_params({})
+    rows = cube.drill_down(params['by'], params['period'], params['start'], params['end'], params['filters'])
+
+    next_by = cube.DRILL_DIMENSION.get(params['by'])
+    next_period = cube.DRILL_PERIOD.get(params['period'])
+    for row in rows:
+        if next_by:
+            row['drill_url'] = _analysis_query(params, by=next_by, filters={**params['filters'], params['by']: row['key']})
+        if next_period:
+            row['zoom_url'] = _analysis_query(params, period=next_period, start=row['period'], end=row['period_end'])
+
+    filters = []
+    for name, pk in params['filters'].items():
+        remaining = {key: value for key, value in params['filters'].items() if key != name}
+        filters.append({
+            'dimension': name,
+            'label': cube.dimension_labels(name, [pk]).get(pk, '-'),
+            'remove_url': _analysis_query(params, filters=remaining),
+        })
+    return render(request, 'sales_analysis.html', {
+        'rows': rows,
+        'params': params,
+        'filters': filters,
+        'dimensions': cube.DIMENSIONS,
+        'periods': cube.PERIODS,
+        'totals': {name: sum(row[name] or 0 for row in rows) for name in ('quantity', 'gross', 'discount', 'vat', 'total')},
+        'stale_days': SalesCubeDirtyDay.objects.count(),
+    })
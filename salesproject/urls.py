@@ -26,4 +26,5 @@ urlpatterns = [
     path('', include('purchaseorder.urls')),
     path('', include('sale.urls')),
     path('', include('stock.urls')),
+    path('', include('core.urls')),
 ]
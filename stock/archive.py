@@ -0,0 +1,180 @@
+"""
+Cold storage for closed periods.
+
+Closing a period through a date moves every purchase and sale line dated on or
+before it out of PurchaseItem and SaleItem into ArchivedPurchaseItem and
+ArchivedSaleItem, and writes StockCarryForward rows: the purchased and sold
+quantities of each product at each location from the beginning through that
+date. Readers of live stock then sum the latest carry-forward plus the live
+(open-period) lines, and only reach for the archive when asked about a closed
+date or document.
+
+Purchase and Sale headers stay where they are: lists, invoices and payments keep
+pointing at them, and a closed document reads its lines from the archive
+(document_lines). Documents dated in a closed period can no longer be edited or
+back-dated into. Transfers are not archived. StockLevel is untouched, because
+moving a line does not change what is on hand.
+"""
+import logging
+from decimal import Decimal
+from django.db import connection, transaction
+from django.db.models import Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from purchase.models import ArchivedPurchaseItem, PurchaseItem
+from sale.models import ArchivedSaleItem, SaleItem
+from .models import ClosedPeriod, StockCarryForward
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 500
+
+
+class PeriodError(ValueError):
+    """The period cannot be closed as asked."""
+
+
+def latest_period(as_of=None):
+    """The most recent closed period (ending on or before as_of, if given), or None."""
+    periods = ClosedPeriod.objects.order_by('-end_date')
+    if as_of is not None:
+        periods = periods.filter(end_date__lte=as_of)
+    return periods.first()
+
+
+def closed_through():
+    """End date of the most recent closed period, or None when nothing is closed."""
+    return ClosedPeriod.objects.order_by('-end_date').values_list('end_date', flat=True).first()
+
+
+def is_closed(day):
+    end = closed_through()
+    return end is not None and day is not None and day <= end
+
+
+def document_day(header):
+    """The stock date of a purchase or sale header."""
+    if hasattr(header, 'purchase_date'):
+        return header.purchase_date
+    return timezone.localdate(header.date) if timezone.is_aware(header.date) else header.date.date()
+
+
+def document_lines(header, closed_end=None):
+    """
+    The line queryset of a purchase or sale: live while its period is open, archived
+    once closed. Callers listing many documents pass closed_through() as closed_end.
+    """
+    closed_end = closed_end or closed_through()
+    closed = closed_end is not None and document_day(header) <= closed_end
+    return header.archived_items.all() if closed else header.items.all()
+
+
+def carried(period, location=None):
+    """Return {(location_id, product_id): [in_qty, out_qty]} carried forward by a period."""
+    totals = {}
+    if period is None:
+        return totals
+    rows = StockCarryForward.objects.filter(period=period)
+    if location is not None:
+        rows = rows.filter(location=location)
+    for location_id, product_id, in_qty, out_qty in rows.values_list('location_id', 'product_id', 'in_qty', 'out_qty'):
+        totals[(location_id, product_id)] = [in_qty, out_qty]
+    return totals
+
+
+def carried_by_product(period, location=None):
+    """Like carried(), summed across locations: {product_id: [in_qty, out_qty]}."""
+    totals = {}
+    for (_, product_id), (in_qty, out_qty) in carried(period, location).items():
+        level = totals.setdefault(product_id, [Decimal('0'), Decimal('0')])
+        level[0] += in_qty
+        level[1] += out_qty
+    return totals
+
+
+def _delete_rows(model, ids):
+    # A plain DELETE: the lines are moving, not leaving stock, so the stock level
+    # and sale version signals a QuerySet.delete() would send must not fire.
+    table = connection.ops.quote_name(model._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {table} WHERE id IN ({', '.join(['%s'] * len(ids))})", ids)
+
+
+def _move(rows, archive_model, build, chunk_size):
+    """Copy rows into archive_model chunk by chunk, deleting each chunk from the live table."""
+    moved, last_id = 0, 0
+    while True:
+        chunk = list(rows.filter(pk__gt=last_id).order_by('pk')[:chunk_size])
+        if not chunk:
+            return moved
+        archive_model.objects.bulk_create([build(row) for row in chunk])
+        _delete_rows(rows.model, [row.pk for row in chunk])
+        moved += len(chunk)
+        last_id = chunk[-1].pk
+
+
+def _archived_purchase_item(item):
+    return ArchivedPurchaseItem(
+        id=item.pk, purchase_id=item.purchase_id, product_id=item.product_id, item_name=item.item_name,
+        stock=item.stock, quantity=item.quantity, batch_no=item.batch_no, expiry_date=item.expiry_date,
+        rate=item.rate, discount_percent=item.discount_percent, vat_percent=item.vat_percent,
+        discount_value=item.discount_value, vat_value=item.vat_value, total=item.total,
+        purchase_date=item.purchase.purchase_date, location_id=item.purchase.location_id,
+    )
+
+
+def _archived_sale_item(item):
+    return ArchivedSaleItem(
+        id=item.pk, sale_id=item.sale_id, product_id=item.product_id, description=item.description,
+        available_quantity=item.available_quantity, unit_id=item.unit_id, quantity=item.quantity,
+        rate=item.rate, discount_percent=item.discount_percent, vat_percent=item.vat_percent,
+        unit_cost=item.unit_cost, discount_value=item.discount_value, vat_value=item.vat_value, total=item.total,
+        sale_date=item.sale_day, location_id=item.sale.location_id,
+    )
+
+
+def close_period(end_date, chunk_size=CHUNK_SIZE):
+    """
+    Close everything dated on or before end_date and return the new ClosedPeriod.
+
+    Runs in one transaction, so readers see either the live lines or the archived
+    lines plus their carry-forward, never half of each. Raises PeriodError if
+    end_date is not after the last closed period or not in the past.
+    """
+    previous = latest_period()
+    if previous is not None and end_date <= previous.end_date:
+        raise PeriodError(f"Already closed through {previous.end_date}.")
+    if end_date >= timezone.localdate():
+        raise PeriodError("Only past dates can be closed.")
+
+    purchase_items = PurchaseItem.objects.filter(purchase__purchase_date__lte=end_date).select_related('purchase')
+    sale_items = (
+        SaleItem.objects.filter(sale__date__date__lte=end_date)
+        .annotate(sale_day=TruncDate('sale__date')).select_related('sale')
+    )
+
+    with transaction.atomic():
+        period = ClosedPeriod.objects.create(end_date=end_date)
+
+        totals = carried(previous)
+        for rows, location_field, index in (
+            (purchase_items.filter(product__isnull=False), 'purchase__location_id', 0),
+            (sale_items, 'sale__location_id', 1),
+        ):
+            for row in rows.order_by().values(location_field, 'product_id').annotate(qty=Sum('quantity')):
+                level = totals.setdefault((row[location_field], row['product_id']), [Decimal('0'), Decimal('0')])
+                level[index] += Decimal(row['qty'] or 0)
+        StockCarryForward.objects.bulk_create([
+            StockCarryForward(period=period, location_id=location_id, product_id=product_id, in_qty=in_qty, out_qty=out_qty)
+            for (location_id, product_id), (in_qty, out_qty) in totals.items()
+        ], batch_size=1000)
+
+        period.purchase_items = _move(purchase_items, ArchivedPurchaseItem, _archived_purchase_item, chunk_size)
+        period.sale_items = _move(sale_items, ArchivedSaleItem, _archived_sale_item, chunk_size)
+        period.save(update_fields=['purchase_items', 'sale_items'])
+
+    logger.info(
+        f"Closed period through {end_date}: {period.purchase_items} purchase and "
+        f"{period.sale_items} sale line(s) archived, {len(totals)} carry-forward row(s)"
+    )
+    return period
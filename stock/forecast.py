@@ -0,0 +1,141 @@
+import math
+from datetime import timedelta
+from itertools import chain
+from statistics import NormalDist
+import numpy as np
+from django.db.models import Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from product.models import Product
+from sale.models import ArchivedSaleItem, SaleItem
+from .archive import closed_through
+from .history import on_hand_levels
+
+
+DEFAULT_PARAMS = {'window': 90, 'lead_time': 7, 'service_level': 0.95}
+
+
+def parse_reorder_params(data):
+    """Read window, lead_time and service_level from a QueryDict, raising ValueError if invalid."""
+    try:
+        params = {
+            'window': int(data.get('window', DEFAULT_PARAMS['window'])),
+            'lead_time': int(data.get('lead_time', DEFAULT_PARAMS['lead_time'])),
+            'service_level': float(data.get('service_level', DEFAULT_PARAMS['service_level'])),
+        }
+    except (TypeError, ValueError):
+        raise ValueError("Parameters must be numbers.")
+    if params['window'] < 1 or params['lead_time'] < 1 or not 0.5 <= params['service_level'] < 1:
+        raise ValueError("Parameters are out of range.")
+    return params
+
+
+def daily_sales(start, end):
+    """Return (product_ids, day_offsets, quantities) arrays for daily sales in [start, end]."""
+    rows = (
+        SaleItem.objects
+        .filter(sale__date__date__gte=start, sale__date__date__lte=end)
+        .annotate(day=TruncDate('sale__date'))
+        .values('product_id', 'day')
+        .annotate(qty=Sum('quantity'))
+        .values_list('product_id', 'day', 'qty')
+    )
+    closed_end = closed_through()
+    archived = ArchivedSaleItem.objects.none()
+    if closed_end is not None and start <= closed_end:
+        # The window reaches back into a closed period, whose lines are archived
+        archived = (
+            ArchivedSaleItem.objects.filter(sale_date__gte=start, sale_date__lte=end)
+            .values('product_id', 'sale_date').annotate(qty=Sum('quantity'))
+            .values_list('product_id', 'sale_date', 'qty')
+        )
+    product_ids, days, quantities = [], [], []
+    for product_id, day, qty in chain(rows.iterator(chunk_size=10000), archived.iterator(chunk_size=10000)):
+        product_ids.append(product_id)
+        days.append((day - start).days)
+        quantities.append(float(qty))
+    return (
+        np.asarray(product_ids, dtype=np.int64),
+        np.asarray(days, dtype=np.int64),
+        np.asarray(quantities, dtype=np.float64),
+    )
+
+
+def reorder_points(window=90, lead_time=7, service_level=0.95, review_days=None, as_of=None):
+    """
+    Compute demand statistics and reorder points for the whole catalog in one pass.
+
+    Daily demand over the trailing window is pulled with a single grouped query; mean,
+    standard deviation, safety stock and reorder point are then computed with NumPy for
+    every product at once. Days without sales count as zero demand. Returns a dict of
+    aligned arrays keyed by column name, one entry per product.
+    """
+    as_of = as_of or timezone.localdate()
+    review_days = lead_time if review_days is None else review_days
+    start = as_of - timedelta(days=window - 1)
+
+    catalog = np.asarray(Product.objects.order_by('id').values_list('id', flat=True), dtype=np.int64)
+    sold_ids, _, quantities = daily_sales(start, as_of)
+    # Soft-deleted products still have sales but are not in the catalog;
+    # searchsorted would map them onto the next product id
+    sold = np.isin(sold_ids, catalog)
+    sold_ids, quantities = sold_ids[sold], quantities[sold]
+
+    # Map each (product, day) row onto its catalog position and accumulate sums
+    positions = np.searchsorted(catalog, sold_ids).astype(np.int64)
+    total = np.bincount(positions, weights=quantities, minlength=len(catalog))
+    total_sq = np.bincount(positions, weights=quantities * quantities, minlength=len(catalog))
+
+    mean = total / window
+    std = np.sqrt(np.maximum(total_sq / window - mean * mean, 0.0))
+
+    z = NormalDist().inv_cdf(service_level)
+    safety_stock = z * std * math.sqrt(lead_time)
+    reorder_point = mean * lead_time + safety_stock
+
+    levels = on_hand_levels()
+    on_hand = np.fromiter((float(levels.get(pid, 0)) for pid in catalog.tolist()), dtype=np.float64, count=len(catalog))
+    on_hand = np.maximum(on_hand, 0.0)
+
+    order_up_to = reorder_point + mean * review_days
+    suggested = np.where(on_hand < reorder_point, np.ceil(np.maximum(order_up_to - on_hand, 0.0)), 0.0)
+
+    return {
+        'product_id': catalog,
+        'on_hand': on_hand,
+        'avg_daily_demand': mean,
+        'demand_std': std,
+        'safety_stock': safety_stock,
+        'reorder_point': reorder_point,
+        'suggested_qty': suggested,
+        'below_reorder': on_hand < reorder_point,
+    }
+
+
+def reorder_suggestions(only_below=True, **params):
+    """Return reorder rows (dicts) joined to product details, most urgent first."""
+    result = reorder_points(**params)
+    mask = result['below_reorder'] if only_below else np.ones(len(result['product_id']), dtype=bool)
+    # Most urgent first: largest shortfall relative to the reorder point
+    shortfall = result['reorder_point'] - result['on_hand']
+    order = np.argsort(-shortfall[mask], kind='stable')
+    selected = {key: values[mask][order] for key, values in result.items()}
+
+    product_ids = selected['product_id'].tolist()
+    products = Product.objects.select_related('supplier').in_bulk(product_ids)
+    rows = []
+    for i, product_id in enumerate(product_ids):
+        product = products.get(product_id)
+        if product is None:
+            continue
+        rows.append({
+            'product': product,
+            'on_hand': round(float(selected['on_hand'][i]), 2),
+            'avg_daily_demand': round(float(selected['avg_daily_demand'][i]), 2),
+            'demand_std': round(float(selected['demand_std'][i]), 2),
+            'safety_stock': round(float(selected['safety_stock'][i]), 2),
+            'reorder_point': round(float(selected['reorder_point'][i]), 2),
+            'suggested_qty': int(selected['suggested_qty'][i]),
+            'below_reorder': bool(selected['below_reorder'][i]),
+        })
+    return rows
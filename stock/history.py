@@ -0,0 +1,119 @@
+from decimal import Decimal
+from django.db import transaction
+from django.db.models import Max, Sum
+from purchase.models import ArchivedPurchaseItem, PurchaseItem
+from sale.models import ArchivedSaleItem, SaleItem
+from .archive import carried_by_product, closed_through, latest_period
+from .models import StockCheckpoint, StockLevel, StockTransferItem
+
+
+def latest_checkpoint_date(as_of):
+    return StockCheckpoint.objects.filter(date__lte=as_of).aggregate(latest=Max('date'))['latest']
+
+
+def movements_between(start, end, location=None):
+    """
+    Return {product_id: [in_qty, out_qty]} for movements dated after start and up to end.
+
+    With a location, only that location's purchases and sales count, and transfers in
+    and out of it count as in and out. Across all locations transfers cancel out.
+    Archived lines are read only when the range reaches back into a closed period.
+    """
+    # (queryset, date lookup, index into [in_qty, out_qty])
+    sides = [
+        (PurchaseItem.objects.filter(product__isnull=False), 'purchase__purchase_date', 0),
+        (SaleItem.objects.all(), 'sale__date__date', 1),
+    ]
+    if location is not None:
+        sides = [
+            (sides[0][0].filter(purchase__location=location), 'purchase__purchase_date', 0),
+            (sides[1][0].filter(sale__location=location), 'sale__date__date', 1),
+            (StockTransferItem.objects.filter(transfer__to_location=location), 'transfer__date', 0),
+            (StockTransferItem.objects.filter(transfer__from_location=location), 'transfer__date', 1),
+        ]
+    closed_end = closed_through()
+    if closed_end is not None and (start is None or start < closed_end):
+        archived = [
+            (ArchivedPurchaseItem.objects.filter(product__isnull=False), 'purchase_date', 0),
+            (ArchivedSaleItem.objects.all(), 'sale_date', 1),
+        ]
+        if location is not None:
+            archived = [(rows.filter(location=location), date_lookup, index) for rows, date_lookup, index in archived]
+        sides += archived
+
+    return _sum_sides(sides, start, end)
+
+
+def transfers_between(start, end, location):
+    """Return {product_id: [in_qty, out_qty]} for transfers into and out of a location."""
+    return _sum_sides([
+        (StockTransferItem.objects.filter(transfer__to_location=location), 'transfer__date', 0),
+        (StockTransferItem.objects.filter(transfer__from_location=location), 'transfer__date', 1),
+    ], start, end)
+
+
+def _sum_sides(sides, start, end, totals=None):
+    totals = {} if totals is None else totals
+    for rows, date_lookup, index in sides:
+        if end is not None:
+            rows = rows.filter(**{f'{date_lookup}__lte': end})
+        if start is not None:
+            rows = rows.filter(**{f'{date_lookup}__gt': start})
+        for row in rows.values('product_id').annotate(qty=Sum('quantity')):
+            totals.setdefault(row['product_id'], [Decimal('0'), Decimal('0')])[index] += Decimal(row['qty'] or 0)
+    return totals
+
+
+def _add(levels, movements):
+    for product_id, (in_qty, out_qty) in movements.items():
+        level = levels.setdefault(product_id, [Decimal('0'), Decimal('0')])
+        level[0] += in_qty
+        level[1] += out_qty
+    return levels
+
+
+def on_hand_levels():
+    """Return {product_id: on_hand} across all locations, from the maintained stock levels."""
+    rows = StockLevel.objects.values('product_id').annotate(qty=Sum('quantity'))
+    return {row['product_id']: row['qty'] for row in rows}
+
+
+def stock_as_of(as_of, location=None):
+    """
+    Return {product_id: [in_qty, out_qty]} as of the end of the given date, starting
+    from the nearest checkpoint or closed period and applying only the movements
+    recorded after it. Checkpoints are kept across all locations, so a single
+    location starts from its carry-forward or is summed in full.
+    """
+    checkpoint_date = latest_checkpoint_date(as_of) if location is None else None
+    period = latest_period(as_of)
+    levels = {}
+    if period is not None and (checkpoint_date is None or period.end_date >= checkpoint_date):
+        checkpoint_date = period.end_date
+        levels = carried_by_product(period, location)
+        if location is not None:
+            # Transfers are never archived, so the carry-forward leaves them out
+            _add(levels, transfers_between(None, checkpoint_date, location))
+    elif checkpoint_date is not None:
+        checkpoints = StockCheckpoint.objects.filter(date=checkpoint_date).values_list('product_id', 'in_qty', 'out_qty')
+        for product_id, in_qty, out_qty in checkpoints:
+            levels[product_id] = [in_qty, out_qty]
+    return _add(levels, movements_between(checkpoint_date, as_of, location))
+
+
+def write_checkpoint(as_of):
+    """Write (or rewrite) the per-product checkpoint for the given date and return the row count."""
+    levels = stock_as_of(as_of)
+    with transaction.atomic():
+        StockCheckpoint.objects.filter(date=as_of).delete()
+        StockCheckpoint.objects.bulk_create([
+            StockCheckpoint(product_id=product_id, date=as_of, in_qty=in_qty, out_qty=out_qty)
+            for product_id, (in_qty, out_qty) in levels.items()
+        ], batch_size=1000)
+    return len(levels)
+
+
+def invalidate_from(movement_date):
+    # A movement dated on or before a checkpoint makes that checkpoint stale
+    if movement_date is not None:
+        StockCheckpoint.objects.filter(date__gte=movement_date).delete()
@@ -0,0 +1,130 @@
+"""
+Per-location on-hand quantities.
+
+StockLevel holds one row per (location, product). Movements change it by signed
+deltas instead of re-summing history: purchases add at their location, sales
+subtract at theirs, and a transfer subtracts at its source and adds at its
+destination. stock.signals applies the deltas for ordinary saves and deletes;
+bulk writers that skip signals (bulk_create, QuerySet.update) call adjust()
+themselves. rebuild() recomputes the table from the movement rows and the
+carry-forward of any closed period (see stock.archive).
+"""
+from collections import defaultdict
+from decimal import Decimal
+from django.db import transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+from purchase.models import PurchaseItem
+from sale.models import SaleItem
+from .archive import carried, latest_period
+from .models import Location, StockLevel, StockTransferItem
+
+# Movement line model -> (header field, ((header location field, sign), ...))
+MOVEMENTS = {
+    PurchaseItem: ('purchase', (('location_id', 1),)),
+    SaleItem: ('sale', (('location_id', -1),)),
+    StockTransferItem: ('transfer', (('from_location_id', -1), ('to_location_id', 1))),
+}
+
+
+def default_location():
+    """The location used when a document does not name one: the oldest active location."""
+    location = Location.objects.filter(is_active=True).order_by('id').first()
+    if location is None:
+        location, _ = Location.objects.get_or_create(name='Main')
+    return location
+
+
+def line_deltas(model, header, product_id, quantity, sign=1):
+    """Return {(location_id, product_id): delta} for one movement line under the given header."""
+    deltas = defaultdict(Decimal)
+    if header is None or product_id is None or not quantity:
+        return deltas
+    for field, direction in MOVEMENTS[model][1]:
+        location_id = getattr(header, field)
+        if location_id is not None:
+            deltas[(location_id, product_id)] += Decimal(quantity) * direction * sign
+    return deltas
+
+
+def merge(*delta_maps):
+    merged = defaultdict(Decimal)
+    for deltas in delta_maps:
+        for key, value in deltas.items():
+            merged[key] += value
+    return merged
+
+
+def lines_deltas(model, header, lines):
+    """Deltas for several unsaved or bulk-created lines of one header."""
+    return merge(*(line_deltas(model, header, line.product_id, line.quantity) for line in lines))
+
+
+def adjust(deltas):
+    """Apply {(location_id, product_id): delta} to StockLevel, creating missing rows."""
+    deltas = {key: value for key, value in deltas.items() if value}
+    if not deltas:
+        return
+    with transaction.atomic():
+        StockLevel.objects.bulk_create(
+            [StockLevel(location_id=location_id, product_id=product_id) for location_id, product_id in deltas],
+            ignore_conflicts=True,
+        )
+        now = timezone.now()
+        for (location_id, product_id), delta in deltas.items():
+            StockLevel.objects.filter(location_id=location_id, product_id=product_id).update(
+                quantity=F('quantity') + delta, updated_at=now,
+            )
+
+
+def header_deltas(model, header_id, old_header, new_header):
+    """Deltas that move every line of a header from its old locations to its new ones."""
+    header_field = MOVEMENTS[model][0]
+    deltas = defaultdict(Decimal)
+    rows = (
+        model.objects.filter(**{f'{header_field}_id': header_id}, product__isnull=False)
+        .values('product_id').annotate(qty=Sum('quantity'))
+    )
+    for row in rows:
+        deltas = merge(
+            deltas,
+            line_deltas(model, old_header, row['product_id'], row['qty'], sign=-1),
+            line_deltas(model, new_header, row['product_id'], row['qty']),
+        )
+    return deltas
+
+
+def on_hand(location, product_ids=None):
+    """Return {product_id: quantity} at a location, reading only that location's level rows."""
+    levels = StockLevel.objects.filter(location=location)
+    if product_ids is not None:
+        levels = levels.filter(product_id__in=product_ids)
+    return dict(levels.values_list('product_id', 'quantity'))
+
+
+def movement_totals(location_id=None):
+    """Return {(location_id, product_id): on_hand} summed from the carry-forward and the live movement rows."""
+    totals = defaultdict(Decimal)
+    for key, (in_qty, out_qty) in carried(latest_period(), location_id).items():
+        totals[key] += in_qty - out_qty
+    for model, (header_field, sides) in MOVEMENTS.items():
+        rows = model.objects.filter(product__isnull=False)
+        for field, direction in sides:
+            location_path = f"{header_field}__{field.removesuffix('_id')}"
+            side = rows.filter(**{location_path: location_id}) if location_id else rows
+            for row in side.values(location_path, 'product_id').annotate(qty=Sum('quantity')):
+                totals[(row[location_path], row['product_id'])] += Decimal(row['qty'] or 0) * direction
+    return totals
+
+
+def rebuild(location=None):
+    """Recompute StockLevel (for one location, or all of them) from the movements; returns the row count."""
+    totals = movement_totals(location.pk if location else None)
+    with transaction.atomic():
+        stale = StockLevel.objects.filter(location=location) if location else StockLevel.objects.all()
+        stale.delete()
+        StockLevel.objects.bulk_create([
+            StockLevel(location_id=location_id, product_id=product_id, quantity=quantity)
+            for (location_id, product_id), quantity in totals.items()
+        ], batch_size=1000)
+    return len(totals)
@@ -0,0 +1,27 @@
+from datetime import datetime
+from django.core.management.base import BaseCommand, CommandError
+from stock.archive import CHUNK_SIZE, PeriodError, close_period
+
+
+class Command(BaseCommand):
+    help = "Close a period: archive purchase and sale lines dated up to a date and carry their stock totals forward."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--through', required=True, help="Last date of the period to close (YYYY-MM-DD).")
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help="Lines moved per batch.")
+
+    def handle(self, *args, **options):
+        try:
+            end_date = datetime.strptime(options['through'], '%Y-%m-%d').date()
+        except ValueError:
+            raise CommandError(f"Invalid date '{options['through']}', expected YYYY-MM-DD.")
+        if options['chunk_size'] < 1:
+            raise CommandError("--chunk-size must be positive.")
+        try:
+            period = close_period(end_date, chunk_size=options['chunk_size'])
+        except PeriodError as e:
+            raise CommandError(str(e))
+        self.stdout.write(self.style.SUCCESS(
+            f"Closed through {period.end_date}: archived {period.purchase_items} purchase "
+            f"and {period.sale_items} sale line(s)."
+        ))
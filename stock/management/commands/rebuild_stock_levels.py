@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand, CommandError
+from stock.levels import rebuild
+from stock.models import Location
+
+
+class Command(BaseCommand):
+    help = "Recompute per-location stock levels from purchases, sales and transfers."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--location', help="Name of a single location to rebuild. Defaults to all.")
+
+    def handle(self, *args, **options):
+        location = None
+        if options['location']:
+            location = Location.objects.filter(name=options['location']).first()
+            if location is None:
+                raise CommandError(f"No location named '{options['location']}'.")
+        count = rebuild(location)
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {count} stock level(s)."))
@@ -0,0 +1,46 @@
+from datetime import date, datetime, timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from stock.history import write_checkpoint
+
+
+def _parse_date(value):
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        raise CommandError(f"Invalid date '{value}', expected YYYY-MM-DD.")
+
+
+def _month_ends(start, end):
+    current = start
+    while True:
+        next_month = date(current.year + current.month // 12, current.month % 12 + 1, 1)
+        month_end = next_month - timedelta(days=1)
+        if month_end >= end:
+            break
+        yield month_end
+        current = next_month
+
+
+class Command(BaseCommand):
+    help = "Write per-product stock checkpoints used by as-of-date stock queries."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', help="Checkpoint date (YYYY-MM-DD). Defaults to yesterday.")
+        parser.add_argument(
+            '--monthly-from',
+            help="Also backfill month-end checkpoints from this date (YYYY-MM-DD) up to --date.",
+        )
+
+    def handle(self, *args, **options):
+        as_of = _parse_date(options['date']) if options['date'] else timezone.localdate() - timedelta(days=1)
+        dates = []
+        if options['monthly_from']:
+            dates.extend(_month_ends(_parse_date(options['monthly_from']), as_of))
+        dates.append(as_of)
+
+        # Oldest first, so every checkpoint builds on the one before it
+        for checkpoint_date in dates:
+            count = write_checkpoint(checkpoint_date)
+            self.stdout.write(f"Checkpoint {checkpoint_date}: {count} products")
+        self.stdout.write(self.style.SUCCESS(f"Wrote {len(dates)} checkpoint(s)."))
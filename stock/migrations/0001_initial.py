@@ -0,0 +1,30 @@
+# Generated by Django 5.2.1 on 2026-10-19 18:45
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('product', '0008_alter_product_supplier_delete_supplier'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('in_qty', models.DecimalField(decimal_places=2, default=0.0, max_digits=14)),
+                ('out_qty', models.DecimalField(decimal_places=2, default=0.0, max_digits=14)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_checkpoints', to='product.product')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('date', 'product'), name='unique_stock_checkpoint')],
+            },
+        ),
+    ]
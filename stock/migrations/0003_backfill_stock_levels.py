@@ -0,0 +1,39 @@
+from decimal import Decimal
+from django.db import migrations
+from django.db.models import Sum
+
+
+def backfill_levels(apps, schema_editor):
+    # Every existing purchase and sale was assigned to the first location, so its
+    # on-hand is the global in minus out per product.
+    db = schema_editor.connection.alias
+    Location = apps.get_model('stock', 'Location')
+    StockLevel = apps.get_model('stock', 'StockLevel')
+    PurchaseItem = apps.get_model('purchase', 'PurchaseItem')
+    SaleItem = apps.get_model('sale', 'SaleItem')
+
+    location = Location.objects.using(db).order_by('id').first()
+    if location is None:
+        return
+    on_hand = {}
+    for model, sign in ((PurchaseItem, 1), (SaleItem, -1)):
+        rows = model.objects.using(db).filter(product__isnull=False).values('product_id').annotate(qty=Sum('quantity'))
+        for row in rows:
+            on_hand[row['product_id']] = on_hand.get(row['product_id'], Decimal('0')) + Decimal(row['qty'] or 0) * sign
+    StockLevel.objects.using(db).bulk_create([
+        StockLevel(location=location, product_id=product_id, quantity=quantity)
+        for product_id, quantity in on_hand.items()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stock', '0002_locations'),
+        ('purchase', '0007_purchase_location'),
+        ('sale', '0005_sale_location'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_levels, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.1 on 2026-10-19 19:21
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('product', '0008_alter_product_supplier_delete_supplier'),
+        ('stock', '0003_backfill_stock_levels'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClosedPeriod',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('end_date', models.DateField(unique=True)),
+                ('closed_at', models.DateTimeField(auto_now_add=True)),
+                ('purchase_items', models.PositiveIntegerField(default=0)),
+                ('sale_items', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['-end_date'],
+            },
+        ),
+        migrations.CreateModel(
+            name='StockCarryForward',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('in_qty', models.DecimalField(decimal_places=2, default=0.0, max_digits=14)),
+                ('out_qty', models.DecimalField(decimal_places=2, default=0.0, max_digits=14)),
+                ('location', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='carry_forward', to='stock.location')),
+                ('period', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='carry_forward', to='stock.closedperiod')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='carry_forward', to='product.product')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('period', 'location', 'product'), name='unique_stock_carry_forward')],
+            },
+        ),
+    ]
@@ -1,3 +1,130 @@
+from datetime import date
+from django.core.validators import MinValueValidator
 from django.db import models
+from django.db.models import F, Q
+from product.models import Product
 
-# Create your models here.
+class StockCheckpoint(models.Model):
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='stock_checkpoints')
+    date = models.DateField()
+    in_qty = models.DecimalField(max_digits=14, decimal_places=2, default=0.00)
+    out_qty = models.DecimalField(max_digits=14, decimal_places=2, default=0.00)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'product'], name='unique_stock_checkpoint'),
+        ]
+
+    def __str__(self):
+        return f"{self.product.name} @ {self.date}: {self.in_qty - self.out_qty}"
+
+
+class Location(models.Model):
+    """A branch or warehouse that holds stock. Purchases, purchase orders and sales each belong to one."""
+    name = models.CharField(max_length=100, unique=True)
+    address = models.TextField(blank=True)
+    is_active = models.BooleanField(default=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['name']
+
+    def __str__(self):
+        return self.name
+
+
+class StockLevel(models.Model):
+    """On-hand quantity of one product at one location, kept up to date by stock.levels."""
+    location = models.ForeignKey(Location, on_delete=models.CASCADE, related_name='stock_levels')
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='stock_levels')
+    quantity = models.DecimalField(max_digits=14, decimal_places=2, default=0.00)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            # Also the (location, product) index every level lookup goes through
+            models.UniqueConstraint(fields=['location', 'product'], name='unique_stock_level'),
+        ]
+
+    def __str__(self):
+        return f"{self.product.name} @ {self.location.name}: {self.quantity}"
+
+
+def generate_transfer_number():
+    """Generate a unique transfer number in the format TR-YYYYMMDD-XXX"""
+    today_str = date.today().strftime('%Y%m%d')
+    last = StockTransfer.objects.filter(
+        transfer_number__startswith=f'TR-{today_str}-'
+    ).order_by('-transfer_number').values_list('transfer_number', flat=True).first()
+    try:
+        new_num = int(last.split('-')[-1]) + 1 if last else 1
+    except ValueError:
+        new_num = 1
+    return f'TR-{today_str}-{new_num:03d}'
+
+
+class StockTransfer(models.Model):
+    transfer_number = models.CharField(max_length=50, unique=True, blank=True)
+    from_location = models.ForeignKey(Location, on_delete=models.PROTECT, related_name='transfers_out')
+    to_location = models.ForeignKey(Location, on_delete=models.PROTECT, related_name='transfers_in')
+    date = models.DateField(default=date.today)
+    notes = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-date', '-id']
+        constraints = [
+            models.CheckConstraint(condition=~Q(from_location=F('to_location')), name='transfer_between_locations'),
+        ]
+
+    def save(self, *args, **kwargs):
+        if not self.transfer_number:
+            self.transfer_number = generate_transfer_number()
+        super().save(*args, **kwargs)
+
+    def __str__(self):
+        return f"{self.transfer_number}: {self.from_location.name} -> {self.to_location.name}"
+
+
+class StockTransferItem(models.Model):
+    transfer = models.ForeignKey(StockTransfer, on_delete=models.CASCADE, related_name='items')
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='transfer_items')
+    quantity = models.DecimalField(max_digits=10, decimal_places=2, validators=[MinValueValidator(0.01)])
+
+    def __str__(self):
+        return f"{self.quantity} x {self.product.name} ({self.transfer.transfer_number})"
+
+
+class ClosedPeriod(models.Model):
+    """
+    Everything dated up to end_date is closed: its purchase and sale lines live in
+    the archive tables and StockCarryForward holds their running totals.
+    """
+    end_date = models.DateField(unique=True)
+    closed_at = models.DateTimeField(auto_now_add=True)
+    purchase_items = models.PositiveIntegerField(default=0)
+    sale_items = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ['-end_date']
+
+    def __str__(self):
+        return f"Closed through {self.end_date}"
+
+
+class StockCarryForward(models.Model):
+    """Purchased (in) and sold (out) quantities of a product at a location, from the beginning through a closed period."""
+    period = models.ForeignKey(ClosedPeriod, on_delete=models.CASCADE, related_name='carry_forward')
+    location = models.ForeignKey(Location, on_delete=models.CASCADE, related_name='carry_forward')
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='carry_forward')
+    in_qty = models.DecimalField(max_digits=14, decimal_places=2, default=0.00)
+    out_qty = models.DecimalField(max_digits=14, decimal_places=2, default=0.00)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['period', 'location', 'product'], name='unique_stock_carry_forward'),
+        ]
+
+    def __str__(self):
+        return f"{self.product.name} @ {self.location.name} through {self.period.end_date}: {self.in_qty - self.out_qty}"
@@ -0,0 +1,143 @@
+from types import SimpleNamespace
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+from purchase.models import Purchase, PurchaseItem
+from purchaseorder.models import PurchaseOrder
+from sale.models import Sale, SaleItem
+from . import levels
+from .history import invalidate_from
+from .models import StockTransfer, StockTransferItem
+
+
+def _sale_day(value):
+    if value is None:
+        return None
+    return timezone.localdate(value) if timezone.is_aware(value) else value.date()
+
+
+@receiver(pre_save, sender=Purchase)
+@receiver(pre_save, sender=Sale)
+def remember_previous_date(sender, instance, **kwargs):
+    instance._previous_stock_date = None
+    if instance.pk:
+        field = 'purchase_date' if sender is Purchase else 'date'
+        previous = sender.objects.filter(pk=instance.pk).values_list(field, flat=True).first()
+        instance._previous_stock_date = previous if sender is Purchase else _sale_day(previous)
+
+
+@receiver(post_save, sender=Purchase)
+@receiver(post_save, sender=Sale)
+def invalidate_header_checkpoints(sender, instance, **kwargs):
+    current = instance.purchase_date if sender is Purchase else _sale_day(instance.date)
+    dates = [d for d in (current, getattr(instance, '_previous_stock_date', None)) if d is not None]
+    if dates:
+        invalidate_from(min(dates))
+
+
+@receiver(post_delete, sender=Purchase)
+def invalidate_deleted_purchase(sender, instance, **kwargs):
+    invalidate_from(instance.purchase_date)
+
+
+@receiver(post_delete, sender=Sale)
+def invalidate_deleted_sale(sender, instance, **kwargs):
+    invalidate_from(_sale_day(instance.date))
+
+
+@receiver(post_save, sender=PurchaseItem)
+@receiver(post_delete, sender=PurchaseItem)
+def invalidate_purchase_item(sender, instance, **kwargs):
+    purchase_date = Purchase.objects.filter(pk=instance.purchase_id).values_list('purchase_date', flat=True).first()
+    invalidate_from(purchase_date)
+
+
+@receiver(post_save, sender=SaleItem)
+@receiver(post_delete, sender=SaleItem)
+def invalidate_sale_item(sender, instance, **kwargs):
+    sale_date = Sale.objects.filter(pk=instance.sale_id).values_list('date', flat=True).first()
+    invalidate_from(_sale_day(sale_date))
+
+
+# Per-location stock levels
+
+# Header model -> its movement line model
+LINE_MODELS = {Purchase: PurchaseItem, Sale: SaleItem, StockTransfer: StockTransferItem}
+
+
+@receiver(pre_save, sender=Purchase)
+@receiver(pre_save, sender=PurchaseOrder)
+@receiver(pre_save, sender=Sale)
+def assign_default_location(sender, instance, raw=False, **kwargs):
+    if not raw and instance.location_id is None:
+        instance.location = levels.default_location()
+
+
+def _header_locations(line_model):
+    return [field for field, _ in levels.MOVEMENTS[line_model][1]]
+
+
+@receiver(pre_save, sender=Purchase)
+@receiver(pre_save, sender=Sale)
+@receiver(pre_save, sender=StockTransfer)
+def remember_previous_locations(sender, instance, raw=False, **kwargs):
+    instance._previous_locations = None
+    if instance.pk and not raw:
+        fields = _header_locations(LINE_MODELS[sender])
+        previous = sender.objects.filter(pk=instance.pk).values(*fields).first()
+        instance._previous_locations = SimpleNamespace(**previous) if previous else None
+
+
+@receiver(post_save, sender=Purchase)
+@receiver(post_save, sender=Sale)
+@receiver(post_save, sender=StockTransfer)
+def move_lines_with_header(sender, instance, created, raw=False, **kwargs):
+    previous = getattr(instance, '_previous_locations', None)
+    if created or raw or previous is None:
+        return
+    line_model = LINE_MODELS[sender]
+    if any(getattr(previous, field) != getattr(instance, field) for field in _header_locations(line_model)):
+        levels.adjust(levels.header_deltas(line_model, instance.pk, previous, instance))
+
+
+def _previous_line(sender, pk):
+    """(header locations, product_id, quantity) of a line as currently stored, or None."""
+    header_field = levels.MOVEMENTS[sender][0]
+    paths = {field: f"{header_field}__{field.removesuffix('_id')}" for field in _header_locations(sender)}
+    row = sender.objects.filter(pk=pk).values('product_id', 'quantity', *paths.values()).first()
+    if row is None:
+        return None
+    return SimpleNamespace(**{field: row[path] for field, path in paths.items()}), row['product_id'], row['quantity']
+
+
+@receiver(pre_save, sender=PurchaseItem)
+@receiver(pre_save, sender=SaleItem)
+@receiver(pre_save, sender=StockTransferItem)
+@receiver(pre_delete, sender=PurchaseItem)
+@receiver(pre_delete, sender=SaleItem)
+@receiver(pre_delete, sender=StockTransferItem)
+def remember_previous_line(sender, instance, raw=False, **kwargs):
+    instance._previous_stock_line = _previous_line(sender, instance.pk) if instance.pk and not raw else None
+
+
+@receiver(post_save, sender=PurchaseItem)
+@receiver(post_save, sender=SaleItem)
+@receiver(post_save, sender=StockTransferItem)
+def apply_line_level(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    header = getattr(instance, levels.MOVEMENTS[sender][0])
+    deltas = levels.line_deltas(sender, header, instance.product_id, instance.quantity)
+    previous = getattr(instance, '_previous_stock_line', None)
+    if previous:
+        deltas = levels.merge(deltas, levels.line_deltas(sender, *previous, sign=-1))
+    levels.adjust(deltas)
+
+
+@receiver(post_delete, sender=PurchaseItem)
+@receiver(post_delete, sender=SaleItem)
+@receiver(post_delete, sender=StockTransferItem)
+def remove_line_level(sender, instance, **kwargs):
+    previous = getattr(instance, '_previous_stock_line', None)
+    if previous:
+        levels.adjust(levels.line_deltas(sender, *previous, sign=-1))
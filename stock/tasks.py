@@ -0,0 +1,9 @@
+from datetime import date
+from core.jobs import task
+from .history import write_checkpoint
+
+
+@task('stock.write_checkpoint')
+def write_stock_checkpoint(job, date_iso):
+    count = write_checkpoint(date.fromisoformat(date_iso))
+    return {'date': date_iso, 'products': count}
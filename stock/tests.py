@@ -1,3 +1,38 @@
+from decimal import Decimal
 from django.test import TestCase
+from core.tests import make_product
+from customer.models import Customer
+from sale.models import Sale, SaleItem
+from stock.forecast import reorder_points, reorder_suggestions
+from stock.levels import default_location
 
-# Create your tests here.
+
+class ReorderSoftDeleteTests(TestCase):
+    def setUp(self):
+        self.products = [make_product(f'P{i}') for i in range(1, 5)]
+        self.sale = Sale.objects.create(customer=Customer.objects.create(customer_name='Bob'), location=default_location())
+
+    def sell(self, product, quantity):
+        SaleItem.objects.create(sale=self.sale, product=product, quantity=Decimal(quantity), rate=Decimal('10'))
+
+    def demand(self):
+        result = reorder_points(window=30, lead_time=7)
+        self.assertEqual(len(result['avg_daily_demand']), len(result['product_id']))
+        return dict(zip(result['product_id'].tolist(), result['avg_daily_demand'].tolist()))
+
+    def test_deleted_product_sales_do_not_land_on_a_neighbour(self):
+        p1, p2, p3, p4 = self.products
+        self.sell(p2, '3')
+        p2.soft_delete()
+        p3.soft_delete()
+        self.assertEqual(self.demand(), {p1.pk: 0.0, p4.pk: 0.0})
+        self.assertEqual(reorder_suggestions(window=30, lead_time=7), [])
+
+    def test_deleted_product_above_the_last_live_id(self):
+        p1, p2, p3, p4 = self.products
+        self.sell(p1, '6')
+        self.sell(p4, '3')
+        p4.soft_delete()
+        demand = self.demand()
+        self.assertEqual(set(demand), {p1.pk, p2.pk, p3.pk})
+        self.assertAlmostEqual(demand[p1.pk], 6 / 30)
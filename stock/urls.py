@@ -3,4 +3,9 @@ from . import views
 
 urlpatterns = [
     path('stock/', views.stock_report, name='stock_report'),
-]
\ No newline at end of file
+    path('stock/reorder/', views.reorder_report, name='reorder_report'),
+    path('stock/locations/', views.location_list, name='location_list'),
+    path('stock/locations/<int:pk>/toggle/', views.toggle_location, name='toggle_location'),
+    path('stock/transfers/', views.transfer_list, name='transfer_list'),
+    path('stock/transfers/add/', views.add_transfer, name='add_transfer'),
+]
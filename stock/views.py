@@ -1,16 +1,71 @@
-from django.shortcuts import render
+import logging
+from datetime import datetime
+from decimal import Decimal
+from django import forms
+from django.contrib import messages
+from django.db import transaction
+from django.db.models import Count
+from django.forms import inlineformset_factory
+from django.shortcuts import get_object_or_404, redirect, render
+from django.views.decorators.http import require_POST
 from product.models import Product
 from purchase.models import PurchaseItem
 from sale.models import SaleItem
-from django.db.models import Sum, F, Value, DecimalField
+from django.db.models import Sum, F, OuterRef, Q, Subquery, Value, DecimalField
 from django.db.models.functions import Coalesce
 from django.db.models.expressions import ExpressionWrapper
+from core.db_routers import use_replica
+from core.pagination import KeysetPaginator
+from core.versioning import conditional
+from .forecast import DEFAULT_PARAMS, parse_reorder_params, reorder_suggestions
+from .archive import latest_period
+from .history import stock_as_of
+from .models import Location, StockCarryForward, StockLevel, StockTransfer, StockTransferItem
 
-def stock_report(request):
-    products = Product.objects.annotate(
-        in_qty=Coalesce(Sum('purchaseitem__quantity'), Value(0), output_field=DecimalField()),
-        out_qty=Coalesce(Sum('saleitem__quantity'), Value(0), output_field=DecimalField()),
-        stock=Coalesce(F('in_qty') - F('out_qty'), Value(0), output_field=DecimalField()),
+logger = logging.getLogger(__name__)
+
+def _quantity(model, **filters):
+    # One correlated sum per movement table; joining both tables in a single
+    # annotate() would multiply each sum by the other table's row count.
+    rows = (
+        model.objects.filter(product=OuterRef('pk'), **filters)
+        .order_by().values('product').annotate(total=Sum('quantity')).values('total')
+    )
+    return Coalesce(Subquery(rows), Value(0), output_field=DecimalField(max_digits=14, decimal_places=2))
+
+def _carried(field, period, **filters):
+    # Closed periods contribute their carry-forward instead of their archived lines
+    if period is None:
+        return Value(0, output_field=DecimalField(max_digits=14, decimal_places=2))
+    rows = (
+        StockCarryForward.objects.filter(period=period, product=OuterRef('pk'), **filters)
+        .order_by().values('product').annotate(total=Sum(field)).values('total')
+    )
+    return Coalesce(Subquery(rows), Value(0), output_field=DecimalField(max_digits=14, decimal_places=2))
+
+def _current_stock_rows(location=None):
+    products = Product.objects.all()
+    period = latest_period()
+    if location is None:
+        in_qty = _carried('in_qty', period) + _quantity(PurchaseItem)
+        out_qty = _carried('out_qty', period) + _quantity(SaleItem)
+        stock = F('in_qty') - F('out_qty')
+    else:
+        # Only products with a level at this location, read from its own rows
+        products = products.filter(stock_levels__location=location)
+        in_qty = (
+            _carried('in_qty', period, location=location) + _quantity(PurchaseItem, purchase__location=location)
+            + _quantity(StockTransferItem, transfer__to_location=location)
+        )
+        out_qty = (
+            _carried('out_qty', period, location=location) + _quantity(SaleItem, sale__location=location)
+            + _quantity(StockTransferItem, transfer__from_location=location)
+        )
+        stock = F('stock_levels__quantity')
+    return products.annotate(
+        in_qty=in_qty,
+        out_qty=out_qty,
+        stock=ExpressionWrapper(stock, output_field=DecimalField(max_digits=14, decimal_places=2)),
         stock_sale_price=ExpressionWrapper(
             F('stock') * F('sale_price'),
             output_field=DecimalField(max_digits=10, decimal_places=2)
@@ -24,6 +79,44 @@ def stock_report(request):
         'in_qty', 'out_qty', 'stock', 'stock_sale_price', 'stock_purchase_price'
     )
 
+def _stock_rows_as_of(as_of, location=None):
+    levels = stock_as_of(as_of, location)
+    products = Product.objects.all()
+    if location is not None:
+        products = products.filter(id__in=list(levels))
+    products = products.values('id', 'name', 'model', 'sale_price', 'cost_price')
+    for p in products:
+        in_qty, out_qty = levels.get(p['id'], (Decimal('0'), Decimal('0')))
+        stock = in_qty - out_qty
+        yield dict(
+            p,
+            in_qty=in_qty,
+            out_qty=out_qty,
+            stock=stock,
+            stock_sale_price=stock * p['sale_price'],
+            stock_purchase_price=stock * p['cost_price'],
+        )
+
+@use_replica
+@conditional('stock', 'products')
+def stock_report(request):
+    as_of = None
+    as_of_param = request.GET.get('date', '').strip()
+    if as_of_param:
+        try:
+            as_of = datetime.strptime(as_of_param, '%Y-%m-%d').date()
+        except ValueError:
+            messages.error(request, "Invalid date. Showing current stock instead.")
+
+    location = None
+    location_param = request.GET.get('location', '').strip()
+    if location_param:
+        location = Location.objects.filter(pk=location_param).first() if location_param.isdigit() else None
+        if location is None:
+            messages.error(request, "Unknown location. Showing all locations instead.")
+
+    products = _stock_rows_as_of(as_of, location) if as_of else _current_stock_rows(location)
+
     stock_data = [
         {
             'product': {
@@ -50,5 +143,135 @@ def stock_report(request):
         'total_stock': total_stock,
         'total_stock_sale_price': total_stock_sale_price,
         'total_stock_purchase_price': total_stock_purchase_price,
+        'as_of': as_of,
+        'location': location,
+        'locations': Location.objects.all(),
     }
-    return render(request, 'stock_report.html', context)
\ No newline at end of file
+    return render(request, 'stock_report.html', context)
+
+@use_replica
+def reorder_report(request):
+    try:
+        params = parse_reorder_params(request.GET)
+    except ValueError:
+        messages.error(request, "Invalid parameters. Using defaults.")
+        params = dict(DEFAULT_PARAMS)
+    show_all = request.GET.get('all') == '1'
+    rows = reorder_suggestions(only_below=not show_all, **params)
+    return render(request, 'reorder_report.html', {
+        'rows': rows,
+        'params': params,
+        'show_all': show_all,
+        'below_count': sum(1 for row in rows if row['below_reorder']),
+    })
+
+class LocationForm(forms.ModelForm):
+    class Meta:
+        model = Location
+        fields = ['name', 'address']
+        widgets = {
+            'address': forms.TextInput(),
+        }
+
+@conditional('stock')
+def location_list(request):
+    if request.method == 'POST':
+        form = LocationForm(request.POST)
+        if form.is_valid():
+            location = form.save()
+            messages.success(request, f"Location '{location.name}' added successfully!")
+            return redirect('location_list')
+    else:
+        form = LocationForm()
+    locations = Location.objects.annotate(products_in_stock=Count('stock_levels', filter=Q(stock_levels__quantity__gt=0)))
+    return render(request, 'location_list.html', {'form': form, 'locations': locations})
+
+@require_POST
+def toggle_location(request, pk):
+    location = get_object_or_404(Location, pk=pk)
+    location.is_active = not location.is_active
+    location.save(update_fields=['is_active'])
+    messages.success(request, f"Location '{location.name}' {'activated' if location.is_active else 'deactivated'}.")
+    return redirect('location_list')
+
+class StockTransferForm(forms.ModelForm):
+    class Meta:
+        model = StockTransfer
+        fields = ['from_location', 'to_location', 'date', 'notes']
+        widgets = {
+            'date': forms.DateInput(attrs={'type': 'date'}),
+            'notes': forms.TextInput(),
+        }
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        for name in ('from_location', 'to_location'):
+            self.fields[name].queryset = Location.objects.filter(is_active=True)
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if cleaned_data.get('from_location') and cleaned_data.get('from_location') == cleaned_data.get('to_location'):
+            raise forms.ValidationError("Choose two different locations.")
+        return cleaned_data
+
+StockTransferItemFormSet = inlineformset_factory(
+    StockTransfer, StockTransferItem, fields=['product', 'quantity'], extra=1, can_delete=True, min_num=1,
+    validate_min=True,
+    widgets={'quantity': forms.NumberInput(attrs={'step': '0.01', 'min': '0.01'})},
+)
+
+@conditional('stock')
+def transfer_list(request):
+    transfers = StockTransfer.objects.select_related('from_location', 'to_location').annotate(
+        item_count=Count('items'), total_quantity=Sum('items__quantity'),
+    )
+    location = None
+    location_param = request.GET.get('location', '').strip()
+    if location_param.isdigit():
+        location = Location.objects.filter(pk=location_param).first()
+        if location:
+            transfers = transfers.filter(Q(from_location=location) | Q(to_location=location))
+    page = KeysetPaginator(transfers, ordering=['-date'], per_page=25).get_page(request.GET.get('cursor'))
+    return render(request, 'transfer_list.html', {
+        'transfers': page,
+        'location': location,
+        'locations': Location.objects.all(),
+    })
+
+def add_transfer(request):
+    if request.method == 'POST':
+        form = StockTransferForm(request.POST)
+        formset = StockTransferItemFormSet(request.POST)
+        if form.is_valid() and formset.is_valid():
+            wanted = {}
+            for item_form in formset:
+                data = item_form.cleaned_data
+                if data and not data.get('DELETE'):
+                    wanted[data['product']] = wanted.get(data['product'], Decimal('0')) + data['quantity']
+            try:
+                with transaction.atomic():
+                    # Lock the source levels so two transfers cannot both spend the same stock
+                    source = form.cleaned_data['from_location']
+                    available = dict(
+                        StockLevel.objects.select_for_update()
+                        .filter(location=source, product__in=wanted).values_list('product_id', 'quantity')
+                    )
+                    short = [
+                        f"{product.name} (available: {available.get(product.id, 0)})"
+                        for product, quantity in wanted.items() if quantity > available.get(product.id, 0)
+                    ]
+                    if short:
+                        raise ValueError(f"Not enough stock at {source.name}: {', '.join(short)}.")
+                    transfer = form.save()
+                    formset.instance = transfer
+                    formset.save()
+            except ValueError as e:
+                messages.error(request, str(e))
+            else:
+                logger.info(f"Stock transfer {transfer.transfer_number} saved with {len(wanted)} product(s)")
+                messages.success(request, f"Transfer {transfer.transfer_number} saved.")
+                return redirect('transfer_list')
+    else:
+        form = StockTransferForm()
+        formset = StockTransferItemFormSet()
+    return render(request, 'add_transfer.html', {'form': form, 'formset': formset})
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.1 on 2026-10-19 18:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('supplier', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='supplier',
+            index=models.Index(fields=['supplier_name', 'id'], name='supplier_name_id_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.1 on 2026-10-19 19:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('supplier', '0002_supplier_name_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='supplier',
+            name='deleted_at',
+            field=models.DateTimeField(blank=True, db_index=True, editable=False, null=True),
+        ),
+    ]
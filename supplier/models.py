@@ -1,8 +1,9 @@
 
 # Create your models here.
 from django.db import models
+from core.softdelete import SoftDeleteModel
 
-class Supplier(models.Model):
+class Supplier(SoftDeleteModel):
     supplier_name = models.CharField(max_length=100)
     email = models.EmailField(blank=True, null=True)
     phone = models.CharField(max_length=20, blank=True, null=True)
@@ -17,5 +18,9 @@ class Supplier(models.Model):
     zip = models.CharField(max_length=20, blank=True, null=True)
     balance = models.DecimalField(max_digits=10, decimal_places=2, default=0)
 
+    class Meta:
+        # Sort key for the keyset-paginated supplier list
+        indexes = [models.Index(fields=['supplier_name', 'id'], name='supplier_name_id_idx')]
+
     def __str__(self):
         return self.supplier_name
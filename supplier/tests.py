@@ -1,3 +1,26 @@
+from unittest import mock
+from django.http import HttpResponse
 from django.test import TestCase
+from django.urls import reverse
+from core import search
+from .models import Supplier
 
-# Create your tests here.
+
+class SupplierSearchTests(TestCase):
+    def test_every_match_is_listed(self):
+        suppliers = Supplier.objects.bulk_create(
+            [Supplier(supplier_name=f'Acme {number:04d}') for number in range(1005)]
+            + [Supplier(supplier_name='Globex', phone='555 0100')]
+        )
+        search.index_objects(suppliers)
+        matches = search.filter_matching(Supplier.objects.all(), 'acme', 'supplier')
+        self.assertEqual(matches.count(), 1005)
+        self.assertEqual(
+            list(search.filter_matching(Supplier.objects.all(), '555', 'supplier').values_list('supplier_name', flat=True)),
+            ['Globex'],
+        )
+        self.assertFalse(search.filter_matching(Supplier.objects.all(), '!!', 'supplier').exists())
+        with mock.patch('supplier.views.render', return_value=HttpResponse()) as render:
+            self.client.get(reverse('supplier_list'), {'q': 'acme'})
+        page = render.call_args.args[2]['suppliers']
+        self.assertEqual([supplier.supplier_name for supplier in page][:2], ['Acme 0000', 'Acme 0001'])
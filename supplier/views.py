@@ -1,13 +1,18 @@
 from django.shortcuts import render, redirect, get_object_or_404
-from django.core.paginator import Paginator
+from core import search
+from core.pagination import KeysetPaginator
+from core.versioning import conditional
 from .models import Supplier
 
+@conditional('suppliers')
 def supplier_list(request):
     query = request.GET.get('q', '')
-    suppliers = Supplier.objects.filter(supplier_name__icontains=query) if query else Supplier.objects.all().order_by('supplier_name')
-    paginator = Paginator(suppliers, 10)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    if query:
+        # Filter through the search index so phone, mobile, VAT and email also match
+        suppliers = search.filter_matching(Supplier.objects.all(), query, 'supplier').order_by('supplier_name')
+    else:
+        suppliers = Supplier.objects.all().order_by('supplier_name')
+    page_obj = KeysetPaginator(suppliers, ordering=['supplier_name'], per_page=10).get_page(request.GET.get('cursor'))
     
     updated_supplier = request.session.pop('updated_supplier', None)
     deleted_supplier = request.session.pop('deleted_supplier', None)
@@ -93,7 +98,8 @@ def delete_supplier(request, pk):
     
     if request.method == 'POST':
         supplier_name = supplier.supplier_name
-        supplier.delete()
+        # Hides the supplier and its products now; the rows are purged later by a background job
+        supplier.soft_delete()
         request.session['deleted_supplier'] = supplier_name
         return redirect('supplier_list')
     